@@ -22,6 +22,38 @@ app.conf.beat_schedule = {
         'task': 'users.tasks.reevaluate_all_badges_task',
         'schedule': crontab(minute=0, hour=0),  # Run daily at midnight
     },
+    'flush_watch_events': {
+        'task': 'users.tasks.flush_watch_events_task',
+        'schedule': 10.0,  # Every 10 seconds
+    },
+    'flush_playback_positions': {
+        'task': 'users.tasks.flush_positions_task',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    'rollup_watch_logs': {
+        'task': 'users.tasks.rollup_watch_logs_task',
+        'schedule': crontab(minute='*/15'),
+    },
+    'prune_watch_logs_daily': {
+        'task': 'users.tasks.prune_watch_logs_task',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'run_retention_daily': {
+        'task': 'core.tasks.run_retention_task',
+        'schedule': crontab(minute=0, hour=4),
+    },
+    'send_notification_digests_daily': {
+        'task': 'users.tasks.send_notification_digest_task',
+        'schedule': crontab(minute=0, hour=8),
+    },
+    'collect_dashboard_metrics': {
+        'task': 'core.tasks.collect_dashboard_metrics_task',
+        'schedule': 60.0,  # Every minute
+    },
+    'recover_chat_writes': {
+        'task': 'core.tasks.recover_chat_writes_task',
+        'schedule': 60.0,
+    },
 }
 
 @app.task(bind=True)
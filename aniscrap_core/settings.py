@@ -95,6 +95,7 @@ AUTH_USER_MODEL = "users.User"
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "core.middleware.SecurityHeadersMiddleware",
+    "core.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -165,6 +166,27 @@ else:
         }
     }
 
+# Read replicas (core.db_router). Safe-method requests and @read_only tasks
+# read from these unless the client wrote in the last REPLICA_PIN_SECONDS or
+# the replica is more than REPLICA_MAX_LAG seconds behind. With SQLite, point
+# SQLITE_REPLICA_NAME at a second database file (e.g. a copy of db.sqlite3).
+if USE_SQLITE:
+    if os.getenv('SQLITE_REPLICA_NAME'):
+        DATABASES["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / os.getenv('SQLITE_REPLICA_NAME'),
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    for i, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+        DATABASES[f"replica_{i}"] = {**DATABASES["default"], "HOST": host.strip(), "TEST": {"MIRROR": "default"}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
 
 # Authentication Backends
 AUTHENTICATION_BACKENDS = (
@@ -232,6 +254,7 @@ if os.getenv('USE_SQLITE', 'False') == 'True':
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         }
     }
+    REDIS_DATA_URL = os.getenv('REDIS_DATA_URL') or None
 else:
     CACHES = {
         "default": {
@@ -247,6 +270,9 @@ else:
             },
         }
     }
+    # Buffers, write logs, presence and other state that must outlive the
+    # cache (core.redis_client); keep it out of the cache's database
+    REDIS_DATA_URL = os.getenv('REDIS_DATA_URL', 'redis://127.0.0.1:6379/3')
 
 # Celery Configuration
 if USE_SQLITE:
@@ -261,6 +287,73 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Buffered watch events (users.ingest) moved to WatchLog per flush
+WATCH_EVENT_BATCH_SIZE = int(os.getenv('WATCH_EVENT_BATCH_SIZE', '5000'))
+PLAYBACK_FLUSH_BATCH_SIZE = int(os.getenv('PLAYBACK_FLUSH_BATCH_SIZE', '5000'))
+
+# Accounts with more followers than this are merged into feeds at read time
+# instead of being fanned out to every follower (users.timeline)
+TIMELINE_CELEBRITY_THRESHOLD = int(os.getenv('TIMELINE_CELEBRITY_THRESHOLD', '1000'))
+
+# WatchLog rollups (users.rollups). Raw rows older than the retention window
+# are deleted once rolled up; unset keeps them forever. Set an archive dir to
+# keep gzipped JSONL copies of what gets deleted.
+WATCH_ROLLUP_BATCH_SIZE = int(os.getenv('WATCH_ROLLUP_BATCH_SIZE', '10000'))
+# Rollups, revenue distribution and episode announcements only read ids at
+# least this old, so rows still being committed aren't skipped; 0 reads up to
+# the newest id. Notification replays also resend this much recent history.
+# SQLite serializes writers, so its ids always commit in order.
+WATERMARK_LAG_SECONDS = int(os.getenv('WATERMARK_LAG_SECONDS', '0' if USE_SQLITE else '300'))
+WATCH_LOG_RETENTION_DAYS = int(os.getenv('WATCH_LOG_RETENTION_DAYS', '0')) or None
+WATCH_LOG_ARCHIVE_DIR = os.getenv('WATCH_LOG_ARCHIVE_DIR') or None
+
+# New episodes of one anime created within this many seconds are announced
+# as a single notification (content.notifications); 0 announces each at once
+NOTIFICATION_COALESCE_WINDOW = int(os.getenv('NOTIFICATION_COALESCE_WINDOW', '300'))
+
+# Retention (core.retention), in days; 0 keeps rows forever. Expired rows are
+# deleted RETENTION_BATCH_SIZE at a time, archived first if a dir is set.
+# Chat retention is off by default: the chat badges (users.badge_system)
+# count a user's messages and rooms over all time.
+CHAT_MESSAGE_RETENTION_DAYS = int(os.getenv('CHAT_MESSAGE_RETENTION_DAYS', '0'))
+WATCHPARTY_MESSAGE_RETENTION_DAYS = int(os.getenv('WATCHPARTY_MESSAGE_RETENTION_DAYS', '0'))
+WATCHPARTY_IDLE_ROOM_DAYS = int(os.getenv('WATCHPARTY_IDLE_ROOM_DAYS', '1'))
+READ_NOTIFICATION_RETENTION_DAYS = int(os.getenv('READ_NOTIFICATION_RETENTION_DAYS', '30'))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '1000'))
+RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR') or None
+
+# Unfiltered lists over tables this big show an estimated count (core.pagination)
+APPROX_COUNT_THRESHOLD = int(os.getenv('APPROX_COUNT_THRESHOLD', '100000'))
+APPROX_COUNT_CACHE_TTL = int(os.getenv('APPROX_COUNT_CACHE_TTL', '600'))
+
+# Admin dashboard (core.metrics): the snapshot is refreshed every minute and
+# outlives a few missed runs; CPU/RAM samples kept (1440 = one day)
+DASHBOARD_SNAPSHOT_TTL = int(os.getenv('DASHBOARD_SNAPSHOT_TTL', '300'))
+DASHBOARD_SYSTEM_SAMPLES = int(os.getenv('DASHBOARD_SYSTEM_SAMPLES', '1440'))
+
+# Watch party members whose connection stops heartbeating for this many
+# seconds (e.g. after a worker crash) drop out of the room
+WATCHPARTY_PRESENCE_TTL = int(os.getenv('WATCHPARTY_PRESENCE_TTL', '60'))
+# Host playback updates are broadcast at most this many times per second
+WATCHPARTY_SYNC_TICK_HZ = float(os.getenv('WATCHPARTY_SYNC_TICK_HZ', '4'))
+
+# Chat messages are inserted in batches (core.write_behind) every this many
+# ms or messages; unflushed ones older than CHAT_RECOVERY_AGE seconds are
+# replayed from the Redis stream. Chat badges are checked once per window.
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FLUSH_INTERVAL_MS', '200'))
+CHAT_FLUSH_MAX_MESSAGES = int(os.getenv('CHAT_FLUSH_MAX_MESSAGES', '100'))
+CHAT_RECOVERY_AGE = int(os.getenv('CHAT_RECOVERY_AGE', '30'))
+# Approximate cap on that stream; past it the oldest unflushed messages are dropped
+CHAT_WRITE_LOG_MAX_LEN = int(os.getenv('CHAT_WRITE_LOG_MAX_LEN', '100000'))
+CHAT_BADGE_COALESCE_SECONDS = int(os.getenv('CHAT_BADGE_COALESCE_SECONDS', '30'))
+# Messages replayed to someone joining a chat or watch party room
+CHAT_HISTORY_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', '50'))
+
+# Watch party emotes are sent to the room as one burst per window, with at
+# most this many distinct emotes
+WATCHPARTY_EMOTE_WINDOW_MS = int(os.getenv('WATCHPARTY_EMOTE_WINDOW_MS', '250'))
+WATCHPARTY_EMOTE_MAX_TYPES = int(os.getenv('WATCHPARTY_EMOTE_MAX_TYPES', '10'))
+
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -320,7 +413,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.ApproximateCountPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
@@ -335,6 +428,7 @@ REST_FRAMEWORK = {
         'notifications': '100/minute',
         'login': '5/minute',
         'watchlog': '10/minute',
+        'watchevent': '120/minute',
         'review': '5/hour',
     }
 }
@@ -10,7 +10,7 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, Sp
 
 from content.views import AnimeViewSet, EpisodeViewSet, HomeViewSet
 from apps.watchparty.views import RoomViewSet
-from users.views import NotificationViewSet, UserBadgeViewSet, WatchLogViewSet, UserProfileAPIView, CustomTokenObtainPairView, FollowViewSet, UserAnimeListViewSet, ActivityFeedViewSet
+from users.views import NotificationViewSet, UserBadgeViewSet, WatchLogViewSet, UserProfileAPIView, CustomTokenObtainPairView, FollowViewSet, UserAnimeListViewSet, ActivityFeedViewSet, ContinueWatchingViewSet
 
 from rest_framework.routers import SimpleRouter
 
@@ -25,6 +25,7 @@ router.register(r'watch-parties', RoomViewSet)
 router.register(r'follows', FollowViewSet, basename='follow')
 router.register(r'anime-lists', UserAnimeListViewSet, basename='anime-list')
 router.register(r'activity-feed', ActivityFeedViewSet, basename='activity-feed')
+router.register(r'continue-watching', ContinueWatchingViewSet, basename='continue-watching')
 
 # Create a separate router or manual path for ViewSet-as-view if needed, 
 # but HomeViewSet is simple enough to map manually or use router with basename.
@@ -0,0 +1,90 @@
+"""
+Clock-offset estimation and drift correction for watch party viewers.
+
+Clients that send `clock_start` get NTP-style pings: the server sends its
+time, the client echoes it with its own, and the round trip gives an RTT
+and clock offset sample (client clock minus server clock, assuming the two
+legs take equally long). Of the last few samples the one with the lowest
+RTT is trusted, since queueing delay only ever adds to a round trip.
+
+With the offset known, a viewer's `position` report can be placed on the
+server's timeline and compared with where the host state says playback
+should be. Small drift is corrected with a playback-rate nudge that closes
+the gap over CORRECTION_WINDOW seconds; only large drift gets a hard seek.
+"""
+from collections import deque
+
+# Samples kept per client; the lowest-RTT one wins
+CLOCK_SAMPLES = 8
+# Seconds between pings: the first CLOCK_SAMPLES come in a quick burst
+BURST_INTERVAL = 0.2
+PING_INTERVAL = 15.0
+# Drift (seconds) above which a viewer is nudged / a running nudge is
+# kept up until drift is back under SETTLE_THRESHOLD / a seek is forced
+NUDGE_THRESHOLD = 0.1
+SETTLE_THRESHOLD = 0.02
+SEEK_THRESHOLD = 1.0
+# A nudge aims to close the gap within this many seconds, changing the
+# playback rate by at most MAX_NUDGE
+CORRECTION_WINDOW = 5.0
+MAX_NUDGE = 0.1
+
+
+class ClockEstimator:
+    """
+    Tracks RTT / offset samples of one client.
+    """
+
+    def __init__(self, size=CLOCK_SAMPLES):
+        self.samples = deque(maxlen=size)
+
+    def add_sample(self, sent, received, client_time):
+        """
+        `sent` / `received`: server time the ping left / the pong arrived;
+        `client_time`: the client's clock when it answered.
+        """
+        rtt = max(received - sent, 0.0)
+        self.samples.append((rtt, client_time - (sent + rtt / 2)))
+
+    @property
+    def ready(self):
+        return bool(self.samples)
+
+    @property
+    def rtt(self):
+        return min(self.samples)[0] if self.samples else None
+
+    @property
+    def offset(self):
+        return min(self.samples)[1] if self.samples else 0.0
+
+    def to_server_time(self, client_time):
+        return client_time - self.offset
+
+
+def expected_position(state, server_time):
+    """
+    Where playback should be at `server_time` given the host state.
+    """
+    if state['state'] != 'playing':
+        return state['timestamp']
+    return state['timestamp'] + (server_time - state['server_time']) * state['rate']
+
+
+def drift_hint(state, position, server_time, nudging=False):
+    """
+    Compares a viewer's `position` at `server_time` with the host state.
+    Returns the correction to send, or None. `nudging` says the viewer is
+    still running a previous rate nudge, which is reset once back in sync.
+    """
+    target = expected_position(state, server_time)
+    drift = position - target
+    if abs(drift) >= SEEK_THRESHOLD or (state['state'] != 'playing' and abs(drift) >= NUDGE_THRESHOLD):
+        return {'action': 'seek', 'position': target, 'server_time': server_time, 'drift': drift}
+    if abs(drift) >= (SETTLE_THRESHOLD if nudging else NUDGE_THRESHOLD):
+        # Ahead -> slow down, behind -> speed up
+        nudge = max(-MAX_NUDGE, min(MAX_NUDGE, drift / CORRECTION_WINDOW))
+        return {'action': 'rate', 'rate': state['rate'] * (1 - nudge), 'drift': drift}
+    if nudging:
+        return {'action': 'rate', 'rate': state['rate'], 'drift': drift}
+    return None
@@ -1,19 +1,42 @@
+import asyncio
 import json
 import logging
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from channels.exceptions import DenyConnection
 from django.utils.html import escape
+from django.conf import settings
 from django.core.cache import cache
 from asgiref.sync import sync_to_async
-from .models import Room, Participant, Message
+from core import chat_history
+from core.broadcast import frame, group_event, keyed_event
+from core.write_behind import chat_writes, delete_message, snowflake
+from .models import Message
+from . import clock
+from . import emotes
+from . import playback
+from . import presence
+from . import room_state as rooms
 
 logger = logging.getLogger(__name__)
 
 class WatchPartyConsumer(AsyncWebsocketConsumer):
+    joined = False
+    heartbeat_task = None
+    # Host sync throttling (see playback.py)
+    pending_sync = None
+    sync_flush = None
+    last_sync_sent = 0.0
+    # Clock sync / drift correction (see clock.py), once the client asks
+    clock = None
+    clock_task = None
+    playback_state = None
+    nudging = False
+
     async def connect(self):
         self.room_uuid = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'party_{self.room_uuid}'
+        self.room_group_name = rooms.group_name(self.room_uuid)
         self.user = self.scope.get('user')
 
         # Require authentication for connection
@@ -26,35 +49,83 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
         query_params = parse_qs(query_string)
         password = query_params.get('password', [''])[0]
 
+        # Room metadata is shared by the consumers of this process
+        room = rooms.get(self.room_uuid)
+        if room is None:
+            room = await database_sync_to_async(rooms.load)(self.room_uuid)
+
         # Verify Room Exists and Password
-        if not await self.verify_room_access(self.room_uuid, self.user, password):
+        if not self.verify_room_access(room, self.user, password):
             raise DenyConnection()
 
-        # Verify Room Capacity
-        if not await self.check_room_capacity(self.room_uuid, self.user):
+        # Verify Room Capacity (checked and claimed atomically; host can always join)
+        joined, first, expired = await database_sync_to_async(presence.join)(
+            self.room_uuid, self.user, room.max_participants, bypass_capacity=room.host_id == self.user.id
+        )
+        if not joined:
             raise DenyConnection()
 
+        rooms.acquire(self.room_uuid, room)
+        self.joined = True
+        await self.announce_left(expired)
+
+        # The room gets a delta (sent before we join the group, so it isn't
+        # echoed back); the full list goes to the newcomer only
+        if first:
+            await self.announce_joined()
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         await self.accept()
-
-        # Add/Update Participant
-        await self.add_participant(self.room_uuid, self.user)
-        await self.broadcast_system_message(f"{self.user.username} joined the party.")
         await self.send_participants_list()
+        await self.send_history()
+        if first:
+            await self.broadcast_system_message(f"{self.user.username} joined the party.")
+
+        # Late joiners start from where the host is now
+        state = await database_sync_to_async(playback.load)(self.room_uuid)
+        if state:
+            await self.video_sync({'type': 'video_sync', **state})
+        if presence.enabled():
+            self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
     async def disconnect(self, close_code):
+        left = False
+        if self.joined:
+            self.joined = False
+            if self.heartbeat_task:
+                self.heartbeat_task.cancel()
+            if self.sync_flush:
+                self.sync_flush.cancel()
+            if self.clock_task:
+                self.clock_task.cancel()
+            # Don't lose the host's last word
+            await self.flush_sync()
+            rooms.release(self.room_uuid)
+            left = await database_sync_to_async(presence.leave)(self.room_uuid, self.user)
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        if self.user and self.user.is_authenticated:
-            await self.remove_participant(self.room_uuid, self.user)
+        if left:
+            await self.announce_left([self.user.id])
             await self.broadcast_system_message(f"{self.user.username} left the party.")
-            await self.send_participants_list()
+
+    async def heartbeat(self):
+        # Keeps this member alive in Redis and sweeps members whose worker died
+        while True:
+            await asyncio.sleep(presence.heartbeat_interval())
+            try:
+                readded, expired = await database_sync_to_async(presence.heartbeat)(self.room_uuid, self.user)
+            except Exception:
+                logger.exception(f"Presence heartbeat failed in room {self.room_uuid}")
+                continue
+            await self.announce_left(expired)
+            if readded:
+                await self.announce_joined()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -73,16 +144,10 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
 
         if msg_type == 'sync':
             # Video Sync (Host -> Viewers)
-            if await self.is_host(self.room_uuid, self.user):
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'video_sync',
-                        'timestamp': data.get('timestamp'),
-                        'state': data.get('state'), # playing/paused
-                        'sender_id': self.user.id
-                    }
-                )
+            if self.is_host(self.user):
+                state = playback.from_client(data, self.user.id)
+                if state:
+                    await self.queue_sync(state)
         elif msg_type == 'chat':
             # Chat Message
             message = data.get('message')
@@ -94,150 +159,224 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
             # Sanitize message to prevent XSS
             if message:
                 sanitized_message = escape(message)
-                msg_obj = await self.save_message(self.room_uuid, self.user, sanitized_message)
+                # Broadcast now, stored with the next batch
+                message_id = snowflake.next_id()
                 await self.channel_layer.group_send(
                     self.room_group_name,
-                    {
-                        'type': 'chat_message',
+                    group_event('chat_message', {
                         'message': sanitized_message,
                         'username': self.user.username,
                         'is_system': False,
-                        'id': msg_obj.id,
-                    }
+                        'id': message_id,
+                    })
                 )
+                await self.save_message(message_id, self.room_uuid, self.user, sanitized_message)
         elif msg_type == 'delete_message':
             # Only the host can delete messages
-            if await self.is_host(self.room_uuid, self.user):
-                message_id = data.get('message_id')
+            if self.is_host(self.user):
+                try:
+                    message_id = int(data.get('message_id'))
+                except (TypeError, ValueError):
+                    message_id = None
                 if message_id:
-                    deleted = await self.delete_message(message_id)
+                    deleted = await delete_message(Message, message_id)
                     if deleted:
+                        await sync_to_async(chat_history.remove)(self.history_key(), message_id)
                         await self.channel_layer.group_send(
                             self.room_group_name,
-                            {
-                                'type': 'message_deleted',
-                                'message_id': message_id
-                            }
+                            group_event('message_deleted', {'message_id': message_id})
                         )
+        elif msg_type == 'clock_start':
+            if self.clock_task is None:
+                self.clock = clock.ClockEstimator()
+                self.pings = {}
+                self.clock_task = asyncio.create_task(self.clock_pings())
+        elif msg_type == 'pong':
+            await self.handle_pong(data)
+        elif msg_type == 'position':
+            await self.handle_position(data)
         elif msg_type == 'emote':
-            # Emote Rain
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'emote_rain',
-                    'emote': data.get('emote')
-                }
-            )
+            # Emote Rain, sent to the room in bursts (see emotes.py)
+            emote = emotes.clean(data.get('emote'))
+            if emote and await database_sync_to_async(emotes.add)(self.room_uuid, emote):
+                emotes.schedule_flush(self.channel_layer, self.room_uuid)
 
-    # Handlers for Group Messages
+    # Handlers for Group Messages (frames are encoded once, see core/broadcast.py)
     async def video_sync(self, event):
-        await self.send(text_data=json.dumps(event))
+        self.playback_state = event
+        # Anchor the position to the server time it is delivered at (once
+        # per process); clients that know their clock offset can compute
+        # the exact target
+        await self.send(text_data=frame(event, playback.extrapolate))
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame(event))
 
     async def message_deleted(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=frame(event, lambda fields: {
             'type': 'message_deleted',
-            'message_id': event['message_id']
+            'message_id': fields['message_id']
         }))
 
-    async def emote_rain(self, event):
-        await self.send(text_data=json.dumps(event))
+    async def emote_burst(self, event):
+        await self.send(text_data=frame(event))
 
     async def participants_update(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=frame(event, lambda fields: {
             'type': 'participants_update',
-            'participants': event['participants']
+            'participants': fields['participants']
         }))
 
-    # DB Operations
-    @database_sync_to_async
-    def verify_room_access(self, uuid, user, password):
+    async def participant_joined(self, event):
+        await self.send(text_data=frame(event))
+
+    async def participant_left(self, event):
+        await self.send(text_data=frame(event))
+
+    async def room_updated(self, event):
+        # Control message from RoomViewSet; not forwarded to the client
+        state = rooms.RoomState(*event['state']) if event['state'] else None
+        rooms.update(self.room_uuid, state)
+        if state is None or not state.is_active:
+            await self.close()
+
+    # Host Sync
+    async def queue_sync(self, state):
+        self.pending_sync = state
+        if self.sync_flush and not self.sync_flush.done():
+            # The scheduled flush picks up the latest state
+            return
+        wait = self.last_sync_sent + playback.tick_interval() - time.monotonic()
+        if wait <= 0:
+            await self.flush_sync()
+        else:
+            self.sync_flush = asyncio.create_task(self.flush_sync(delay=wait))
+
+    async def flush_sync(self, delay=0):
+        if delay:
+            await asyncio.sleep(delay)
+        while self.pending_sync is not None:
+            state, self.pending_sync = self.pending_sync, None
+            self.last_sync_sent = time.monotonic()
+            await database_sync_to_async(playback.save)(self.room_uuid, state)
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                keyed_event('video_sync', state)
+            )
+            if self.pending_sync is not None:
+                await asyncio.sleep(playback.tick_interval())
+
+    # Clock Sync
+    async def clock_pings(self):
+        # A quick burst for a first estimate, then keep it fresh
+        ping_id = 0
+        while True:
+            ping_id += 1
+            sent = time.time()
+            self.pings[ping_id] = sent
+            # Unanswered pings don't pile up
+            self.pings.pop(ping_id - clock.CLOCK_SAMPLES, None)
+            await self.send(text_data=json.dumps({'type': 'ping', 'id': ping_id, 'server_time': sent}))
+            await asyncio.sleep(clock.BURST_INTERVAL if ping_id < clock.CLOCK_SAMPLES else clock.PING_INTERVAL)
+
+    async def handle_pong(self, data):
+        if self.clock is None:
+            return
         try:
-            room = Room.objects.get(uuid=uuid)
-            if room.password and room.host != user:
-                if password != room.password:
-                    return False
-            return True
-        except Room.DoesNotExist:
-            return False
+            client_time = float(data.get('client_time'))
+        except (TypeError, ValueError):
+            return
+        sent = self.pings.pop(data.get('id'), None)
+        if sent is None:
+            return
+        self.clock.add_sample(sent, time.time(), client_time)
+        await self.send(text_data=json.dumps({'type': 'clock', 'offset': self.clock.offset, 'rtt': self.clock.rtt}))
 
-    @database_sync_to_async
-    def check_room_capacity(self, uuid, user):
+    async def handle_position(self, data):
+        state = self.playback_state
+        if state is None or self.is_host(self.user):
+            return
         try:
-            room = Room.objects.get(uuid=uuid)
-            # Host can always join
-            if room.host == user:
-                return True
-
-            # If max_participants is set, verify active participant count
-            if room.max_participants > 0:
-                # If user is already an active participant, they can rejoin
-                if Participant.objects.filter(room_id=uuid, user=user, is_online=True).exists():
-                    return True
-
-                # Otherwise check if there's room
-                active_participants = Participant.objects.filter(room_id=uuid, is_online=True).count()
-                if active_participants >= room.max_participants:
-                    return False
-
-            return True
-        except Room.DoesNotExist:
+            position = float(data.get('timestamp'))
+            client_time = float(data['client_time']) if data.get('client_time') is not None else None
+        except (TypeError, ValueError):
+            return
+        if client_time is not None and self.clock and self.clock.ready:
+            server_time = self.clock.to_server_time(client_time)
+        else:
+            server_time = time.time()
+        hint = clock.drift_hint(state, position, server_time, nudging=self.nudging)
+        if hint:
+            self.nudging = hint['action'] == 'rate' and hint['rate'] != state['rate']
+            await self.send(text_data=json.dumps({'type': 'drift_correction', **hint}))
+
+    # Room State (cached, no DB)
+    def verify_room_access(self, room, user, password):
+        if room is None:
             return False
+        if room.password and room.host_id != user.id:
+            if password != room.password:
+                return False
+        return True
 
-    @database_sync_to_async
-    def is_host(self, uuid, user):
-        return Room.objects.filter(uuid=uuid, host=user).exists()
+    def is_host(self, user):
+        room = rooms.get(self.room_uuid)
+        return room is not None and room.host_id == user.id
 
-    @database_sync_to_async
-    def add_participant(self, uuid, user):
-        Participant.objects.update_or_create(
-            room_id=uuid, user=user,
-            defaults={'is_online': True}
+    # DB Operations
+    async def save_message(self, message_id, uuid, user, content):
+        await sync_to_async(chat_history.push)(self.history_key(), {
+            'id': message_id, 'message': content, 'username': user.username, 'is_system': False,
+        })
+        await chat_writes.add(Message, {
+            'id': message_id, 'room_id': str(uuid), 'sender_id': user.id, 'content': content, 'is_system': False,
+        })
+
+    # Chat History (see core/chat_history.py)
+    def history_key(self):
+        return f'wp:history:{self.room_uuid}'
+
+    async def send_history(self):
+        messages = await database_sync_to_async(chat_history.recent)(self.history_key(), self.load_history)
+        if messages:
+            await self.send(text_data=json.dumps({'type': 'history', 'messages': messages}))
+
+    def load_history(self):
+        messages = (
+            Message.objects.filter(room_id=self.room_uuid, is_system=False)
+            .select_related('sender').order_by('-created_at')[:settings.CHAT_HISTORY_SIZE]
         )
-
-    @database_sync_to_async
-    def remove_participant(self, uuid, user):
-        Participant.objects.filter(room_id=uuid, user=user).update(is_online=False)
-
-    @database_sync_to_async
-    def save_message(self, uuid, user, content):
-        return Message.objects.create(room_id=uuid, sender=user, content=content)
-
-    @database_sync_to_async
-    def delete_message(self, message_id):
-        try:
-            msg = Message.objects.get(id=message_id)
-            msg.delete()
-            return True
-        except Message.DoesNotExist:
-            return False
+        return [
+            {'id': m.id, 'message': m.content, 'username': m.sender.username, 'is_system': False}
+            for m in reversed(list(messages))
+        ]
 
     async def broadcast_system_message(self, message):
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'chat_message',
+            group_event('chat_message', {
                 'message': message,
                 'username': 'System',
                 'is_system': True
-            }
+            })
         )
     
     async def send_participants_list(self):
-        participants = await self.get_participants(self.room_uuid)
+        participants = await database_sync_to_async(presence.members)(self.room_uuid)
+        await self.participants_update({'participants': participants})
+
+    async def announce_joined(self):
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'participants_update',
-                'participants': participants
-            }
+            group_event('participant_joined', {'participant': presence.member(self.user)})
         )
 
-    @database_sync_to_async
-    def get_participants(self, uuid):
-        return list(Participant.objects.filter(room_id=uuid, is_online=True).values('user__username', 'user__id'))
+    async def announce_left(self, user_ids):
+        for user_id in user_ids:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                group_event('participant_left', {'user_id': user_id})
+            )
 
     @sync_to_async
     def check_rate_limit(self, msg_type):
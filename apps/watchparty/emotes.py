@@ -0,0 +1,106 @@
+"""
+Watch party emote aggregation.
+
+Emotes are not forwarded one by one: they are counted per room for
+WATCHPARTY_EMOTE_WINDOW_MS, and the room gets a single `emote_burst` frame
+with the count of each emote at the end of the window. The consumer whose
+emote opens a window is the one that flushes it, so a room receives at most
+one burst per window however many viewers are sending, and a burst carries
+at most WATCHPARTY_EMOTE_MAX_TYPES distinct emotes (the most frequent).
+
+Counts live in a Redis hash so all workers of a room share a window;
+without Redis they are kept in the process.
+"""
+import asyncio
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from core.broadcast import group_event
+from core.redis_client import get_redis_connection
+from .room_state import group_name
+
+MAX_EMOTE_LENGTH = 16
+
+# ARGV: emote, window (ms), counts ttl (ms). Returns 1 if this opened the window
+_ADD_SCRIPT = """
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+if redis.call('SET', KEYS[2], 1, 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+_TAKE_SCRIPT = """
+local counts = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return counts
+"""
+
+# Process-local windows without Redis
+_counts = {}
+# Scheduled flushes; they must outlive the consumer that scheduled them
+_flushes = set()
+
+
+def _keys(room_uuid):
+    return [f'wp:emotes:{room_uuid}', f'wp:emotes:window:{room_uuid}']
+
+
+def window_ms():
+    return settings.WATCHPARTY_EMOTE_WINDOW_MS
+
+
+def clean(emote):
+    """
+    The emote to count, or None if it isn't a short string.
+    """
+    if not isinstance(emote, str):
+        return None
+    emote = emote.strip()
+    if not emote or len(emote) > MAX_EMOTE_LENGTH:
+        return None
+    return emote
+
+
+def add(room_uuid, emote):
+    """
+    Counts `emote` in the room's current window. Returns True when this
+    opened the window, i.e. the caller has to flush it.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        opened = str(room_uuid) not in _counts
+        _counts.setdefault(str(room_uuid), Counter())[emote] += 1
+        return opened
+    script = redis.register_script(_ADD_SCRIPT)
+    return bool(script(keys=_keys(room_uuid), args=[emote, window_ms(), window_ms() * 20]))
+
+
+def take(room_uuid):
+    """
+    Ends the room's window: {emote: count} of the most frequent emotes.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        counts = _counts.pop(str(room_uuid), Counter())
+    else:
+        raw = redis.register_script(_TAKE_SCRIPT)(keys=_keys(room_uuid)[:1])
+        counts = Counter({raw[i].decode(): int(raw[i + 1]) for i in range(0, len(raw), 2)})
+    return dict(counts.most_common(settings.WATCHPARTY_EMOTE_MAX_TYPES))
+
+
+async def flush_later(channel_layer, room_uuid):
+    await asyncio.sleep(window_ms() / 1000)
+    counts = await sync_to_async(take)(room_uuid)
+    if counts:
+        await channel_layer.group_send(
+            group_name(room_uuid),
+            group_event('emote_burst', {'emotes': counts, 'window_ms': window_ms()})
+        )
+
+
+def schedule_flush(channel_layer, room_uuid):
+    task = asyncio.create_task(flush_later(channel_layer, room_uuid))
+    _flushes.add(task)
+    task.add_done_callback(_flushes.discard)
@@ -31,6 +31,9 @@ class Participant(models.Model):
 
     class Meta:
         unique_together = ('room', 'user')
+        indexes = [
+            models.Index(fields=['room', 'is_online']),
+        ]
 
     def __str__(self):
         return f"{self.user} in {self.room}"
@@ -42,5 +45,11 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_system = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender} in {self.room}"
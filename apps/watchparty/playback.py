@@ -0,0 +1,79 @@
+"""
+Watch party playback state.
+
+The latest host state (position, playing/paused, rate) is stored per room
+with the server time it was taken at, so a viewer joining mid-episode gets
+it straight away with the position extrapolated to now. Host sync messages
+are throttled to WATCHPARTY_SYNC_TICK_HZ broadcasts per second: the first
+one in a quiet period goes out at once, later ones within the tick are
+coalesced into the latest state. Without Redis the state lives in the
+cache.
+"""
+import json
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from core.redis_client import get_redis_connection
+
+STATES = ('playing', 'paused')
+MIN_RATE, MAX_RATE = 0.25, 4.0
+# Playback state of an idle room is forgotten after a day
+STATE_TTL = 24 * 60 * 60
+
+
+def _key(room_uuid):
+    return f'wp:playback:{room_uuid}'
+
+
+def tick_interval():
+    return 1 / settings.WATCHPARTY_SYNC_TICK_HZ
+
+
+def from_client(data, sender_id):
+    """
+    Validates a host `sync` message into a state; None when malformed.
+    """
+    try:
+        position = float(data.get('timestamp'))
+        rate = float(data.get('rate', 1))
+    except (TypeError, ValueError):
+        return None
+    if data.get('state') not in STATES or not (math.isfinite(position) and math.isfinite(rate)) or position < 0:
+        return None
+    return {
+        'timestamp': position,
+        'state': data['state'],
+        'rate': min(max(rate, MIN_RATE), MAX_RATE),
+        'sender_id': sender_id,
+        'server_time': time.time(),
+    }
+
+
+def extrapolate(state, now=None):
+    """
+    The state as of `now`: a playing video has moved on by the elapsed
+    time times its rate.
+    """
+    now = time.time() if now is None else now
+    current = dict(state)
+    if state['state'] == 'playing':
+        current['timestamp'] = state['timestamp'] + max(now - state['server_time'], 0) * state['rate']
+    current['server_time'] = now
+    return current
+
+
+def save(room_uuid, state):
+    redis = get_redis_connection()
+    if redis is None:
+        cache.set(_key(room_uuid), state, STATE_TTL)
+        return
+    redis.set(_key(room_uuid), json.dumps(state), ex=STATE_TTL)
+
+
+def load(room_uuid):
+    redis = get_redis_connection()
+    if redis is None:
+        return cache.get(_key(room_uuid))
+    raw = redis.get(_key(room_uuid))
+    return json.loads(raw) if raw else None
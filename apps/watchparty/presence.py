@@ -0,0 +1,186 @@
+"""
+Watch party presence.
+
+Who is in a room lives in Redis: a sorted set of user ids scored by their
+heartbeat expiry, plus hashes of usernames and open connection counts (a
+user may have several tabs open). Joining checks capacity and adds the
+member in one Lua script, so two viewers racing for the last seat can't
+both get it. Every live connection refreshes its member's heartbeat; members
+whose heartbeat lapsed (a crashed worker) are pruned by whoever joins or
+heartbeats next, and returned so the caller can announce them as left.
+The keys are on the durable Redis connection, not the cache, so clearing
+the cache can't empty a room and let the capacity check count zero members.
+
+Participant rows are written by a Celery task and kept for history only.
+Without Redis (SQLite/dev mode) presence falls back to Participant.is_online
+as before.
+"""
+import time
+from django.conf import settings
+from core.redis_client import get_redis_connection
+from .models import Participant
+
+# Drops members whose heartbeat expired; returns their ids
+_PRUNE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('HDEL', KEYS[2], member)
+    redis.call('HDEL', KEYS[3], member)
+end
+"""
+
+_TOUCH = """
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+redis.call('HSET', KEYS[3], ARGV[2], ARGV[4])
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[5])
+end
+"""
+
+# ARGV: now, user id, expiry, username, key ttl, capacity (0 = none), bypass
+# Returns {joined, first connection of this user, expired ids}
+_JOIN_SCRIPT = _PRUNE + """
+local present = redis.call('ZSCORE', KEYS[1], ARGV[2])
+local capacity = tonumber(ARGV[6])
+if not present and ARGV[7] ~= '1' and capacity > 0 and redis.call('ZCARD', KEYS[1]) >= capacity then
+    return {0, 0, expired}
+end
+""" + _TOUCH + """
+local connections = redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+return {1, connections == 1 and 1 or 0, expired}
+"""
+
+# ARGV as for join. Refreshes before pruning so the caller never expires
+# itself. Returns {re-added after being pruned, expired ids}
+_HEARTBEAT_SCRIPT = """
+local readded = 0
+if redis.call('HEXISTS', KEYS[2], ARGV[2]) == 0 then
+    redis.call('HSET', KEYS[2], ARGV[2], 1)
+    readded = 1
+end
+""" + _TOUCH + _PRUNE + """
+return {readded, expired}
+"""
+
+# ARGV: user id. Returns 1 when the user's last connection left
+_LEAVE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+if redis.call('HINCRBY', KEYS[2], ARGV[1], -1) > 0 then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+
+def _keys(room_uuid):
+    return [f'wp:presence:{room_uuid}', f'wp:connections:{room_uuid}', f'wp:names:{room_uuid}']
+
+
+def _args(user, capacity=0, bypass=False):
+    now = time.time()
+    ttl = settings.WATCHPARTY_PRESENCE_TTL
+    return [now, user.id, now + ttl, user.username, ttl * 2, capacity, int(bypass)]
+
+
+def enabled():
+    return get_redis_connection() is not None
+
+
+def heartbeat_interval():
+    return settings.WATCHPARTY_PRESENCE_TTL / 3
+
+
+def member(user):
+    return {'user__username': user.username, 'user__id': user.id}
+
+
+def _record(room_uuid, user_ids, is_online):
+    # Avoid circular import
+    from .tasks import record_participation_task
+    if user_ids:
+        record_participation_task.delay(str(room_uuid), [int(uid) for uid in user_ids], is_online)
+
+
+def join(room_uuid, user, capacity, bypass_capacity=False):
+    """
+    Adds a connection of `user` unless the room is full.
+    Returns (joined, first connection of the user, [expired user ids]).
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return _join_db(room_uuid, user, capacity, bypass_capacity)
+    script = redis.register_script(_JOIN_SCRIPT)
+    joined, first, expired = script(keys=_keys(room_uuid), args=_args(user, capacity, bypass_capacity))
+    expired = [int(uid) for uid in expired]
+    _record(room_uuid, expired, False)
+    if joined and first:
+        _record(room_uuid, [user.id], True)
+    return bool(joined), bool(first), expired
+
+
+def heartbeat(room_uuid, user):
+    """
+    Refreshes the user's heartbeat. Returns (re-added, [expired user ids]):
+    re-added when the user had been pruned meanwhile. A no-op without Redis.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return False, []
+    script = redis.register_script(_HEARTBEAT_SCRIPT)
+    readded, expired = script(keys=_keys(room_uuid), args=_args(user))
+    expired = [int(uid) for uid in expired]
+    _record(room_uuid, expired, False)
+    if readded:
+        _record(room_uuid, [user.id], True)
+    return bool(readded), expired
+
+
+def leave(room_uuid, user):
+    """
+    Drops one connection of `user`; True when it was their last.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        Participant.objects.filter(room_id=room_uuid, user=user).update(is_online=False)
+        return True
+    left = redis.register_script(_LEAVE_SCRIPT)(keys=_keys(room_uuid), args=[user.id])
+    if left:
+        _record(room_uuid, [user.id], False)
+    return bool(left)
+
+
+def members(room_uuid):
+    """
+    [{'user__username', 'user__id'}] of the users currently in the room.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return list(Participant.objects.filter(room_id=room_uuid, is_online=True).values('user__username', 'user__id'))
+    presence, _connections, names = _keys(room_uuid)
+    user_ids = redis.zrangebyscore(presence, time.time(), '+inf')
+    if not user_ids:
+        return []
+    usernames = redis.hmget(names, user_ids)
+    return [
+        {'user__username': username.decode(), 'user__id': int(uid)}
+        for uid, username in zip(user_ids, usernames) if username is not None
+    ]
+
+
+def _join_db(room_uuid, user, capacity, bypass_capacity):
+    if not bypass_capacity and capacity > 0:
+        # If user is already an active participant, they can rejoin
+        online = Participant.objects.filter(room_id=room_uuid, is_online=True)
+        if not online.filter(user=user).exists() and online.count() >= capacity:
+            return False, False, []
+    Participant.objects.update_or_create(
+        room_id=room_uuid, user=user,
+        defaults={'is_online': True}
+    )
+    return True, True, []
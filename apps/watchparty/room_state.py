@@ -0,0 +1,78 @@
+"""
+Per-process cache of watch party room metadata.
+
+Every WatchPartyConsumer in a process shares one RoomState per room, loaded
+on the first connect and dropped when the last local connection leaves, so
+host checks on sync/delete_message never touch the database. When a room
+is changed through RoomViewSet, publish_room_state sends the new state to
+the room's group; every process with a member in the room receives it and
+replaces its copy.
+"""
+from collections import namedtuple
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from .models import Room
+
+RoomState = namedtuple('RoomState', ['host_id', 'password', 'max_participants', 'is_active'])
+
+# room uuid -> RoomState / number of local consumers in the room
+_states = {}
+_refs = {}
+
+
+def group_name(room_uuid):
+    return f'party_{room_uuid}'
+
+
+def room_state(room):
+    return RoomState(room.host_id, room.password or '', room.max_participants, room.is_active)
+
+
+def load(room_uuid):
+    """
+    Reads the room from the database; None if it doesn't exist.
+    """
+    room = Room.objects.filter(uuid=room_uuid).only('host_id', 'password', 'max_participants', 'is_active').first()
+    return room_state(room) if room else None
+
+
+def get(room_uuid):
+    return _states.get(str(room_uuid))
+
+
+def acquire(room_uuid, state):
+    """
+    Registers a local consumer for the room, caching `state` unless a copy
+    is already held. Returns the cached state.
+    """
+    key = str(room_uuid)
+    _refs[key] = _refs.get(key, 0) + 1
+    return _states.setdefault(key, state)
+
+
+def release(room_uuid):
+    key = str(room_uuid)
+    remaining = _refs.get(key, 0) - 1
+    if remaining > 0:
+        _refs[key] = remaining
+    else:
+        _refs.pop(key, None)
+        _states.pop(key, None)
+
+
+def update(room_uuid, state):
+    """
+    Replaces the cached state (None when the room was deleted), if held.
+    """
+    key = str(room_uuid)
+    if key in _states:
+        _states[key] = state
+
+
+def publish_room_state(room_uuid, state):
+    """
+    Sends the room's new state to its group once the transaction commits.
+    """
+    message = {'type': 'room_updated', 'state': list(state) if state else None}
+    transaction.on_commit(lambda: async_to_sync(get_channel_layer().group_send)(group_name(room_uuid), message))
@@ -0,0 +1,22 @@
+from celery import shared_task
+import logging
+from django.db import IntegrityError
+from .models import Participant
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, max_retries=3)
+def record_participation_task(self, room_uuid, user_ids, is_online):
+    # History only: live presence is kept in Redis (presence.py)
+    try:
+        if not is_online:
+            Participant.objects.filter(room_id=room_uuid, user_id__in=user_ids).update(is_online=False)
+            return
+        for user_id in user_ids:
+            Participant.objects.update_or_create(room_id=room_uuid, user_id=user_id, defaults={'is_online': True})
+    except IntegrityError:
+        # The room (or user) was deleted meanwhile
+        logger.info(f"Skipped participation record for room {room_uuid}.")
+    except Exception as e:
+        logger.exception(f"Failed to record participation in room {room_uuid}.")
+        self.retry(exc=e, countdown=30)
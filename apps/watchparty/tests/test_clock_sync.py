@@ -0,0 +1,168 @@
+"""
+Clock sync: unit tests, the consumer protocol, and a simulated-latency
+harness that measures the sync error a viewer actually achieves.
+"""
+import random
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from apps.watchparty import clock, playback
+from apps.watchparty.models import Room
+from content.models import Anime, Season, Episode
+
+User = get_user_model()
+
+
+class SimulatedViewer:
+    """
+    A player whose clock is `skew` seconds off the server's and whose
+    decoder runs slightly slow. All times are server times.
+    """
+
+    def __init__(self, skew, decoder_speed):
+        self.skew = skew
+        self.decoder_speed = decoder_speed
+        self.anchor, self.anchor_position, self.rate = 0.0, 0.0, 1.0
+
+    def local(self, t):
+        return t + self.skew
+
+    def position(self, t):
+        return self.anchor_position + (t - self.anchor) * self.rate * self.decoder_speed
+
+    def play(self, t, position, rate):
+        self.anchor, self.anchor_position, self.rate = t, position, rate
+
+
+def simulate(corrected, seconds=120, seed=7, skew=2.5, up=0.06, down=0.09, jitter=0.04, decoder_speed=0.995):
+    """
+    Runs a viewer joining a playing room. Uncorrected viewers apply the host
+    position as received; corrected ones use the clock offset and follow
+    drift hints. Returns the sync errors (seconds) over the second half.
+    """
+    rng = random.Random(seed)
+    up_delay = lambda: up + rng.uniform(0, jitter)
+    down_delay = lambda: down + rng.uniform(0, jitter)
+    host = {'timestamp': 0.0, 'state': 'playing', 'rate': 1.0, 'sender_id': 1, 'server_time': 0.0}
+    viewer = SimulatedViewer(skew, decoder_speed)
+    estimator = clock.ClockEstimator()
+
+    # Ping burst
+    t = 0.0
+    for _ in range(clock.CLOCK_SAMPLES):
+        d = down_delay()
+        estimator.add_sample(t, t + d + up_delay(), viewer.local(t + d))
+        t += clock.BURST_INTERVAL
+    offset = estimator.offset
+
+    def target_at(frame, arrival):
+        # What a client with the offset computes from a server-anchored frame
+        return frame['timestamp'] + (viewer.local(arrival) - offset - frame['server_time']) * host['rate']
+
+    # Join snapshot
+    snapshot = playback.extrapolate(host, now=t)
+    arrival = t + down_delay()
+    viewer.play(arrival, target_at(snapshot, arrival) if corrected else snapshot['timestamp'], host['rate'])
+
+    errors, nudging = [], False
+    for second in range(int(t) + 1, seconds):
+        t = float(second)
+        if corrected:
+            # Position report -> drift hint -> applied on arrival
+            report_arrival = t + up_delay()
+            hint = clock.drift_hint(host, viewer.position(t), estimator.to_server_time(viewer.local(t)), nudging)
+            if hint:
+                nudging = hint['action'] == 'rate' and hint['rate'] != host['rate']
+                applied = report_arrival + down_delay()
+                if hint['action'] == 'seek':
+                    viewer.play(applied, target_at(hint, applied), host['rate'])
+                else:
+                    viewer.play(applied, viewer.position(applied), hint['rate'])
+        if t >= seconds / 2:
+            errors.append(abs(viewer.position(t) - clock.expected_position(host, t)))
+    return errors
+
+
+class ClockEstimatorTests(SimpleTestCase):
+    def test_lowest_rtt_sample_wins(self):
+        estimator = clock.ClockEstimator()
+        # Client clock is 5s ahead; the second round trip sat in a queue
+        estimator.add_sample(0.0, 0.2, 5.1)
+        estimator.add_sample(1.0, 2.0, 6.2)
+        estimator.add_sample(2.0, 2.1, 7.05)
+        self.assertAlmostEqual(estimator.rtt, 0.1)
+        self.assertAlmostEqual(estimator.offset, 5.0)
+        self.assertAlmostEqual(estimator.to_server_time(15.0), 10.0)
+
+    def test_drift_hints(self):
+        state = {'timestamp': 10.0, 'state': 'playing', 'rate': 1.0, 'server_time': 100.0}
+        self.assertIsNone(clock.drift_hint(state, 15.05, 105.0))
+        ahead = clock.drift_hint(state, 15.5, 105.0)
+        self.assertEqual(ahead['action'], 'rate')
+        self.assertAlmostEqual(ahead['rate'], 0.9)
+        self.assertGreater(clock.drift_hint(state, 14.8, 105.0)['rate'], 1.0)
+        self.assertEqual(clock.drift_hint(state, 18.0, 105.0)['action'], 'seek')
+        # Back in sync after a nudge: restore the host rate
+        self.assertEqual(clock.drift_hint(state, 15.0, 105.0, nudging=True), {'action': 'rate', 'rate': 1.0, 'drift': 0.0})
+        paused = dict(state, state='paused')
+        self.assertEqual(clock.drift_hint(paused, 10.5, 105.0)['position'], 10.0)
+
+
+class SimulatedLatencyTests(SimpleTestCase):
+    def test_offset_and_hints_keep_viewers_in_sync(self):
+        naive = simulate(corrected=False)
+        corrected = simulate(corrected=True)
+        # Uncorrected viewers lag by the one-way delay and drift further
+        self.assertGreater(min(naive), 0.2)
+        # Corrected ones stay within the nudge threshold plus link asymmetry
+        self.assertLess(max(corrected), clock.NUDGE_THRESHOLD + 0.05)
+
+    def test_harness_is_stable_across_seeds(self):
+        for seed in range(5):
+            errors = simulate(corrected=True, seed=seed)
+            self.assertLess(sum(errors) / len(errors), 0.1)
+
+
+@sync_to_async
+def create_room():
+    host = User.objects.create_user(username='host', password='p')
+    viewer = User.objects.create_user(username='viewer', password='p')
+    season = Season.objects.create(anime=Anime.objects.create(title='Clocked'), number=1)
+    return host, viewer, Room.objects.create(host=host, episode=Episode.objects.create(season=season, number=1))
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_ping_pong_and_drift_correction():
+    cache.clear()
+    host, viewer, room = await create_room()
+    await sync_to_async(playback.save)(room.uuid, {
+        'timestamp': 50.0, 'state': 'paused', 'rate': 1.0, 'sender_id': host.id, 'server_time': 0.0,
+    })
+    from aniscrap_core.asgi import application
+    communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+    communicator.scope["user"] = viewer
+    connected, _ = await communicator.connect()
+    assert connected
+    while not await communicator.receive_nothing(timeout=0.1):
+        await communicator.receive_json_from()
+
+    await communicator.send_json_to({'type': 'clock_start'})
+    ping = await communicator.receive_json_from()
+    assert ping['type'] == 'ping'
+    await communicator.send_json_to({'type': 'pong', 'id': ping['id'], 'client_time': ping['server_time'] + 30})
+    estimate = await communicator.receive_json_from()
+    assert estimate['type'] == 'clock'
+    assert 29.9 < estimate['offset'] <= 30
+
+    # Unknown pings are ignored
+    await communicator.send_json_to({'type': 'pong', 'id': 999, 'client_time': 1})
+    await communicator.send_json_to({'type': 'position', 'timestamp': 52.0, 'client_time': ping['server_time'] + 30})
+    frame = await communicator.receive_json_from()
+    while frame['type'] == 'ping':
+        frame = await communicator.receive_json_from()
+    assert frame == {'type': 'drift_correction', 'action': 'seek', 'position': 50.0, 'server_time': frame['server_time'], 'drift': 2.0}
+    await communicator.disconnect()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import Mock, patch
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from apps.watchparty import emotes
+from apps.watchparty.models import Room
+from content.models import Anime, Season, Episode
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+class EmoteWindowTests(SimpleTestCase):
+    def test_clean(self):
+        self.assertEqual(emotes.clean(' 🔥 '), '🔥')
+        for bad in (None, 5, '', '   ', 'x' * 50, ['🔥']):
+            self.assertIsNone(emotes.clean(bad))
+
+    def check_window(self):
+        self.assertTrue(emotes.add('room', '🔥'))
+        for emote in ['🔥', '😂', '🔥']:
+            self.assertFalse(emotes.add('room', emote))
+        self.assertEqual(emotes.take('room'), {'🔥': 3, '😂': 1})
+        self.assertEqual(emotes.take('room'), {})
+
+    def test_window_in_process(self):
+        with patch.object(emotes, 'get_redis_connection', return_value=None):
+            self.check_window()
+            # The next emote opens a new window
+            self.assertTrue(emotes.add('room', '🔥'))
+            emotes.take('room')
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_window_in_redis(self):
+        redis = fakeredis.FakeRedis()
+        with patch.object(emotes, 'get_redis_connection', return_value=redis):
+            self.check_window()
+            # The window stays claimed until it times out, even once flushed
+            self.assertFalse(emotes.add('room', '🔥'))
+            redis.delete('wp:emotes:window:room')
+            self.assertTrue(emotes.add('room', '🔥'))
+
+    @override_settings(WATCHPARTY_EMOTE_MAX_TYPES=2)
+    def test_burst_keeps_most_frequent_emotes(self):
+        with patch.object(emotes, 'get_redis_connection', return_value=None):
+            for emote, count in [('a', 1), ('b', 5), ('c', 3)]:
+                for _ in range(count):
+                    emotes.add('room', emote)
+            self.assertEqual(emotes.take('room'), {'b': 5, 'c': 3})
+
+
+@sync_to_async
+def create_room(viewers):
+    users = [User.objects.create_user(username=f'user{i}', password='p') for i in range(viewers)]
+    season = Season.objects.create(anime=Anime.objects.create(title='Bursty'), number=1)
+    return users, Room.objects.create(host=users[0], episode=Episode.objects.create(season=season, number=1))
+
+
+@pytest.mark.skipif(fakeredis is None, reason="fakeredis not installed")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_room_gets_one_burst_per_window():
+    cache.clear()
+    users, room = await create_room(20)
+    from aniscrap_core.asgi import application
+    with patch.object(emotes, 'get_redis_connection', Mock(return_value=fakeredis.FakeRedis())):
+        communicators = []
+        for user in users:
+            communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+            communicator.scope["user"] = user
+            connected, _ = await communicator.connect()
+            assert connected
+            communicators.append(communicator)
+        for communicator in communicators:
+            while not await communicator.receive_nothing(timeout=0.05):
+                await communicator.receive_json_from()
+
+        # 20 viewers x 5 emotes within one window
+        for communicator in communicators:
+            for emote in ['🔥', '🔥', '😂', '🔥', '😭']:
+                await communicator.send_json_to({'type': 'emote', 'emote': emote})
+
+        for communicator in communicators:
+            bursts = []
+            while not await communicator.receive_nothing(timeout=0.5):
+                bursts.append(await communicator.receive_json_from())
+            assert bursts == [{'type': 'emote_burst', 'emotes': {'🔥': 60, '😂': 20, '😭': 20}, 'window_ms': 250}]
+        for communicator in communicators:
+            await communicator.disconnect()
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from apps.watchparty import playback
+from apps.watchparty.models import Room
+from content.models import Anime, Season, Episode
+
+User = get_user_model()
+
+
+class PlaybackStateTests(SimpleTestCase):
+    def test_client_sync_is_validated(self):
+        state = playback.from_client({'timestamp': '12.5', 'state': 'playing', 'rate': 16}, 7)
+        self.assertEqual((state['timestamp'], state['rate'], state['sender_id']), (12.5, playback.MAX_RATE, 7))
+        for bad in [{'timestamp': 1, 'state': 'rewinding'}, {'timestamp': -1, 'state': 'paused'},
+                    {'timestamp': 'nan', 'state': 'paused'}, {'timestamp': 'inf', 'state': 'playing'},
+                    {'timestamp': 1, 'state': 'playing', 'rate': 'nan'},
+                    {'timestamp': 1, 'state': 'playing', 'rate': '-inf'}, {'state': 'paused'}]:
+            self.assertIsNone(playback.from_client(bad, 7))
+
+    def test_playing_state_is_extrapolated(self):
+        state = {'timestamp': 100.0, 'state': 'playing', 'rate': 2.0, 'sender_id': 1, 'server_time': 10.0}
+        self.assertEqual(playback.extrapolate(state, now=13.0)['timestamp'], 106.0)
+        paused = dict(state, state='paused')
+        self.assertEqual(playback.extrapolate(paused, now=13.0)['timestamp'], 100.0)
+
+
+@sync_to_async
+def create_room():
+    host = User.objects.create_user(username='host', password='p')
+    viewer = User.objects.create_user(username='viewer', password='p')
+    season = Season.objects.create(anime=Anime.objects.create(title='Synced'), number=1)
+    return host, viewer, Room.objects.create(host=host, episode=Episode.objects.create(season=season, number=1))
+
+
+async def join(room, user):
+    from aniscrap_core.asgi import application
+    communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+    communicator.scope["user"] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    return communicator
+
+
+async def frames_of_type(communicator, msg_type, timeout=0.5):
+    frames = []
+    while not await communicator.receive_nothing(timeout=timeout):
+        frame = await communicator.receive_json_from()
+        if frame['type'] == msg_type:
+            frames.append(frame)
+    return frames
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_seek_bursts_are_coalesced_to_the_tick():
+    cache.clear()
+    host, viewer, room = await create_room()
+    host_comm = await join(room, host)
+    viewer_comm = await join(room, viewer)
+    await frames_of_type(viewer_comm, 'video_sync', timeout=0.1)
+
+    for timestamp in range(10):
+        await host_comm.send_json_to({'type': 'sync', 'timestamp': timestamp, 'state': 'paused'})
+
+    # The first seek goes out at once, the rest collapse into the latest one
+    syncs = await frames_of_type(viewer_comm, 'video_sync')
+    assert [frame['timestamp'] for frame in syncs] == [0, 9]
+
+    await host_comm.disconnect()
+    await viewer_comm.disconnect()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_late_joiner_gets_the_current_position():
+    cache.clear()
+    host, viewer, room = await create_room()
+    host_comm = await join(room, host)
+    await host_comm.send_json_to({'type': 'sync', 'timestamp': 100, 'state': 'playing'})
+    await asyncio.sleep(0.2)
+
+    viewer_comm = await join(room, viewer)
+    [snapshot] = await frames_of_type(viewer_comm, 'video_sync', timeout=0.1)
+    assert snapshot['sender_id'] == host.id
+    assert snapshot['state'] == 'playing'
+    # Moved on by the time spent waiting
+    assert 100.2 <= snapshot['timestamp'] < 105
+
+    await host_comm.disconnect()
+    await viewer_comm.disconnect()
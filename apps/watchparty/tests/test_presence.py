@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import Mock, patch
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from apps.watchparty import presence
+from apps.watchparty.models import Room, Participant
+from content.models import Anime, Season, Episode
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+def create_room(usernames, **kwargs):
+    users = [User.objects.create_user(username=name, password='p') for name in usernames]
+    season = Season.objects.create(anime=Anime.objects.create(title='Presence'), number=1)
+    episode = Episode.objects.create(season=season, number=1)
+    return users, Room.objects.create(host=users[0], episode=episode, **kwargs)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class PresenceTests(TestCase):
+    def setUp(self):
+        (self.host, self.alice, self.bob), self.room = create_room(['host', 'alice', 'bob'])
+        self.redis = fakeredis.FakeRedis()
+        self.clock = Mock(time=Mock(return_value=1000.0))
+        for target, value in [('get_redis_connection', Mock(return_value=self.redis)), ('time', self.clock)]:
+            patcher = patch.object(presence, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_capacity_is_claimed_atomically(self):
+        self.assertEqual(presence.join(self.room.uuid, self.host, 2, bypass_capacity=True), (True, True, []))
+        self.assertEqual(presence.join(self.room.uuid, self.alice, 2), (True, True, []))
+        self.assertEqual(presence.join(self.room.uuid, self.bob, 2), (False, False, []))
+        # A second tab of a member doesn't need a seat
+        self.assertEqual(presence.join(self.room.uuid, self.alice, 2), (True, False, []))
+
+        self.assertEqual(
+            sorted(m['user__username'] for m in presence.members(self.room.uuid)), ['alice', 'host']
+        )
+        # History rows are written by the task
+        self.assertEqual(Participant.objects.filter(room=self.room, is_online=True).count(), 2)
+
+    def test_user_leaves_with_their_last_connection(self):
+        presence.join(self.room.uuid, self.alice, 0)
+        presence.join(self.room.uuid, self.alice, 0)
+        self.assertFalse(presence.leave(self.room.uuid, self.alice))
+        self.assertTrue(presence.leave(self.room.uuid, self.alice))
+        self.assertFalse(presence.leave(self.room.uuid, self.alice))
+
+        self.assertEqual(presence.members(self.room.uuid), [])
+        self.assertFalse(Participant.objects.get(room=self.room, user=self.alice).is_online)
+
+    def test_members_without_heartbeat_expire(self):
+        presence.join(self.room.uuid, self.alice, 2)
+        self.clock.time.return_value += 30
+        presence.join(self.room.uuid, self.host, 2, bypass_capacity=True)
+        self.clock.time.return_value += 40
+
+        # alice's worker died; her seat is freed on the next join
+        self.assertEqual(presence.members(self.room.uuid), [presence.member(self.host)])
+        self.assertEqual(presence.join(self.room.uuid, self.bob, 2), (True, True, [self.alice.id]))
+        self.assertFalse(Participant.objects.get(room=self.room, user=self.alice).is_online)
+
+        # Heartbeats sweep lapsed members too, and bring back a swept one that is still connected
+        self.clock.time.return_value += 100
+        self.assertEqual(presence.heartbeat(self.room.uuid, self.bob), (False, [self.host.id]))
+        self.assertEqual(presence.heartbeat(self.room.uuid, self.alice), (True, []))
+        self.assertEqual(sorted(m['user__username'] for m in presence.members(self.room.uuid)), ['alice', 'bob'])
+        self.assertTrue(Participant.objects.get(room=self.room, user=self.alice).is_online)
+
+    def test_catalogue_edits_keep_room_members(self):
+        with patch.object(cache, 'clear', side_effect=AssertionError("cache.clear() would drop shared Redis state")):
+            presence.join(self.room.uuid, self.host, 2, bypass_capacity=True)
+            presence.join(self.room.uuid, self.alice, 2)
+            self.room.episode.save()
+            self.room.episode.season.anime.save()
+            # The room is still full
+            self.assertEqual(presence.join(self.room.uuid, self.bob, 2), (False, False, []))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_joins_and_leaves_are_broadcast_as_deltas():
+    (host, viewer), room = await sync_to_async(create_room)(['host', 'viewer'])
+    from aniscrap_core.asgi import application
+
+    async def join(user):
+        communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator
+
+    with patch.object(presence, 'get_redis_connection', return_value=fakeredis.FakeRedis()):
+        host_comm = await join(host)
+        frames = [await host_comm.receive_json_from() for _ in range(2)]
+        assert frames[0] == {'type': 'participants_update', 'participants': [presence.member(host)]}
+
+        viewer_comm = await join(viewer)
+        assert await host_comm.receive_json_from() == {'type': 'participant_joined', 'participant': presence.member(viewer)}
+        assert (await host_comm.receive_json_from())['message'] == 'viewer joined the party.'
+        frames = [await viewer_comm.receive_json_from() for _ in range(2)]
+        assert len(frames[0]['participants']) == 2
+
+        await viewer_comm.disconnect()
+        assert await host_comm.receive_json_from() == {'type': 'participant_left', 'user_id': viewer.id}
+        assert await sync_to_async(presence.members)(room.uuid) == [presence.member(host)]
+        await host_comm.disconnect()
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db.backends.utils import CursorWrapper
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.watchparty import room_state as rooms
+from apps.watchparty.models import Room
+from content.models import Anime, Season, Episode
+
+User = get_user_model()
+
+
+@contextmanager
+def count_queries():
+    # Consumers query from worker threads, so count at the cursor level
+    executed = []
+    original = CursorWrapper.execute
+
+    def execute(cursor, sql, params=None):
+        executed.append(sql)
+        return original(cursor, sql, params)
+
+    with patch.object(CursorWrapper, 'execute', execute):
+        yield executed
+
+
+@sync_to_async
+def create_room(**kwargs):
+    host = User.objects.create_user(username='host', password='p')
+    viewer = User.objects.create_user(username='viewer', password='p')
+    season = Season.objects.create(anime=Anime.objects.create(title='Cached'), number=1)
+    episode = Episode.objects.create(season=season, number=1)
+    return host, viewer, Room.objects.create(host=host, episode=episode, **kwargs)
+
+
+async def join(room, user):
+    from aniscrap_core.asgi import application
+    communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+    communicator.scope["user"] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    return communicator
+
+
+async def drain(communicator):
+    while not await communicator.receive_nothing(timeout=0.1):
+        await communicator.receive_from()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_room_is_loaded_once_and_sync_skips_the_db():
+    host, viewer, room = await create_room()
+
+    with patch('apps.watchparty.room_state.load', wraps=rooms.load) as load:
+        host_comm = await join(room, host)
+        viewer_comm = await join(room, viewer)
+    assert load.call_count == 1
+    await drain(host_comm)
+    await drain(viewer_comm)
+
+    with count_queries() as executed:
+        for timestamp in range(5):
+            await host_comm.send_to(text_data=json.dumps({'type': 'sync', 'timestamp': timestamp, 'state': 'paused'}))
+            event = json.loads(await viewer_comm.receive_from())
+            assert (event['type'], event['timestamp']) == ('video_sync', timestamp)
+            # Wait out the sync tick so nothing is coalesced
+            await asyncio.sleep(0.3)
+        # Viewers still can't drive playback
+        await drain(host_comm)
+        await viewer_comm.send_to(text_data=json.dumps({'type': 'sync', 'timestamp': 99, 'state': 'paused'}))
+        assert await host_comm.receive_nothing(timeout=0.1)
+    assert executed == []
+
+    await host_comm.disconnect()
+    await viewer_comm.disconnect()
+    assert rooms.get(room.uuid) is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_room_updates_reach_connected_consumers():
+    host, viewer, room = await create_room(max_participants=2)
+    viewer_comm = await join(room, viewer)
+    await drain(viewer_comm)
+
+    client = APIClient()
+    client.force_authenticate(user=host)
+    url = reverse('room-detail', kwargs={'pk': room.uuid})
+    response = await sync_to_async(client.patch)(url, {'max_participants': 5}, format='json')
+    assert response.status_code == 200
+    assert await viewer_comm.receive_nothing(timeout=0.1)
+    assert rooms.get(room.uuid).max_participants == 5
+
+    # Deactivating the room closes its sockets
+    response = await sync_to_async(client.patch)(url, {'is_active': False}, format='json')
+    assert response.status_code == 200
+    assert (await viewer_comm.receive_output())['type'] == 'websocket.close'
+    await viewer_comm.disconnect()
+    assert rooms.get(room.uuid) is None
@@ -53,18 +53,12 @@ async def test_emote_dos_rate_limiting():
             "emote": emote_payload
         })
 
-    # Receive Broadcast
+    # Receive Broadcast (aggregated into bursts)
     received_emotes = 0
-    import asyncio
-    try:
-        while True:
-            response = await communicator.receive_json_from(timeout=1.0)
-            if response["type"] == "emote_rain":
-                received_emotes += 1
-            if received_emotes == 10:
-                break
-    except asyncio.TimeoutError:
-        pass
+    while not await communicator.receive_nothing(timeout=1.0):
+        response = await communicator.receive_json_from()
+        if response["type"] == "emote_burst":
+            received_emotes += response["emotes"].get(emote_payload, 0)
 
     assert received_emotes == 10
 
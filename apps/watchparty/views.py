@@ -6,6 +6,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 from drf_spectacular.types import OpenApiTypes
 from .models import Room
 from .serializers import RoomSerializer
+from .room_state import publish_room_state, room_state
 from .permissions import IsHostOrReadOnly
 
 @extend_schema_view(
@@ -44,13 +45,17 @@ class RoomViewSet(viewsets.ModelViewSet):
         if self.request.user != serializer.instance.host:
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You do not have permission to edit this room.")
-        serializer.save()
+        room = serializer.save()
+        # Connected consumers cache the room; hand them the new state
+        publish_room_state(room.uuid, room_state(room))
 
     def perform_destroy(self, instance):
         if self.request.user != instance.host:
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You do not have permission to delete this room.")
+        room_uuid = instance.uuid
         instance.delete()
+        publish_room_state(room_uuid, None)
 
     @extend_schema(summary="List rooms hosted by the current user")
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -1,3 +1,24 @@
 from django.contrib import admin
+from django.contrib.admin import ModelAdmin, TabularInline
+from .models import RevenueDistribution, RevenueShare
 
-# Register your models here.
+
+class RevenueShareInline(TabularInline):
+    model = RevenueShare
+    fields = ('user', 'role', 'fansub_group', 'units', 'amount')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(RevenueDistribution)
+class RevenueDistributionAdmin(ModelAdmin):
+    list_display = ('id', 'created_at', 'total_revenue', 'encoder_pool', 'fansub_pool', 'watch_seconds')
+    readonly_fields = ('created_at', 'total_revenue', 'encoder_pool', 'fansub_pool', 'from_watch_log_id', 'to_watch_log_id', 'watch_seconds')
+    inlines = [RevenueShareInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,128 @@
+"""
+Incremental revenue distribution.
+
+Each run pays out the successful, undistributed ShopierPayments: 35% to
+encoders and 20% to fansub group owners, in proportion to the watch time of
+the episodes they provide. Only WatchLog rows past the revenue watermark are
+counted, so every watched second is attributed exactly once; they are summed
+per episode in SQL, so memory is O(episodes) rather than O(logs). Ids newer
+than users.rollups.settled_position wait for a later run, so a row still
+being committed isn't passed over.
+
+Every run is recorded in the RevenueDistribution / RevenueShare ledger and
+credited through the wallet ledger (users.wallet), one entry per recipient
+keyed by run, so a retried run can't pay anyone twice.
+"""
+from decimal import Decimal, ROUND_DOWN
+from django.db import transaction
+from django.db.models import Sum
+from content.models import VideoFile
+from users.models import WatchLog, Watermark
+from users.wallet import Entry, post_transactions
+from users.rollups import REVENUE_WATERMARK, settled_position
+from .models import ShopierPayment, RevenueDistribution, RevenueShare
+
+ENCODER_RATE = Decimal('0.35')
+FANSUB_RATE = Decimal('0.20')
+CENT = Decimal('0.01')
+UNIT = Decimal('0.0001')
+
+
+def provider_units(episode_seconds, episode_ids=None):
+    """
+    Splits each episode's watch seconds evenly across its video files.
+    episode_ids (e.g. a subquery) defaults to the keys of episode_seconds.
+    Returns ({(uploader_id, None): units}, {(owner_id, group_id): units}).
+    """
+    providers = {}
+    rows = (
+        VideoFile.objects.filter(episode_id__in=list(episode_seconds) if episode_ids is None else episode_ids)
+        .values_list('episode_id', 'uploader_id', 'fansub_group_id', 'fansub_group__owner_id')
+    )
+    for episode_id, uploader_id, group_id, owner_id in rows.iterator():
+        providers.setdefault(episode_id, []).append((uploader_id, group_id, owner_id))
+
+    encoder_units, fansub_units = {}, {}
+    for episode_id, videos in providers.items():
+        share = Decimal(episode_seconds[episode_id]) / len(videos)
+        for uploader_id, group_id, owner_id in videos:
+            if uploader_id:
+                key = (uploader_id, None)
+                encoder_units[key] = encoder_units.get(key, 0) + share
+            if group_id:
+                # Groups without an owner still dilute the pool, as before
+                key = (owner_id, group_id)
+                fansub_units[key] = fansub_units.get(key, 0) + share
+    return encoder_units, fansub_units
+
+
+def _shares(distribution, role, units, pool):
+    total = sum(units.values())
+    if not total:
+        return []
+    return [
+        RevenueShare(
+            distribution=distribution, role=role, user_id=user_id, fansub_group_id=group_id,
+            units=amount_units.quantize(UNIT),
+            amount=(pool * amount_units / total).quantize(CENT, rounding=ROUND_DOWN),
+        )
+        for (user_id, group_id), amount_units in units.items()
+        if user_id
+    ]
+
+
+def distribute_revenue():
+    """
+    Distributes pending revenue over the watch time since the last run.
+    Returns the RevenueDistribution, or None when there was nothing to pay
+    out (revenue then waits for the next run).
+    """
+    with transaction.atomic():
+        watermark, _ = Watermark.objects.select_for_update().get_or_create(name=REVENUE_WATERMARK)
+        payments = list(
+            ShopierPayment.objects.select_for_update()
+            .filter(status='success', is_distributed=False)
+            .values_list('id', 'amount')
+        )
+        total_revenue = sum((amount for _, amount in payments), Decimal(0))
+        if not total_revenue:
+            return None
+
+        # Ids that may still be committing wait for the next run
+        last_id = max(settled_position(REVENUE_WATERMARK), watermark.position)
+        period = WatchLog.objects.filter(id__gt=watermark.position, id__lte=last_id)
+        episode_seconds = dict(period.values('episode_id').annotate(seconds=Sum('duration')).values_list('episode_id', 'seconds'))
+        encoder_units, fansub_units = provider_units(episode_seconds, period.values('episode_id'))
+
+        from_id = watermark.position
+        watermark.position = last_id
+        watermark.save(update_fields=['position', 'updated_at'])
+        if not encoder_units and not fansub_units:
+            return None
+
+        distribution = RevenueDistribution.objects.create(
+            total_revenue=total_revenue,
+            encoder_pool=(total_revenue * ENCODER_RATE).quantize(CENT, rounding=ROUND_DOWN),
+            fansub_pool=(total_revenue * FANSUB_RATE).quantize(CENT, rounding=ROUND_DOWN),
+            from_watch_log_id=from_id,
+            to_watch_log_id=last_id,
+            watch_seconds=sum(episode_seconds.values()),
+        )
+        shares = (
+            _shares(distribution, 'encoder', encoder_units, distribution.encoder_pool)
+            + _shares(distribution, 'fansub', fansub_units, distribution.fansub_pool)
+        )
+        RevenueShare.objects.bulk_create(shares)
+
+        credits = {}
+        for share in shares:
+            credits[share.user_id] = credits.get(share.user_id, 0) + share.amount
+        post_transactions([
+            Entry(user_id, amount, 'revenue', f'revenue:{distribution.id}:{user_id}', f'Revenue distribution #{distribution.id}')
+            for user_id, amount in credits.items()
+        ])
+
+        ShopierPayment.objects.filter(id__in=[payment_id for payment_id, _ in payments]).update(
+            is_distributed=True, distribution=distribution,
+        )
+    return distribution
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_initial'),
+        ('content', '0018_episode_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueDistribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('encoder_pool', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fansub_pool', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('from_watch_log_id', models.BigIntegerField()),
+                ('to_watch_log_id', models.BigIntegerField()),
+                ('watch_seconds', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='shopierpayment',
+            name='distribution',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='billing.revenuedistribution'),
+        ),
+        migrations.CreateModel(
+            name='RevenueShare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('encoder', 'Encoder'), ('fansub', 'Fansub Group')], max_length=10)),
+                ('units', models.DecimalField(decimal_places=4, help_text='Watch seconds attributed', max_digits=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('distribution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shares', to='billing.revenuedistribution')),
+                ('fansub_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='revenue_shares', to='content.fansubgroup')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='revenue_shares', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'distribution'], name='billing_rev_user_id_d34242_idx')],
+            },
+        ),
+    ]
@@ -24,6 +24,43 @@ class ShopierPayment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     is_distributed = models.BooleanField(default=False)
+    distribution = models.ForeignKey('RevenueDistribution', on_delete=models.SET_NULL, null=True, blank=True, related_name='payments')
 
     def __str__(self):
         return f"{self.user} - {self.amount} - {self.status}"
+
+class RevenueDistribution(models.Model):
+    """
+    One run of billing.distribution: the revenue paid out and the WatchLog
+    id range (from_watch_log_id, to_watch_log_id] its shares are based on.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2)
+    encoder_pool = models.DecimalField(max_digits=12, decimal_places=2)
+    fansub_pool = models.DecimalField(max_digits=12, decimal_places=2)
+    from_watch_log_id = models.BigIntegerField()
+    to_watch_log_id = models.BigIntegerField()
+    watch_seconds = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Distribution #{self.pk}: {self.total_revenue}"
+
+class RevenueShare(models.Model):
+    ROLE_CHOICES = (
+        ('encoder', 'Encoder'),
+        ('fansub', 'Fansub Group'),
+    )
+    distribution = models.ForeignKey(RevenueDistribution, on_delete=models.CASCADE, related_name='shares')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='revenue_shares')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    fansub_group = models.ForeignKey('content.FansubGroup', on_delete=models.SET_NULL, null=True, blank=True, related_name='revenue_shares')
+    units = models.DecimalField(max_digits=20, decimal_places=4, help_text=_("Watch seconds attributed"))
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'distribution']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.role}): {self.amount}"
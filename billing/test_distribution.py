@@ -0,0 +1,107 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from users.models import User, WatchLog, Wallet, Watermark
+from users.rollups import ROLLUP_WATERMARK, REVENUE_WATERMARK, prune_watch_logs
+from content.models import Anime, Season, Episode, VideoFile, FansubGroup
+from billing.models import ShopierPayment, RevenueDistribution, RevenueShare
+from billing.distribution import distribute_revenue
+
+
+@override_settings(WATERMARK_LAG_SECONDS=0)
+class RevenueDistributionTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='password')
+        self.encoder_a = User.objects.create_user(username='encoder_a', password='password')
+        self.encoder_b = User.objects.create_user(username='encoder_b', password='password')
+        self.owner_a = User.objects.create_user(username='owner_a', password='password')
+        self.owner_b = User.objects.create_user(username='owner_b', password='password')
+        group_a = FansubGroup.objects.create(name='A', owner=self.owner_a)
+        group_b = FansubGroup.objects.create(name='B', owner=self.owner_b)
+
+        season = Season.objects.create(anime=Anime.objects.create(title='Paid'), number=1)
+        self.shared = Episode.objects.create(season=season, number=1)
+        self.solo = Episode.objects.create(season=season, number=2)
+        VideoFile.objects.create(episode=self.shared, fansub_group=group_a, uploader=self.encoder_a, quality='1080p', hls_path='a', encryption_key='k')
+        VideoFile.objects.create(episode=self.shared, fansub_group=group_b, uploader=self.encoder_b, quality='720p', hls_path='b', encryption_key='k')
+        VideoFile.objects.create(episode=self.solo, fansub_group=group_a, uploader=self.encoder_a, quality='1080p', hls_path='c', encryption_key='k')
+
+    def _pay(self, amount, transaction_id):
+        return ShopierPayment.objects.create(user=self.viewer, amount=Decimal(amount), transaction_id=transaction_id, status='success')
+
+    def _balance(self, user):
+        return Wallet.objects.get(user=user).balance
+
+    def test_shares_follow_watch_time_and_are_recorded(self):
+        payment = self._pay('100.00', 'ORD-1')
+        WatchLog.objects.create(user=self.viewer, episode=self.shared, duration=100)
+        WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=50)
+
+        distribution = distribute_revenue()
+
+        # Encoders share 35.00 by 100:50 units, fansub owners 20.00 by 100:50
+        self.assertEqual(self._balance(self.encoder_a), Decimal('23.33'))
+        self.assertEqual(self._balance(self.encoder_b), Decimal('11.66'))
+        self.assertEqual(self._balance(self.owner_a), Decimal('13.33'))
+        self.assertEqual(self._balance(self.owner_b), Decimal('6.66'))
+
+        self.assertEqual(distribution.watch_seconds, 150)
+        self.assertEqual(distribution.shares.count(), 4)
+        payment.refresh_from_db()
+        self.assertTrue(payment.is_distributed)
+        self.assertEqual(payment.distribution, distribution)
+
+    def test_each_run_only_counts_new_watch_time(self):
+        self._pay('100.00', 'ORD-1')
+        WatchLog.objects.create(user=self.viewer, episode=self.shared, duration=100)
+        first = distribute_revenue()
+
+        self.assertIsNone(distribute_revenue())
+
+        self._pay('10.00', 'ORD-2')
+        WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=30)
+        second = distribute_revenue()
+
+        self.assertEqual(second.from_watch_log_id, first.to_watch_log_id)
+        self.assertEqual(set(second.shares.values_list('user__username', flat=True)), {'encoder_a', 'owner_a'})
+        self.assertEqual(self._balance(self.encoder_a), Decimal('17.50') + Decimal('3.50'))
+        self.assertEqual(self._balance(self.encoder_b), Decimal('17.50'))
+
+    @override_settings(WATERMARK_LAG_SECONDS=300)
+    def test_watch_time_still_committing_waits_for_a_later_run(self):
+        self._pay('100.00', 'ORD-1')
+        log = WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=10)
+        self.assertIsNone(distribute_revenue())
+
+        Watermark.objects.filter(name=f'{REVENUE_WATERMARK}:seen').update(updated_at=timezone.now() - timedelta(minutes=10))
+        distribution = distribute_revenue()
+        self.assertEqual(distribution.to_watch_log_id, log.id)
+        self.assertEqual(self._balance(self.encoder_a), Decimal('35.00'))
+
+    def test_wallet_credit_keeps_concurrent_changes(self):
+        Wallet.objects.create(user=self.encoder_a, balance=Decimal('5.00'))
+        stale = Wallet.objects.get(user=self.encoder_a)
+        self._pay('100.00', 'ORD-1')
+        WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=10)
+        distribute_revenue()
+
+        # A save from a stale copy would drop the credit; the ledger still has it
+        self.assertEqual(self._balance(self.encoder_a), Decimal('40.00'))
+        self.assertEqual(RevenueShare.objects.get(user=self.encoder_a).amount, Decimal('35.00'))
+        self.assertEqual(stale.balance, Decimal('5.00'))
+
+    def test_no_revenue_leaves_watch_time_for_later(self):
+        WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=10)
+        self.assertIsNone(distribute_revenue())
+        self.assertFalse(RevenueDistribution.objects.exists())
+        self.assertFalse(Watermark.objects.filter(name=REVENUE_WATERMARK, position__gt=0).exists())
+
+    def test_prune_keeps_undistributed_watch_logs(self):
+        old = timezone.now() - timedelta(days=90)
+        logs = [WatchLog.objects.create(user=self.viewer, episode=self.solo, duration=10, watched_at=old) for _ in range(3)]
+        Watermark.objects.create(name=ROLLUP_WATERMARK, position=logs[-1].id)
+        Watermark.objects.create(name=REVENUE_WATERMARK, position=logs[0].id)
+
+        self.assertEqual(prune_watch_logs(retention_days=60), 1)
+        self.assertEqual(WatchLog.objects.count(), 2)
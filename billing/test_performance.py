@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.utils import CaptureQueriesContext
 from django.db import connection, reset_queries
 from decimal import Decimal
@@ -7,6 +7,7 @@ from content.models import Anime, Season, Episode, VideoFile, FansubGroup
 from billing.models import ShopierPayment
 from billing.tasks import calculate_revenue
 
+@override_settings(WATERMARK_LAG_SECONDS=0)
 class PerformanceTest(TestCase):
     def setUp(self):
         # Create Users
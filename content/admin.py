@@ -6,6 +6,7 @@ import requests
 import re
 import time
 from django.contrib.admin import ModelAdmin
+from core.pagination import ApproximateCountAdminMixin
 from .models import Anime, Season, Episode, FansubGroup, VideoFile, Subtitle
 from asgiref.sync import async_to_sync
 from scraper_module.services.jikan import jikan
@@ -112,7 +113,7 @@ class SeasonAdmin(ModelAdmin):
     search_fields = ('title',)
 
 @admin.register(Episode)
-class EpisodeAdmin(ModelAdmin):
+class EpisodeAdmin(ApproximateCountAdminMixin, ModelAdmin):
     list_display = ('season', 'number', 'title')
     list_select_related = ('season', 'season__anime')
     autocomplete_fields = ('season',)
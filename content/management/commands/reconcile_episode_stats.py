@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from content.services import reconcile_episode_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized episode counts on Season and Anime and fixes any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        seasons_fixed, animes_fixed = reconcile_episode_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled episode stats: {seasons_fixed} seasons and {animes_fixed} animes updated."
+        ))
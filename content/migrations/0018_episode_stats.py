@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_episode_stats(apps, schema_editor):
+    Anime = apps.get_model('content', 'Anime')
+    Season = apps.get_model('content', 'Season')
+    Episode = apps.get_model('content', 'Episode')
+
+    counts = dict(Episode.objects.values('season_id').annotate(count=Count('id')).values_list('season_id', 'count'))
+    latest = {}
+    for season_id, number, created_at in Episode.objects.order_by('created_at', 'number').values_list('season_id', 'number', 'created_at').iterator():
+        latest[season_id] = (number, created_at)
+
+    anime_stats = {}
+    seasons = list(Season.objects.filter(id__in=counts.keys()))
+    for season in seasons:
+        season.episode_count = counts[season.id]
+        season.latest_episode_number, season.latest_episode_at = latest[season.id]
+        total, number, created_at = anime_stats.get(season.anime_id, (0, None, None))
+        if created_at is None or season.latest_episode_at > created_at:
+            number, created_at = season.latest_episode_number, season.latest_episode_at
+        anime_stats[season.anime_id] = (total + season.episode_count, number, created_at)
+    Season.objects.bulk_update(seasons, ['episode_count', 'latest_episode_number', 'latest_episode_at'], batch_size=1000)
+
+    animes = list(Anime.objects.filter(id__in=anime_stats.keys()))
+    for anime in animes:
+        anime.episode_count, anime.latest_episode_number, anime.latest_episode_at = anime_stats[anime.id]
+    Anime.objects.bulk_update(animes, ['episode_count', 'latest_episode_number', 'latest_episode_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0017_merge_20260510_2029'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anime',
+            name='episode_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='latest_episode_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='latest_episode_number',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='episode_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='latest_episode_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='latest_episode_number',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['latest_episode_at'], name='content_ani_latest__cd3d94_idx'),
+        ),
+        migrations.RunPython(backfill_episode_stats, migrations.RunPython.noop),
+    ]
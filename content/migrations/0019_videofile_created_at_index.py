@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0018_episode_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['created_at'], name='content_vid_created_94865f_idx'),
+        ),
+    ]
@@ -61,6 +61,11 @@ class Anime(models.Model):
     total_episodes = models.PositiveIntegerField(null=True, blank=True)
     duration = models.CharField(max_length=50, blank=True, help_text=_("e.g., '24 min per ep'"))
     rating = models.CharField(max_length=50, blank=True, help_text=_("e.g., 'PG-13', 'R'"))
+
+    # Denormalized episode stats, maintained by content.signals
+    episode_count = models.PositiveIntegerField(default=0, editable=False)
+    latest_episode_number = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    latest_episode_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -75,6 +80,7 @@ class Anime(models.Model):
             models.Index(fields=['score']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['latest_episode_at']),
         ]
 
     def __str__(self):
@@ -161,6 +167,11 @@ class Season(models.Model):
     number = models.PositiveIntegerField()
     title = models.CharField(max_length=255, blank=True)
 
+    # Denormalized episode stats, maintained by content.signals
+    episode_count = models.PositiveIntegerField(default=0, editable=False)
+    latest_episode_number = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    latest_episode_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.anime.title} - Season {self.number}"
 
@@ -209,6 +220,11 @@ class VideoFile(models.Model):
     is_hardcoded = models.BooleanField(default=False, help_text=_("Disables Subtitle uploads if True"))
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"{self.episode} - {self.quality}"
 
@@ -0,0 +1,131 @@
+"""
+Coalesced new-episode notifications.
+
+A batch import can create dozens of episodes of one anime within seconds.
+Rather than one Notification, push and email per episode and subscriber, the
+Episode post_save signal only schedules notify_new_episodes_task for the
+anime, NOTIFICATION_COALESCE_WINDOW seconds out. That task sends a single
+"N new episodes of X" notification per subscriber for everything created
+since the previous run.
+
+What has already been announced is tracked per anime by a Watermark on the
+episode id, so correctness doesn't depend on the cache; the cache key only
+saves scheduling duplicate tasks. Runs are scheduled once the episode has
+committed, and only read ids up to users.rollups.settled_position, so an
+episode committing after a higher id was announced isn't skipped; a run
+that leaves episodes waiting to settle schedules the next one. Subscribers
+on the daily digest (User.notification_digest) get no email here.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from .models import Episode, Subscription
+
+
+def _watermark_name(anime_id):
+    return f'episode_notify:{anime_id}'
+
+
+def _scheduled_key(anime_id):
+    return f'episode_notify_scheduled_{anime_id}'
+
+
+# Shared by all anime: ids settle the same way whichever anime they belong to
+SETTLED_WATERMARK = 'episode_notify'
+
+
+def coalesce_window():
+    return getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 300)
+
+
+def watch_link(episode):
+    try:
+        return reverse('watch', args=[episode.id])
+    except Exception:
+        # Fallback if route is missing
+        return f"/watch/{episode.id}/"
+
+
+def episode_batch_text(anime, episodes):
+    """
+    (title, message) of the notification announcing `episodes`.
+    """
+    if len(episodes) == 1:
+        return (
+            f"New Episode: {anime.title}",
+            f"Episode {episodes[0].number} of {anime.title} is now available!",
+        )
+    return (
+        f"New Episodes: {anime.title}",
+        f"{len(episodes)} new episodes of {anime.title} are now available!",
+    )
+
+
+def _schedule(anime_id, countdown):
+    from .tasks import notify_new_episodes_task  # Avoid circular import
+
+    if countdown <= 0:
+        notify_new_episodes_task.delay(anime_id)
+    elif cache.add(_scheduled_key(anime_id), True, timeout=countdown):
+        notify_new_episodes_task.apply_async((anime_id,), countdown=countdown)
+
+
+def schedule_episode_notification(episode):
+    """
+    Queues the announcement of a freshly created, committed episode.
+    """
+    from users.models import Watermark  # Avoid circular import
+
+    anime_id = episode.season.anime_id
+    # First new episode seen for this anime: announce from here, not the back catalogue
+    Watermark.objects.get_or_create(name=_watermark_name(anime_id), defaults={'position': episode.id - 1})
+    _schedule(anime_id, coalesce_window())
+
+
+def notify_new_episodes(anime_id):
+    """
+    Announces the anime's settled episodes past its watermark with one
+    Notification and push per subscriber and one email batch. Returns the
+    episodes announced (empty when another run already covered them or none
+    has settled yet).
+    """
+    from users.models import Notification, Watermark  # Avoid circular import
+    from users.notifications import track_new_notifications
+    from users.rollups import settled_position
+    from .tasks import send_new_episodes_email_task, send_websocket_notifications_task
+
+    # Episodes created from here on schedule a new run
+    cache.delete(_scheduled_key(anime_id))
+
+    with transaction.atomic():
+        watermark, _ = Watermark.objects.select_for_update().get_or_create(name=_watermark_name(anime_id))
+        pending = Episode.objects.filter(season__anime_id=anime_id, id__gt=watermark.position)
+        settled = settled_position(SETTLED_WATERMARK, Episode)
+        if pending.filter(id__gt=settled).exists():
+            transaction.on_commit(lambda: _schedule(anime_id, getattr(settings, 'WATERMARK_LAG_SECONDS', 300)))
+        episodes = list(
+            pending.filter(id__lte=settled)
+            .select_related('season__anime')
+            .order_by('season__number', 'number')
+        )
+        if not episodes:
+            return []
+        watermark.position = max(e.id for e in episodes)
+        watermark.save(update_fields=['position', 'updated_at'])
+
+        anime = episodes[0].season.anime
+        title, message = episode_batch_text(anime, episodes)
+        link = watch_link(episodes[0])
+        user_ids = list(Subscription.objects.filter(anime_id=anime_id).values_list('user_id', flat=True))
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, title=title, message=message, link=link)
+            for user_id in user_ids
+        ])
+        track_new_notifications(notifications)
+
+    if notifications:
+        # Pushes go out from a background task to keep O(N) network calls off this one
+        send_websocket_notifications_task.delay(user_ids, title, message, link, [n.id for n in notifications])
+    send_new_episodes_email_task.delay([e.id for e in episodes])
+    return episodes
@@ -0,0 +1,37 @@
+"""
+Catalogue generation: a token replaced whenever an Anime or Episode changes.
+
+Cached catalogue pages are keyed on it, so a change makes every page built
+before it miss (old pages expire on their own) without cache.clear()
+wiping unrelated keys. Anything else derived from the catalogue, such as
+the badge check throttle, can record the generation it saw the same way.
+"""
+import uuid
+from functools import wraps
+from django.core.cache import cache
+from django.views.decorators.cache import cache_page
+
+GENERATION_KEY = 'content:catalogue_generation'
+
+
+def catalogue_generation():
+    return cache.get_or_set(GENERATION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_catalogue_generation():
+    # A fresh token rather than incr: an evicted counter restarting at an
+    # old number would bring old pages back
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def cache_catalogue_page(timeout, key_prefix):
+    """
+    cache_page for catalogue views, keyed on the current generation.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            prefix = f'{key_prefix}.{catalogue_generation()}'
+            return cache_page(timeout, key_prefix=prefix)(view)(request, *args, **kwargs)
+        return wrapper
+    return decorator
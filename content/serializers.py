@@ -72,7 +72,7 @@ class SeasonSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Season
-        fields = ['id', 'number', 'name', 'episodes']
+        fields = ['id', 'number', 'name', 'episode_count', 'latest_episode_number', 'episodes']
 
 class AnimeListSerializer(serializers.ModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
@@ -81,7 +81,8 @@ class AnimeListSerializer(serializers.ModelSerializer):
         model = Anime
         fields = [
             'id', 'mal_id', 'title', 'cover_image', 'score', 
-            'type', 'date_aired', 'genres', 'status', 'rating'
+            'type', 'date_aired', 'genres', 'status', 'rating',
+            'episode_count', 'latest_episode_number', 'latest_episode_at'
         ]
     
     date_aired = serializers.SerializerMethodField()
@@ -102,7 +103,8 @@ class AnimeDetailSerializer(serializers.ModelSerializer):
             'synopsis', 'cover_image', 'banner_image', 'score', 'rank',
             'popularity', 'members', 'studio', 'source', 'status',
             'aired_from', 'aired_to', 'total_episodes', 'duration',
-            'rating', 'genres', 'characters', 'seasons', 'is_subscribed'
+            'rating', 'genres', 'characters', 'seasons', 'is_subscribed',
+            'episode_count', 'latest_episode_number', 'latest_episode_at'
         ]
 
     def get_is_subscribed(self, obj):
@@ -0,0 +1,76 @@
+from django.db.models import Count, Sum
+from .models import Anime, Season, Episode
+
+EPISODE_STAT_FIELDS = ['episode_count', 'latest_episode_number', 'latest_episode_at']
+
+
+def refresh_season_episode_stats(season_id, anime_id=None):
+    """
+    Recomputes the denormalized episode stats of a season and its anime.
+    Uses the season_id index, so the cost does not grow with the catalog.
+    """
+    count = Episode.objects.filter(season_id=season_id).count()
+    latest = Episode.objects.filter(season_id=season_id).order_by('-created_at', '-number').values('number', 'created_at').first()
+    Season.objects.filter(pk=season_id).update(
+        episode_count=count,
+        latest_episode_number=latest['number'] if latest else None,
+        latest_episode_at=latest['created_at'] if latest else None,
+    )
+
+    if anime_id is None:
+        anime_id = Season.objects.filter(pk=season_id).values_list('anime_id', flat=True).first()
+    if anime_id is not None:
+        refresh_anime_episode_stats(anime_id)
+
+
+def refresh_anime_episode_stats(anime_id):
+    """
+    Rolls the per-season stats up to the anime.
+    """
+    seasons = Season.objects.filter(anime_id=anime_id)
+    total = seasons.aggregate(total=Sum('episode_count'))['total'] or 0
+    latest = seasons.filter(latest_episode_at__isnull=False).order_by('-latest_episode_at', '-latest_episode_number').values('latest_episode_number', 'latest_episode_at').first()
+    Anime.objects.filter(pk=anime_id).update(
+        episode_count=total,
+        latest_episode_number=latest['latest_episode_number'] if latest else None,
+        latest_episode_at=latest['latest_episode_at'] if latest else None,
+    )
+
+
+def reconcile_episode_stats(batch_size=1000):
+    """
+    Recomputes every Season and Anime episode stat with grouped queries and
+    writes back only the rows that drifted (e.g. after bulk_create imports).
+    Returns (seasons_fixed, animes_fixed).
+    """
+    # One grouped query for counts, one ordered scan of (season, number, created_at) for latest.
+    counts = dict(Episode.objects.values('season_id').annotate(count=Count('id')).values_list('season_id', 'count'))
+    latest = {}
+    for season_id, number, created_at in Episode.objects.order_by('created_at', 'number').values_list('season_id', 'number', 'created_at').iterator():
+        latest[season_id] = (number, created_at)
+
+    season_fixes = []
+    anime_stats = {}
+    for season in Season.objects.only('id', 'anime_id', *EPISODE_STAT_FIELDS).iterator():
+        count = counts.get(season.id, 0)
+        number, created_at = latest.get(season.id, (None, None))
+        if (season.episode_count, season.latest_episode_number, season.latest_episode_at) != (count, number, created_at):
+            season.episode_count, season.latest_episode_number, season.latest_episode_at = count, number, created_at
+            season_fixes.append(season)
+
+        total, a_number, a_created_at = anime_stats.get(season.anime_id, (0, None, None))
+        if created_at is not None and (a_created_at is None or (created_at, number) > (a_created_at, a_number)):
+            a_number, a_created_at = number, created_at
+        anime_stats[season.anime_id] = (total + count, a_number, a_created_at)
+
+    Season.objects.bulk_update(season_fixes, EPISODE_STAT_FIELDS, batch_size=batch_size)
+
+    anime_fixes = []
+    for anime in Anime.objects.only('id', *EPISODE_STAT_FIELDS).iterator():
+        stats = anime_stats.get(anime.id, (0, None, None))
+        if (anime.episode_count, anime.latest_episode_number, anime.latest_episode_at) != stats:
+            anime.episode_count, anime.latest_episode_number, anime.latest_episode_at = stats
+            anime_fixes.append(anime)
+
+    Anime.objects.bulk_update(anime_fixes, EPISODE_STAT_FIELDS, batch_size=batch_size)
+    return len(season_fixes), len(anime_fixes)
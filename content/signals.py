@@ -1,12 +1,12 @@
 import logging
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
-from django.urls import reverse
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Anime, Episode, Subscription, Genre, Season
-from .tasks import send_new_episode_email_task, send_websocket_notifications_task
+from .models import Anime, Episode, Genre, Season
+from .notifications import schedule_episode_notification
+from .page_cache import bump_catalogue_generation
+from .services import refresh_season_episode_stats, refresh_anime_episode_stats
 
 logger = logging.getLogger(__name__)
 
@@ -36,52 +36,38 @@ def clear_home_cache(sender, instance, **kwargs):
     cache.delete('home_latest_episodes')
     cache.delete(f'anime_{instance.season.anime.id}_seasons')
     # Invalidate cache pages
-    cache.clear()
+    bump_catalogue_generation()
+
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def update_episode_stats(sender, instance, **kwargs):
+    """
+    Keep the denormalized episode_count / latest_episode_* fields on Season
+    and Anime in sync. Drift from bulk_create is fixed by reconcile_episode_stats.
+    """
+    refresh_season_episode_stats(instance.season_id, instance.season.anime_id)
+
+@receiver(post_delete, sender=Season)
+def update_anime_episode_stats(sender, instance, **kwargs):
+    refresh_anime_episode_stats(instance.anime_id)
 
 @receiver(post_save, sender=Anime)
 @receiver(post_delete, sender=Anime)
 def clear_anime_cache(sender, instance, **kwargs):
     """
     Cache invalidation strategy: signal tabanlı (AnimeAdmin'de save signal -> cache clear)
-    Clear cache when an Anime is saved (created/updated) or deleted.
+    Clear cached pages when an Anime is saved (created/updated) or deleted.
     """
     logger.info(f"AnimeAdmin save signal -> cache clear triggered for Anime {instance.id}")
-    cache.clear()
+    cache.delete(f'anime_{instance.id}_seasons')
+    bump_catalogue_generation()
 
 @receiver(post_save, sender=Episode)
 def notify_subscribers(sender, instance, created, **kwargs):
     """
-    Notify subscribers when a new episode is released.
+    Notify subscribers when a new episode is released. Episodes created in
+    quick succession are announced together (see content.notifications).
     """
     if created:
-        from users.models import Notification  # Avoid circular import
-        anime = instance.season.anime
-        subscribers = Subscription.objects.filter(anime=anime).select_related('user')
-
-        notifications = []
-        try:
-            link = reverse('watch', args=[instance.id])
-        except Exception:
-            # Fallback if route is missing
-            link = f"/watch/{instance.id}/"
-
-        for sub in subscribers:
-            notifications.append(Notification(
-                user=sub.user,
-                title=f"New Episode: {anime.title}",
-                message=f"Episode {instance.number} of {anime.title} is now available!",
-                link=link
-            ))
-
-        if notifications:
-            Notification.objects.bulk_create(notifications)
-
-            # Send real-time notifications via WebSockets using a background task
-            # to prevent blocking the main thread with O(N) network operations.
-            user_ids = [sub.user.id for sub in subscribers]
-            title = f"New Episode: {anime.title}"
-            message = f"Episode {instance.number} of {anime.title} is now available!"
-            send_websocket_notifications_task.delay(user_ids, title, message, link)
-
-        # Trigger Email Task (Async)
-        send_new_episode_email_task.delay(instance.id)
+        # A task started before commit wouldn't see the episode
+        transaction.on_commit(lambda: schedule_episode_notification(instance))
@@ -328,52 +328,89 @@ def generate_thumbnails_batch(anime_id):
 # ==================== Email Notification Tasks ====================
 
 @shared_task
-def send_new_episode_email_task(episode_id):
+def notify_new_episodes_task(anime_id):
     """
-    Sends email notifications to all subscribers of the anime.
+    Sends the coalesced new-episode notifications for an anime.
     """
-    try:
-        episode = Episode.objects.select_related('season__anime').get(id=episode_id)
-        anime = episode.season.anime
-        subscribers = Subscription.objects.filter(anime=anime).select_related('user')
+    from .notifications import notify_new_episodes
+    episodes = notify_new_episodes(anime_id)
+    return f"Announced {len(episodes)} new episodes of Anime {anime_id}"
 
-        messages = []
-        subject = f"New Episode Available: {anime.title} - {episode.title or 'Episode ' + str(episode.number)}"
-        from_email = settings.DEFAULT_FROM_EMAIL
 
-        for sub in subscribers:
-            if sub.user.email:
-                message = f"Hello {sub.user.username},\n\nA new episode of {anime.title} is now available on AniScrap!\n\nWatch now: {settings.SITE_URL}/watch/{episode.id}\n\nEnjoy!\nThe AniScrap Team"
-                messages.append((subject, message, from_email, [sub.user.email]))
-
-        if messages:
-            send_mass_mail(messages, fail_silently=False)
+@shared_task
+def send_new_episodes_email_task(episode_ids):
+    """
+    Sends one email per subscriber about a batch of new episodes of one anime.
+    Subscribers on the daily digest are skipped.
+    """
+    episodes = list(
+        Episode.objects.filter(id__in=episode_ids)
+        .select_related('season__anime')
+        .order_by('season__number', 'number')
+    )
+    if not episodes:
+        return f"Episodes {episode_ids} not found."
+
+    first = episodes[0]
+    anime = first.season.anime
+    subscribers = Subscription.objects.filter(anime=anime, user__notification_digest=False).select_related('user')
+
+    if len(episodes) == 1:
+        subject = f"New Episode Available: {anime.title} - {first.title or 'Episode ' + str(first.number)}"
+        intro = f"A new episode of {anime.title} is now available on AniScrap!"
+    else:
+        subject = f"{len(episodes)} New Episodes Available: {anime.title}"
+        intro = f"{len(episodes)} new episodes of {anime.title} are now available on AniScrap!"
+    from_email = settings.DEFAULT_FROM_EMAIL
+
+    messages = []
+    for sub in subscribers:
+        if sub.user.email:
+            message = f"Hello {sub.user.username},\n\n{intro}\n\nWatch now: {settings.SITE_URL}/watch/{first.id}\n\nEnjoy!\nThe AniScrap Team"
+            messages.append((subject, message, from_email, [sub.user.email]))
+
+    if messages:
+        send_mass_mail(messages, fail_silently=False)
+
+    logger.info(f"Sent {len(messages)} notification emails for {len(episodes)} episodes of anime {anime.id}")
+    return f"Sent {len(messages)} emails for {len(episodes)} episodes"
 
-        logger.info(f"Sent {len(messages)} notification emails for episode {episode.id}")
-        return f"Sent {len(messages)} emails for Episode {episode.id}"
 
-    except Episode.DoesNotExist:
-        return f"Episode {episode_id} not found."
+@shared_task
+def send_new_episode_email_task(episode_id):
+    """
+    Sends email notifications to all subscribers of the anime.
+    Kept for messages queued before coalescing; new code uses send_new_episodes_email_task.
+    """
+    return send_new_episodes_email_task([episode_id])
 
 
 @shared_task
-def send_websocket_notifications_task(user_ids, title, message, link):
+def send_websocket_notifications_task(user_ids, title, message, link, notification_ids=None):
     """
     Sends WebSocket notifications to a batch of users in the background.
+    notification_ids (aligned with user_ids) become the sequence numbers
+    clients use to deduplicate against reconnect replays.
     """
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
+    from users.notifications import get_cached_unread_counts
 
     channel_layer = get_channel_layer()
-    for user_id in user_ids:
+    # Ship the new unread count with the push so clients don't poll for it
+    unread_counts = get_cached_unread_counts(user_ids)
+    notification_ids = notification_ids or [None] * len(user_ids)
+    for user_id, notification_id in zip(user_ids, notification_ids):
         group_name = f"user_{user_id}"
         async_to_sync(channel_layer.group_send)(
             group_name,
             {
                 'type': 'notification_message',
+                'id': notification_id,
                 'title': title,
                 'message': message,
                 'link': link,
+                'unread_count': unread_counts.get(user_id),
             }
         )
     logger.info(f"Sent {len(user_ids)} WebSocket notifications")
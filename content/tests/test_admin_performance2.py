@@ -22,7 +22,8 @@ class EpisodeAdminPerformanceTest(TestCase):
 
         self.client.get(url)
 
-        # 1 auth, 1 session, 2 counts, 1 main fetch = 5
-        with self.assertNumQueries(5):
+        # 1 auth, 1 session, 1 count, 1 main fetch = 4
+        # (ApproximateCountAdminMixin skips the separate full-result COUNT)
+        with self.assertNumQueries(4):
             response = self.client.get(url)
             self.assertEqual(response.status_code, 200)
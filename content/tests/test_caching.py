@@ -36,3 +36,12 @@ class TestCaching:
         Season.objects.create(anime=anime, number=2)
 
         assert cache.get(cache_key) is None
+
+    def test_anime_save_invalidates_cached_pages_only(self, client):
+        cache.set('unrelated', 'kept')
+        Anime.objects.create(title='Cached Anime')
+        assert client.get(reverse('anime-list')).json()['count'] == 1
+
+        Anime.objects.create(title='Fresh Anime')
+        assert client.get(reverse('anime-list')).json()['count'] == 2
+        assert cache.get('unrelated') == 'kept'
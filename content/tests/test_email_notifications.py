@@ -20,8 +20,9 @@ class NotificationEmailTests(TestCase):
 
     @patch('content.tasks.send_mass_mail')
     def test_email_sent_on_new_episode(self, mock_send_mail):
-        # Create a new episode
-        episode = Episode.objects.create(season=self.season, number=1, title='Pilot')
+        # Create a new episode; it is announced once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            episode = Episode.objects.create(season=self.season, number=1, title='Pilot')
 
         # Since CELERY_TASK_ALWAYS_EAGER is True, the task should run synchronously
 
@@ -49,7 +50,8 @@ class NotificationEmailTests(TestCase):
         Subscription.objects.create(user=user2, anime=self.anime)
 
         # Create episode
-        Episode.objects.create(season=self.season, number=2, title='Second')
+        with self.captureOnCommitCallbacks(execute=True):
+            Episode.objects.create(season=self.season, number=2, title='Second')
 
         # Should only send to self.user (who has email)
         args, kwargs = mock_send_mail.call_args
@@ -0,0 +1,60 @@
+from django.core.management import call_command
+from django.test import TestCase
+from content.models import Anime, Season, Episode
+from content.services import reconcile_episode_stats
+
+class EpisodeStatsTests(TestCase):
+    def setUp(self):
+        self.anime = Anime.objects.create(title='Counted Anime')
+        self.season1 = Season.objects.create(anime=self.anime, number=1)
+        self.season2 = Season.objects.create(anime=self.anime, number=2)
+
+    def test_signals_maintain_counts(self):
+        for i in range(3):
+            Episode.objects.create(season=self.season1, number=i + 1)
+        latest = Episode.objects.create(season=self.season2, number=1)
+
+        self.season1.refresh_from_db()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.season1.episode_count, 3)
+        self.assertEqual(self.season1.latest_episode_number, 3)
+        self.assertEqual(self.anime.episode_count, 4)
+        self.assertEqual(self.anime.latest_episode_number, 1)
+        self.assertEqual(self.anime.latest_episode_at, latest.created_at)
+
+    def test_delete_updates_counts(self):
+        ep = Episode.objects.create(season=self.season1, number=1)
+        Episode.objects.create(season=self.season2, number=1)
+        ep.delete()
+
+        self.season1.refresh_from_db()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.season1.episode_count, 0)
+        self.assertIsNone(self.season1.latest_episode_at)
+        self.assertEqual(self.anime.episode_count, 1)
+
+        self.season2.delete()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.episode_count, 0)
+        self.assertIsNone(self.anime.latest_episode_number)
+
+    def test_reconcile_fixes_bulk_create_drift(self):
+        Episode.objects.bulk_create([Episode(season=self.season1, number=i) for i in range(1, 6)])
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.episode_count, 0)
+
+        self.assertEqual(reconcile_episode_stats(), (1, 1))
+        self.season1.refresh_from_db()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.season1.episode_count, 5)
+        self.assertEqual(self.anime.episode_count, 5)
+        self.assertEqual(self.anime.latest_episode_number, 5)
+
+        # Already consistent: nothing to write
+        self.assertEqual(reconcile_episode_stats(), (0, 0))
+
+    def test_reconcile_command(self):
+        Episode.objects.bulk_create([Episode(season=self.season2, number=1)])
+        call_command('reconcile_episode_stats', verbosity=0)
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.episode_count, 1)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from content.models import Anime, Season, Episode, Subscription
+from content.notifications import notify_new_episodes
+from users.models import Notification, Watermark
+from users.notifications import send_notification_digests
+
+User = get_user_model()
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, WATERMARK_LAG_SECONDS=0)
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.fan = User.objects.create_user(username='fan', password='password', email='fan@example.com')
+        self.digester = User.objects.create_user(username='digester', password='password', email='digest@example.com', notification_digest=True)
+        self.anime = Anime.objects.create(title='Batch Anime')
+        self.season = Season.objects.create(anime=self.anime, number=1)
+        Subscription.objects.create(user=self.fan, anime=self.anime)
+        Subscription.objects.create(user=self.digester, anime=self.anime)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=300)
+    @patch('content.tasks.send_mass_mail')
+    @patch('content.tasks.send_websocket_notifications_task.delay')
+    @patch('content.tasks.notify_new_episodes_task.apply_async')
+    def test_batch_import_is_announced_once(self, mock_schedule, mock_push, mock_mail):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(1, 13):
+                Episode.objects.create(season=self.season, number=number)
+        self.assertTrue(mock_schedule.called)
+        self.assertFalse(Notification.objects.exists())
+
+        episodes = notify_new_episodes(self.anime.id)
+        self.assertEqual(len(episodes), 12)
+
+        notification = Notification.objects.get(user=self.fan)
+        self.assertEqual(notification.message, "12 new episodes of Batch Anime are now available!")
+        self.assertEqual(Notification.objects.count(), 2)
+        mock_push.assert_called_once()
+
+        # Digest users are left out of the per-batch email
+        datatuple = mock_mail.call_args[0][0]
+        self.assertEqual(len(datatuple), 1)
+        self.assertIn("12 New Episodes", datatuple[0][0])
+        self.assertEqual(datatuple[0][3], ['fan@example.com'])
+
+        # Already announced: a late run finds nothing
+        self.assertEqual(notify_new_episodes(self.anime.id), [])
+        self.assertEqual(Notification.objects.count(), 2)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    @patch('content.tasks.send_mass_mail')
+    def test_zero_window_announces_each_episode(self, mock_mail):
+        with self.captureOnCommitCallbacks(execute=True):
+            Episode.objects.create(season=self.season, number=1, title='Pilot')
+        with self.captureOnCommitCallbacks(execute=True):
+            Episode.objects.create(season=self.season, number=2)
+        messages = list(Notification.objects.filter(user=self.fan).order_by('id').values_list('message', flat=True))
+        self.assertEqual(messages, [
+            "Episode 1 of Batch Anime is now available!",
+            "Episode 2 of Batch Anime is now available!",
+        ])
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    def test_nothing_is_scheduled_before_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Episode.objects.create(season=self.season, number=1)
+            # The task would run now and not see the episode yet
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+
+    @override_settings(WATERMARK_LAG_SECONDS=300)
+    @patch('content.tasks.send_mass_mail')
+    @patch('content.tasks.notify_new_episodes_task.apply_async')
+    def test_episodes_wait_until_their_ids_settle(self, mock_schedule, mock_mail):
+        def lag_passes():
+            Watermark.objects.filter(name='episode_notify:seen').update(updated_at=timezone.now() - timedelta(hours=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Episode.objects.create(season=self.season, number=1)
+        # The first run only notes the newest id and comes back later
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notify_new_episodes(self.anime.id), [])
+        mock_schedule.assert_called_with((self.anime.id,), countdown=300)
+
+        # Committed after that note, like a lower id that was still in flight
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Episode.objects.create(season=self.season, number=2)
+        lag_passes()
+        self.assertEqual(notify_new_episodes(self.anime.id), [first])
+        lag_passes()
+        self.assertEqual(notify_new_episodes(self.anime.id), [second])
+        self.assertEqual(Notification.objects.filter(user=self.fan).count(), 2)
+
+    @patch('users.notifications.send_mass_mail')
+    def test_daily_digest(self, mock_mail):
+        Notification.objects.create(user=self.digester, title='New Episodes: Batch Anime', message='3 new episodes', link='/watch/1/')
+        Notification.objects.create(user=self.digester, title='Read', message='old', is_read=True)
+        Notification.objects.create(user=self.fan, title='Not on digest', message='m')
+
+        self.assertEqual(send_notification_digests(), 1)
+        subject, body, _, recipients = mock_mail.call_args[0][0][0]
+        self.assertEqual(recipients, ['digest@example.com'])
+        self.assertIn("1 new notification", subject)
+        self.assertIn("3 new episodes", body)
+        self.assertNotIn("old", body)
@@ -11,7 +11,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.db.models import Prefetch, Avg
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from .page_cache import cache_catalogue_page
 
 from .models import Anime, Episode, Season, Subscription, VideoFile
 from .serializers import (
@@ -30,11 +30,11 @@ class SubscribeRateThrottle(UserRateThrottle):
 )
 class AnimeViewSet(viewsets.ReadOnlyModelViewSet):
     # AnimeViewSet list cache: 5 dakika TTL
-    @method_decorator(cache_page(60 * 5, key_prefix='anime_list'))
+    @method_decorator(cache_catalogue_page(60 * 5, key_prefix='anime_list'))
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(60 * 5, key_prefix='anime_detail'))
+    @method_decorator(cache_catalogue_page(60 * 5, key_prefix='anime_detail'))
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -42,7 +42,7 @@ class AnimeViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'english_title', 'japanese_title']
     filterset_fields = ['status', 'type', 'genres__name']
-    ordering_fields = ['score', 'popularity', 'created_at', 'aired_from', 'avg_rating']
+    ordering_fields = ['score', 'popularity', 'created_at', 'aired_from', 'avg_rating', 'latest_episode_at']
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -87,11 +87,11 @@ class AnimeViewSet(viewsets.ReadOnlyModelViewSet):
     retrieve=extend_schema(summary="Retrieve episode details")
 )
 class EpisodeViewSet(viewsets.ReadOnlyModelViewSet):
-    @method_decorator(cache_page(60 * 5, key_prefix='episode_list'))
+    @method_decorator(cache_catalogue_page(60 * 5, key_prefix='episode_list'))
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(60 * 5, key_prefix='episode_detail'))
+    @method_decorator(cache_catalogue_page(60 * 5, key_prefix='episode_detail'))
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -127,7 +127,7 @@ class HomeViewSet(viewsets.ViewSet):
         }
     )
     # HomeViewSet trending/seasonal cache: 10 dakika TTL
-    @method_decorator(cache_page(60 * 10, key_prefix='home_list'))
+    @method_decorator(cache_catalogue_page(60 * 10, key_prefix='home_list'))
     def list(self, request):
         # Optimization: Add prefetch_related('genres') to avoid N+1 queries
         trending = Anime.objects.prefetch_related('genres').order_by('-popularity')[:10]
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin
-from .models import SiteSettings, Blog, SupportTicket, AdSlot
+from .models import SiteSettings, Blog, SupportTicket, AdSlot, ChatMessage
+from .pagination import ApproximateCountAdminMixin
 
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(ModelAdmin):
@@ -21,3 +22,9 @@ class SupportTicketAdmin(ModelAdmin):
 class AdSlotAdmin(ModelAdmin):
     list_display = ('position', 'active')
     list_filter = ('active',)
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(ApproximateCountAdminMixin, ModelAdmin):
+    list_display = ('room_name', 'username', 'created_at')
+    search_fields = ('room_name', 'username')
+    raw_id_fields = ('user',)
@@ -0,0 +1,82 @@
+"""
+Encode-once group broadcasts.
+
+A group_send reaches every consumer in the group, and each of them used to
+json.dumps the same event before sending it on: a 500-viewer room encoded
+every chat line 500 times. Senders now build events with `group_event`,
+which carries the client frame already encoded, and handlers pass
+`frame(event)` straight to send().
+
+Events whose frame can only be built on the receiving side (video_sync is
+anchored to the time it is delivered) carry an `event_id` instead; the
+first consumer in each process to handle one encodes it and the others
+reuse the result from a small LRU. Events with neither (sent directly to
+one consumer, or by older code) are encoded per recipient as before.
+"""
+import json
+import threading
+from collections import OrderedDict
+from .write_behind import snowflake
+
+# Recently broadcast frames per process; an event is handled by all local
+# members of its group within moments, so this only needs to cover those
+FRAME_CACHE_SIZE = 256
+
+
+def group_event(handler, payload):
+    """
+    A group event for `handler` whose client frame is {'type': handler,
+    **payload}, encoded here once for every recipient.
+    """
+    return {'type': handler, 'frame': json.dumps({'type': handler, **payload})}
+
+
+def keyed_event(handler, payload):
+    """
+    A group event with an id, so receivers encode it once per process.
+    """
+    return {'type': handler, 'event_id': snowflake.next_id(), **payload}
+
+
+class FrameCache:
+    """
+    LRU of encoded frames keyed by event id.
+    """
+
+    def __init__(self, size=FRAME_CACHE_SIZE):
+        self.size = size
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_build(self, event_id, build):
+        with self.lock:
+            frame = self.frames.get(event_id)
+            if frame is not None:
+                self.frames.move_to_end(event_id)
+                return frame
+        frame = build()
+        with self.lock:
+            self.frames[event_id] = frame
+            if len(self.frames) > self.size:
+                self.frames.popitem(last=False)
+        return frame
+
+
+frames = FrameCache()
+
+
+def _client_fields(event):
+    return {key: value for key, value in event.items() if key != 'event_id'}
+
+
+def frame(event, build=None):
+    """
+    The text frame to send for `event`. `build(fields)` returns the client
+    payload for events that aren't pre-encoded (default: the event itself).
+    """
+    if 'frame' in event:
+        return event['frame']
+    encode = lambda: json.dumps(build(_client_fields(event)) if build else _client_fields(event))
+    if 'event_id' in event:
+        return frames.get_or_build(event['event_id'], encode)
+    return encode()
@@ -0,0 +1,88 @@
+"""
+Recent chat history per room, for people joining mid-conversation.
+
+The last CHAT_HISTORY_SIZE messages of a room are kept in a capped Redis
+list, pushed as they are sent, and replayed to a newcomer as one `history`
+frame. The database is only read when the list is cold (a room nobody has
+written to since Redis lost it): its messages are merged with anything
+already pushed, by id, and the room is marked warm so it isn't read again.
+Without Redis history always comes from the database.
+"""
+import json
+from redis.exceptions import WatchError
+from django.conf import settings
+from .redis_client import get_redis_connection
+
+# History of a quiet room is forgotten after a day
+HISTORY_TTL = 24 * 60 * 60
+
+
+def _warm_key(key):
+    return f'{key}:warm'
+
+
+def push(key, entry):
+    """
+    Appends `entry` (a dict with an id) to the history at `key`.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return
+    pipe = redis.pipeline()
+    pipe.rpush(key, json.dumps(entry))
+    pipe.ltrim(key, -settings.CHAT_HISTORY_SIZE, -1)
+    pipe.expire(key, HISTORY_TTL)
+    pipe.expire(_warm_key(key), HISTORY_TTL)
+    pipe.execute()
+
+
+def remove(key, entry_id):
+    """
+    Drops the entry with `entry_id` from the history, if it is there.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return
+    for raw in redis.lrange(key, 0, -1):
+        if json.loads(raw)['id'] == entry_id:
+            redis.lrem(key, 1, raw)
+
+
+def recent(key, load):
+    """
+    The history at `key`, oldest first. `load()` returns the latest
+    messages from the database, oldest first, for a cold history.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return load()
+    pipe = redis.pipeline()
+    pipe.lrange(key, 0, -1)
+    pipe.exists(_warm_key(key))
+    raw, warm = pipe.execute()
+    if warm:
+        return [json.loads(item) for item in raw]
+    return _warm_up(redis, key, load())
+
+
+def _warm_up(redis, key, stored):
+    # Messages pushed meanwhile are kept; the merge is idempotent, so racing
+    # newcomers only cost a retry
+    with redis.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                pushed = [json.loads(item) for item in pipe.lrange(key, 0, -1)]
+                merged = {entry['id']: entry for entry in stored}
+                merged.update((entry['id'], entry) for entry in pushed)
+                history = [merged[entry_id] for entry_id in sorted(merged)][-settings.CHAT_HISTORY_SIZE:]
+                pipe.multi()
+                pipe.delete(key)
+                if history:
+                    pipe.rpush(key, *[json.dumps(entry) for entry in history])
+                    pipe.expire(key, HISTORY_TTL)
+                pipe.set(_warm_key(key), 1, ex=HISTORY_TTL)
+                pipe.execute()
+                return history
+            except WatchError:
+                continue
@@ -1,10 +1,15 @@
 import json
+from datetime import datetime, timezone
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.core.cache import cache
 from asgiref.sync import sync_to_async
 from django.utils.html import escape
+from . import chat_history
+from .broadcast import frame, group_event
 from .models import ChatMessage
+from .write_behind import chat_writes, snowflake, snowflake_time
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -28,22 +33,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if user and user.is_authenticated:
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {
-                    'type': 'chat_message',
+                group_event('chat_message', {
                     'message': f"{user.username} joined the chat.",
                     'username': 'System',
                     'is_system': True,
-                }
+                })
             )
 
-        # Send last 50 messages
+        # Send recent messages, in one frame
         last_messages = await self.get_last_messages()
-        for msg in last_messages:
+        if last_messages:
             await self.send(text_data=json.dumps({
-                'type': 'chat_message',
-                'message': msg['message'],
-                'username': msg['username'],
-                'created_at': str(msg['created_at'])
+                'type': 'history',
+                'messages': last_messages,
             }))
 
     async def disconnect(self, close_code):
@@ -62,12 +64,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if user and user.is_authenticated:
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {
-                    'type': 'chat_message',
+                group_event('chat_message', {
                     'message': f"{user.username} left the chat.",
                     'username': 'System',
                     'is_system': True,
-                }
+                })
             )
 
     # Receive message from WebSocket
@@ -92,47 +93,40 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Using django.utils.html.escape to escape special characters
         sanitized_message = escape(message)
 
-        # Save to DB
-        await self.save_message(username, sanitized_message)
-
         # Send message to room group
+        message_id = snowflake.next_id()
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'chat_message',
+            group_event('chat_message', {
                 'message': sanitized_message,
                 'username': username,
-            }
+                'is_system': False,
+            })
         )
 
+        # Save to history and DB (batched, see write_behind.py)
+        await self.save_message(message_id, username, sanitized_message)
+
     # Receive message from room group
     async def chat_message(self, event):
-        message = event['message']
-        username = event.get('username', 'Anonymous')
-        is_system = event.get('is_system', False)
-
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        # Send message to WebSocket (encoded once by the sender)
+        await self.send(text_data=frame(event, lambda fields: {
             'type': 'chat_message',
-            'message': message,
-            'username': username,
-            'is_system': is_system,
+            'message': fields['message'],
+            'username': fields.get('username', 'Anonymous'),
+            'is_system': fields.get('is_system', False),
         }))
 
     async def user_count(self, event):
-        count = event['count']
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=frame(event, lambda fields: {
             'type': 'user_count',
-            'count': count
+            'count': fields['count']
         }))
 
     async def broadcast_user_count(self, count):
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'user_count',
-                'count': count
-            }
+            group_event('user_count', {'count': count})
         )
 
     @sync_to_async
@@ -150,23 +144,36 @@ class ChatConsumer(AsyncWebsocketConsumer):
             cache.set(key, new_value, timeout=86400) # 24h timeout
             return new_value
 
-    @database_sync_to_async
-    def save_message(self, username, message):
+    async def save_message(self, message_id, username, message):
         user = self.scope.get("user")
         if user and not user.is_authenticated:
              user = None
 
-        ChatMessage.objects.create(
-            room_name=self.room_name,
-            username=username,
-            message=message,
-            user=user
-        )
+        sent_at = datetime.fromtimestamp(snowflake_time(message_id), tz=timezone.utc)
+        await sync_to_async(chat_history.push)(self.history_key(), {
+            'id': message_id, 'username': username, 'message': message, 'created_at': sent_at.isoformat(),
+        })
+        await chat_writes.add(ChatMessage, {
+            'id': message_id,
+            'room_name': self.room_name,
+            'username': username,
+            'message': message,
+            'user_id': user.id if user else None,
+        })
+
+    def history_key(self):
+        return f'chat:history:{self.room_name}'
 
     @database_sync_to_async
     def get_last_messages(self):
-        messages = ChatMessage.objects.filter(room_name=self.room_name).order_by('-created_at')[:50]
-        return [{'username': m.username, 'message': m.message, 'created_at': m.created_at} for m in reversed(list(messages))]
+        return chat_history.recent(self.history_key(), self.load_last_messages)
+
+    def load_last_messages(self):
+        messages = ChatMessage.objects.filter(room_name=self.room_name).order_by('-created_at')[:settings.CHAT_HISTORY_SIZE]
+        return [
+            {'id': m.id, 'username': m.username, 'message': m.message, 'created_at': m.created_at.isoformat()}
+            for m in reversed(list(messages))
+        ]
 
     @sync_to_async
     def check_rate_limit(self):
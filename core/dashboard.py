@@ -1,68 +1,77 @@
 import json
-import psutil
-from datetime import timedelta
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from content.models import Anime, Episode, VideoFile
-from billing.models import ShopierPayment
-from django.db.models import Sum
+from .metrics import GB, RANGES, get_snapshot, system_samples
 
 def dashboard_callback(request, context):
     """
     Callback to populate the Unfold admin dashboard.
+    Reads the snapshot kept fresh by collect_dashboard_metrics_task.
     """
+    snapshot = get_snapshot()
+    try:
+        days = int(request.GET.get('range', RANGES[0]))
+    except (TypeError, ValueError):
+        days = RANGES[0]
+    if days not in RANGES:
+        days = RANGES[0]
 
-    # Server Stats
-    cpu_usage = psutil.cpu_percent()
-    ram_usage = psutil.virtual_memory().percent
-
-    # Content Stats
-    anime_count = Anime.objects.count()
-    episode_count = Episode.objects.count()
+    # Server Stats (latest sample, if the collector has run)
+    samples = system_samples()
+    latest = samples[-1] if samples else {}
 
     # Bandwidth Saved Calculation (Assume H.265 saves ~50% compared to H.264)
     # So saved amount = size of H.265 files (approx).
-    total_h265_size_bytes = VideoFile.objects.aggregate(Sum('file_size_bytes'))['file_size_bytes__sum'] or 0
-    bandwidth_saved_gb = round(total_h265_size_bytes / (1024 * 1024 * 1024), 2)
-
-    # Graph Data: Last 7 Days
-    today = timezone.now().date()
-    last_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    chart_labels = [day.strftime("%Y-%m-%d") for day in last_7_days]
-    chart_data = []
-
-    for day in last_7_days:
-        daily_size = VideoFile.objects.filter(
-            created_at__date=day
-        ).aggregate(Sum('file_size_bytes'))['file_size_bytes__sum'] or 0
-        chart_data.append(round(daily_size / (1024 * 1024 * 1024), 2))
+    bandwidth_saved_gb = round(snapshot['total_bytes'] / GB, 2)
 
-    # Revenue Stats
-    total_revenue = ShopierPayment.objects.filter(status='success').aggregate(Sum('amount'))['amount__sum'] or 0
+    # Graph Data: the selected range, sliced from the snapshot
+    daily = snapshot['daily_bytes'][-days:]
 
     # Chart.js Data Structure
     bandwidth_chart_json = json.dumps({
-        "labels": chart_labels,
+        "labels": [day for day, _total in daily],
         "datasets": [
             {
                 "label": str(_("Bandwidth Saved (GB)")),
-                "data": chart_data,
+                "data": [round(total / GB, 2) for _day, total in daily],
                 "backgroundColor": "rgba(59, 130, 246, 0.5)",
                 "borderColor": "rgba(59, 130, 246, 1)",
                 "borderWidth": 1
             }
         ]
     })
+    system_chart_json = json.dumps({
+        "labels": [sample['ts'] * 1000 for sample in samples],
+        "datasets": [
+            {
+                "label": str(_("CPU (%)")),
+                "data": [sample['cpu'] for sample in samples],
+                "borderColor": "rgba(59, 130, 246, 1)",
+                "borderWidth": 1,
+                "pointRadius": 0
+            },
+            {
+                "label": str(_("RAM (%)")),
+                "data": [sample['ram'] for sample in samples],
+                "borderColor": "rgba(139, 92, 246, 1)",
+                "borderWidth": 1,
+                "pointRadius": 0
+            }
+        ]
+    })
 
     context.update({
         "dashboard_stats": {
-            "cpu": cpu_usage,
-            "ram": ram_usage,
-            "anime_count": anime_count,
-            "episode_count": episode_count,
+            "cpu": latest.get('cpu', '-'),
+            "ram": latest.get('ram', '-'),
+            "anime_count": snapshot['anime_count'],
+            "episode_count": snapshot['episode_count'],
             "bandwidth_saved_gb": bandwidth_saved_gb,
             "bandwidth_chart": bandwidth_chart_json,
-            "total_revenue": total_revenue,
+            "bandwidth_range": days,
+            "bandwidth_ranges": RANGES,
+            "system_chart": system_chart_json,
+            "total_revenue": snapshot['total_revenue'],
+            "collected_at": snapshot['collected_at'],
         }
     })
 
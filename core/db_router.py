@@ -0,0 +1,146 @@
+"""
+Read-replica routing.
+
+Reads only go to a replica (settings.DATABASE_REPLICAS) inside a
+replica_reads() scope: ReplicaRoutingMiddleware opens one for safe-method
+requests and read-only Celery tasks opt in with @read_only. Everything else
+(management commands, signals, unsafe requests) keeps reading the primary.
+
+Inside a scope, the first write pins the rest of it to the primary, and so
+does an open transaction, so a request always sees its own writes. A request
+that wrote also sets a short-lived cookie that keeps that client on the
+primary for REPLICA_PIN_SECONDS, covering the redirect/refetch after a POST.
+Replicas lagging more than REPLICA_MAX_LAG seconds are skipped; with none
+healthy, reads fall back to the primary.
+"""
+import contextvars
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_scope = contextvars.ContextVar('replica_scope', default=None)
+# alias -> (checked at, healthy), per process
+_health = {}
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    """
+    Lets reads in the block go to a replica. Yields the scope state;
+    state['wrote'] tells whether anything was written inside it.
+    """
+    state = {'pinned': pinned, 'wrote': False}
+    token = _scope.set(state)
+    try:
+        yield state
+    finally:
+        _scope.reset(token)
+
+
+def read_only(func):
+    """
+    Runs func inside replica_reads(), e.g. for Celery tasks that only read.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind the primary (0 for backends that can't tell).
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # An idle primary makes the replay timestamp look old, so a fully replayed replica counts as current
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def healthy_replicas():
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+    now = time.monotonic()
+    healthy = []
+    for alias in replicas():
+        checked = _health.get(alias)
+        if checked is None or now - checked[0] >= interval:
+            try:
+                lag = replica_lag(alias)
+                ok = lag <= max_lag
+                if not ok:
+                    logger.warning(f"Replica {alias} is {lag:.1f}s behind; reading from the primary")
+            except Exception:
+                logger.exception(f"Replica {alias} lag check failed")
+                ok = False
+            checked = _health[alias] = (now, ok)
+        if checked[1]:
+            healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _scope.get()
+        if state is None or state['pinned'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = healthy_replicas()
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _scope.get()
+        if state is not None:
+            state['pinned'] = state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Opens a replica_reads() scope for safe-method requests from clients that
+    haven't written recently, and marks clients that just wrote.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+
+        safe = request.method in SAFE_METHODS
+        with replica_reads(pinned=not safe or PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+
+        if state['wrote'] or not safe:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
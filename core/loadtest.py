@@ -0,0 +1,371 @@
+"""
+WebSocket load test for the watch party, chat and notification consumers.
+
+Drives the real ASGI application in-process through WebsocketCommunicator:
+synthetic users join rooms, send a mix of messages (host sync, chat,
+emotes; server-pushed notifications) at a Poisson rate, and every client
+timestamps what it receives. Each message carries a marker so a frame can
+be matched to the moment it was sent, which gives the fan-out latency as
+seen by every recipient. Runs on the in-memory channel layer or a local
+Redis one.
+
+Reports per consumer: connect time, sent / delivered counts, p50/p99
+fan-out latency, delivered messages per second, and memory per connection
+(traced Python heap and process RSS, measured once everyone is connected).
+
+Syncs are coalesced to WATCHPARTY_SYNC_TICK_HZ and emotes aggregated into
+bursts, so fewer of those are delivered than sent, and their latency
+includes that wait. The per-user chat/emote rate limits apply as in
+production; keep --rate under them (0.5 msg/s per client) to measure
+delivery rather than rejection.
+"""
+import asyncio
+import itertools
+import random
+import secrets
+import time
+import tracemalloc
+import psutil
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test.utils import override_settings
+from content.models import Anime, Season, Episode
+from apps.watchparty.models import Room
+from .models import ChatMessage
+from .write_behind import chat_writes
+
+CONSUMERS = ('watchparty', 'chat', 'notifications')
+DEFAULT_MIX = {'sync': 1, 'chat': 5, 'emote': 4}
+PREFIX = 'loadtest_'
+# Concurrent connects while setting up
+CONNECT_BATCH = 100
+# Longest wait for the room to go quiet after connecting / sending (seconds)
+MAX_SETTLE = 300
+
+
+def layer_config(layer, redis_url=None):
+    if layer == 'memory':
+        return {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    if layer == 'redis':
+        return {'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [redis_url or 'redis://127.0.0.1:6379/2']},
+        }}
+    raise ValueError(f"Unknown channel layer {layer!r}")
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile; None for no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(values):
+    return {
+        'p50': _ms(percentile(values, 50)),
+        'p99': _ms(percentile(values, 99)),
+        'max': _ms(max(values) if values else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class Recorder:
+    """
+    Send times by marker, and what recipients saw of them.
+    """
+
+    def __init__(self):
+        self.markers = itertools.count(1)
+        self.sent_at = {}
+        self.kinds = {}
+        self.sent = {}
+        self.delivered = {}
+        self.latencies = []
+        self.frames = 0
+        self.first_sent = self.last_received = None
+
+    def send(self, kind):
+        marker = next(self.markers)
+        now = time.perf_counter()
+        self.sent_at[marker] = now
+        self.kinds[marker] = kind
+        self.sent[kind] = self.sent.get(kind, 0) + 1
+        if self.first_sent is None:
+            self.first_sent = now
+        return marker
+
+    def received(self, marker):
+        sent_at = self.sent_at.get(marker)
+        if sent_at is None:
+            # Not one of ours (a join snapshot, history...)
+            return
+        now = time.perf_counter()
+        kind = self.kinds[marker]
+        self.delivered[kind] = self.delivered.get(kind, 0) + 1
+        self.latencies.append(now - sent_at)
+        self.last_received = now
+
+    def messages_per_second(self):
+        if self.first_sent is None or self.last_received is None or self.last_received <= self.first_sent:
+            return 0.0
+        return round(sum(self.delivered.values()) / (self.last_received - self.first_sent), 1)
+
+
+def markers_in(frame):
+    """
+    The markers a received frame carries (see the send_* functions).
+    """
+    kind = frame.get('type')
+    if kind == 'chat_message' and str(frame.get('message', '')).startswith('lt '):
+        return [int(frame['message'][3:])]
+    if kind == 'video_sync':
+        return [int(frame['timestamp'])]
+    if kind == 'emote_burst':
+        return [int(emote) for emote in frame['emotes'] if emote.isdigit()]
+    if kind == 'notification' and frame.get('seq'):
+        return [frame['seq']]
+    return []
+
+
+class Client:
+    def __init__(self, communicator, user, recorder, host=False):
+        self.communicator = communicator
+        self.user = user
+        self.recorder = recorder
+        self.host = host
+        self.reader = None
+
+    async def read(self):
+        while True:
+            frame = await self.communicator.receive_json_from(timeout=3600)
+            self.recorder.frames += 1
+            for marker in markers_in(frame):
+                self.recorder.received(marker)
+
+
+async def connect_all(clients):
+    """
+    Connects clients in batches; returns the connect times.
+    """
+    times = []
+
+    async def connect(client):
+        started = time.perf_counter()
+        connected, _ = await client.communicator.connect(timeout=30)
+        if not connected:
+            raise RuntimeError(f"{client.user.username} could not connect")
+        times.append(time.perf_counter() - started)
+        client.reader = asyncio.create_task(client.read())
+
+    for start in range(0, len(clients), CONNECT_BATCH):
+        await asyncio.gather(*[connect(client) for client in clients[start:start + CONNECT_BATCH]])
+    return times
+
+
+async def wait_quiet(recorder, quiet):
+    """
+    Waits until no frame has arrived for `quiet` seconds: join broadcasts
+    grow with the square of the room size, so a big room keeps its clients
+    busy long after the last connect.
+    """
+    deadline = time.perf_counter() + MAX_SETTLE
+    while time.perf_counter() < deadline:
+        seen = recorder.frames
+        await asyncio.sleep(quiet)
+        if recorder.frames == seen:
+            return
+
+
+async def disconnect_all(clients):
+    for client in clients:
+        if client.reader:
+            client.reader.cancel()
+    # Leave broadcasts are quadratic too; let them finish before the next scenario
+    await asyncio.gather(*[client.communicator.disconnect(timeout=MAX_SETTLE) for client in clients], return_exceptions=True)
+
+
+class Fixtures:
+    """
+    What one run created, so cleanup removes exactly that. Names carry a
+    random run id, so they can't clash with real users or chat rooms.
+    """
+
+    def __init__(self):
+        self.name = f'{PREFIX}{secrets.token_hex(4)}'
+        self.user_ids = []
+        self.anime_ids = []
+
+
+@sync_to_async
+def create_users(fixtures, count, tag):
+    User = get_user_model()
+    users = [User(username=f'{fixtures.name}_{tag}_{i}') for i in range(count)]
+    for user in users:
+        user.set_unusable_password()
+    User.objects.bulk_create(users, batch_size=1000)
+    users = list(User.objects.filter(username__in=[user.username for user in users]).order_by('id'))
+    fixtures.user_ids.extend(user.id for user in users)
+    return users
+
+
+@sync_to_async
+def create_rooms(fixtures, hosts, capacity):
+    anime = Anime.objects.create(title=f'{fixtures.name}_anime')
+    fixtures.anime_ids.append(anime.id)
+    season = Season.objects.create(anime=anime, number=1)
+    episode = Episode.objects.create(season=season, number=1)
+    return [Room.objects.create(host=host, episode=episode, max_participants=capacity) for host in hosts]
+
+
+@sync_to_async
+def cleanup(fixtures):
+    # Chat rows outlive their users; rooms and watch party rows go with them
+    ChatMessage.objects.filter(user_id__in=fixtures.user_ids).delete()
+    get_user_model().objects.filter(id__in=fixtures.user_ids).delete()
+    Anime.objects.filter(id__in=fixtures.anime_ids).delete()
+
+
+async def send_watchparty(client, recorder, rng, mix):
+    kinds = [kind for kind in mix if mix[kind] and (client.host or kind != 'sync')]
+    if not kinds:
+        return
+    kind = rng.choices(kinds, [mix[k] for k in kinds])[0]
+    marker = recorder.send(kind)
+    if kind == 'sync':
+        # Paused, so the position viewers get is the marker itself
+        message = {'type': 'sync', 'state': 'paused', 'timestamp': marker, 'rate': 1}
+    elif kind == 'emote':
+        message = {'type': 'emote', 'emote': str(marker)}
+    else:
+        message = {'type': 'chat', 'message': f'lt {marker}'}
+    await client.communicator.send_json_to(message)
+
+
+async def send_chat(client, recorder, rng, mix):
+    marker = recorder.send('chat')
+    await client.communicator.send_json_to({'message': f'lt {marker}'})
+
+
+async def send_notification(client, recorder, rng, mix):
+    marker = recorder.send('notification')
+    await get_channel_layer().group_send(f'user_{client.user.id}', {
+        'type': 'notification_message', 'id': marker, 'title': 'Load test', 'message': 'lt',
+    })
+
+
+async def drive(clients, send, recorder, duration, rate, mix, seed):
+    """
+    Every client sends at `rate` messages per second (Poisson) for
+    `duration` seconds.
+    """
+    deadline = time.perf_counter() + duration
+
+    async def run(client, rng):
+        while True:
+            delay = rng.expovariate(rate)
+            if time.perf_counter() + delay >= deadline:
+                return
+            await asyncio.sleep(delay)
+            await send(client, recorder, rng, mix)
+
+    await asyncio.gather(*[run(client, random.Random(seed + i)) for i, client in enumerate(clients)])
+
+
+def _build_clients(consumer, users, rooms, recorder, fixtures):
+    # Avoid circular import
+    from aniscrap_core.asgi import application
+    clients = []
+    for index, user in enumerate(users):
+        if consumer == 'watchparty':
+            room = rooms[index % len(rooms)]
+            path = f'/ws/watch-party/{room.uuid}/'
+        elif consumer == 'chat':
+            path = f'/ws/chat/{fixtures.name}_{index % len(rooms)}/'
+        else:
+            path = '/ws/notifications/'
+        communicator = WebsocketCommunicator(application, path)
+        communicator.scope['user'] = user
+        communicator.scope['client'] = ('127.0.0.1', 10000 + index)
+        host = consumer == 'watchparty' and rooms[index % len(rooms)].host_id == user.id
+        clients.append(Client(communicator, user, recorder, host=host))
+    return clients
+
+
+SENDERS = {'watchparty': send_watchparty, 'chat': send_chat, 'notifications': send_notification}
+
+
+async def run_scenario(fixtures, consumer, rooms, viewers, duration, rate, mix, settle, seed):
+    recorder = Recorder()
+    connections = rooms * viewers
+    users = await create_users(fixtures, connections, consumer)
+    room_objs = await create_rooms(fixtures, users[:rooms], viewers) if consumer == 'watchparty' else list(range(rooms))
+    clients = _build_clients(consumer, users, room_objs, recorder, fixtures)
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    try:
+        connect_times = await connect_all(clients)
+        # Let join broadcasts, participant lists and history settle
+        await wait_quiet(recorder, settle)
+        heap_per_connection = (tracemalloc.get_traced_memory()[0] - heap_before) / connections
+        tracemalloc.stop()
+        # RSS is coarse (the allocator keeps freed pages); never below zero
+        rss_per_connection = max(process.memory_info().rss - rss_before, 0) / connections
+
+        await drive(clients, SENDERS[consumer], recorder, duration, rate, mix, seed)
+        await wait_quiet(recorder, settle)
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        await disconnect_all(clients)
+        await chat_writes.flush()
+
+    return {
+        'consumer': consumer,
+        'rooms': rooms,
+        'viewers_per_room': viewers,
+        'connections': connections,
+        'duration_s': duration,
+        'rate_per_client': rate,
+        'connect_ms': summarize(connect_times),
+        'sent': recorder.sent,
+        'delivered': recorder.delivered,
+        'fanout_latency_ms': summarize(recorder.latencies),
+        'messages_per_second': recorder.messages_per_second(),
+        'memory_per_connection_kb': round(heap_per_connection / 1024, 1),
+        'rss_per_connection_kb': round(rss_per_connection / 1024, 1),
+    }
+
+
+def run_load_test(consumers=CONSUMERS, rooms=10, viewers=50, duration=10.0, rate=0.2, mix=None,
+                  layer='memory', redis_url=None, settle=1.0, seed=42):
+    """
+    Runs one scenario per consumer and returns the report. The synthetic
+    users, rooms and chat messages it created are deleted afterwards.
+    """
+    mix = mix or DEFAULT_MIX
+    fixtures = Fixtures()
+
+    async def run():
+        scenarios = []
+        try:
+            for consumer in consumers:
+                scenarios.append(await run_scenario(fixtures, consumer, rooms, viewers, duration, rate, mix, settle, seed))
+        finally:
+            await cleanup(fixtures)
+        return scenarios
+
+    with override_settings(CHANNEL_LAYERS=layer_config(layer, redis_url)):
+        scenarios = async_to_sync(run)()
+    return {'layer': layer, 'mix': mix, 'scenarios': scenarios}
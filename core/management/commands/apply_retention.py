@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.retention import retention_policies, run_retention
+
+class Command(BaseCommand):
+    help = 'Deletes (or archives) chat, watch party and notification rows past their retention policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', help='Policy names to apply (default: all enabled)')
+        parser.add_argument('--batch-size', type=int, help='Rows per DELETE (default: RETENTION_BATCH_SIZE)')
+        parser.add_argument('--archive-dir', help='Append deleted rows to gzipped JSONL files here')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired rows')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            report = {name: expired.count() for name, expired in retention_policies()
+                      if not options['only'] or name in options['only']}
+            verb = 'Would remove'
+        else:
+            report = run_retention(batch_size=options['batch_size'], archive_dir=options['archive_dir'], only=options['only'])
+            verb = 'Removed'
+
+        for name, count in report.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(report.values())} rows."))
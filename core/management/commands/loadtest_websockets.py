@@ -0,0 +1,63 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.loadtest import CONSUMERS, DEFAULT_MIX, run_load_test
+
+class Command(BaseCommand):
+    help = 'Load-tests the watch party, chat and notification consumers with simulated clients and prints a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumers', nargs='+', choices=CONSUMERS, default=list(CONSUMERS))
+        parser.add_argument('--rooms', type=int, default=10, help='Rooms (or notification user groups) per consumer')
+        parser.add_argument('--viewers', type=int, default=50, help='Connections per room')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of sending')
+        parser.add_argument('--rate', type=float, default=0.2, help='Messages per second per client')
+        parser.add_argument(
+            '--mix', nargs='+', metavar='KIND=WEIGHT',
+            help=f"Watch party message mix (default: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})",
+        )
+        parser.add_argument('--layer', choices=['memory', 'redis'], default='memory', help='Channel layer to run on')
+        parser.add_argument('--redis-url', help='Redis for --layer redis (default: redis://127.0.0.1:6379/2)')
+        parser.add_argument('--settle', type=float, default=1.0, help='Seconds without frames that count as settled, after connecting and after sending')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument(
+            '--yes-i-mean-it', action='store_true',
+            help='Run with DEBUG off; the test creates (and removes) users, rooms and chat messages in the configured database',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['yes_i_mean_it']:
+            raise CommandError(
+                'The load test writes users, rooms and chat messages to the configured database. '
+                'Run it with DEBUG on (against a throwaway database), or pass --yes-i-mean-it.'
+            )
+        mix = None
+        if options['mix']:
+            try:
+                mix = {kind: float(weight) for kind, weight in (item.split('=') for item in options['mix'])}
+            except ValueError:
+                raise CommandError('--mix takes KIND=WEIGHT pairs, e.g. sync=1 chat=5 emote=4')
+            unknown = set(mix) - set(DEFAULT_MIX)
+            if unknown:
+                raise CommandError(f"Unknown message kinds: {', '.join(sorted(unknown))}")
+
+        report = run_load_test(
+            consumers=options['consumers'],
+            rooms=options['rooms'],
+            viewers=options['viewers'],
+            duration=options['duration'],
+            rate=options['rate'],
+            mix=mix,
+            layer=options['layer'],
+            redis_url=options['redis_url'],
+            settle=options['settle'],
+            seed=options['seed'],
+        )
+        output = json.dumps(report, indent=2)
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Load test report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,103 @@
+"""
+Admin dashboard metrics.
+
+collect_dashboard_metrics_task refreshes a snapshot of the content, storage
+and revenue figures every minute and samples CPU/RAM into a capped Redis
+list, so loading the admin index only reads the cache. Bandwidth per day is
+one TruncDate + GROUP BY query over the longest range (90 days), so the
+shorter chart ranges are slices of the same result.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+import psutil
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from content.models import Anime, Episode, VideoFile
+from billing.models import ShopierPayment
+from .redis_client import get_redis_connection
+
+SNAPSHOT_KEY = 'dashboard_snapshot'
+SYSTEM_SAMPLES_KEY = 'dashboard_system_samples'
+RANGES = (7, 30, 90)
+GB = 1024 * 1024 * 1024
+
+
+def daily_bandwidth(days):
+    """
+    [(date, bytes)] for the last `days` days up to today, zero-filled.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    since = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    # A range on created_at can use its index, unlike created_at__date
+    totals = dict(
+        VideoFile.objects.filter(created_at__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(total=Sum('file_size_bytes'))
+        .values_list('day', 'total')
+    )
+    return [(day, totals.get(day) or 0) for day in (start + timedelta(days=i) for i in range(days))]
+
+
+def collect_snapshot():
+    """
+    Computes the dashboard figures and caches them for DASHBOARD_SNAPSHOT_TTL.
+    """
+    days = max(RANGES)
+    snapshot = {
+        'anime_count': Anime.objects.count(),
+        'episode_count': Episode.objects.count(),
+        'total_bytes': VideoFile.objects.aggregate(Sum('file_size_bytes'))['file_size_bytes__sum'] or 0,
+        'daily_bytes': [(day.isoformat(), total) for day, total in daily_bandwidth(days)],
+        'total_revenue': ShopierPayment.objects.filter(status='success').aggregate(Sum('amount'))['amount__sum'] or 0,
+        'collected_at': timezone.now(),
+    }
+    cache.set(SNAPSHOT_KEY, snapshot, settings.DASHBOARD_SNAPSHOT_TTL)
+    return snapshot
+
+
+def get_snapshot():
+    """
+    The latest snapshot; collected inline when the cache has none yet (or
+    was cleared, e.g. by a content change).
+    """
+    return cache.get(SNAPSHOT_KEY) or collect_snapshot()
+
+
+def record_system_sample():
+    """
+    Appends a {ts, cpu, ram} sample, keeping the last DASHBOARD_SYSTEM_SAMPLES.
+    Without Redis the samples live in the cache instead.
+    """
+    sample = {
+        'ts': int(time.time()),
+        # Usage since the previous call in this process, so it doesn't block
+        'cpu': psutil.cpu_percent(),
+        'ram': psutil.virtual_memory().percent,
+    }
+    limit = settings.DASHBOARD_SYSTEM_SAMPLES
+    redis = get_redis_connection()
+    if redis is None:
+        samples = (cache.get(SYSTEM_SAMPLES_KEY) or []) + [sample]
+        cache.set(SYSTEM_SAMPLES_KEY, samples[-limit:], None)
+        return sample
+    pipe = redis.pipeline()
+    pipe.rpush(SYSTEM_SAMPLES_KEY, json.dumps(sample))
+    pipe.ltrim(SYSTEM_SAMPLES_KEY, -limit, -1)
+    pipe.execute()
+    return sample
+
+
+def system_samples():
+    """
+    The recorded CPU/RAM samples, oldest first.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return cache.get(SYSTEM_SAMPLES_KEY) or []
+    return [json.loads(raw) for raw in redis.lrange(SYSTEM_SAMPLES_KEY, 0, -1)]
@@ -0,0 +1,108 @@
+"""
+Approximate counts for paginating huge tables.
+
+COUNT(*) over tens of millions of rows is often the slowest query behind an
+admin changelist or a list endpoint. For an unfiltered queryset over a table
+with at least APPROX_COUNT_THRESHOLD rows, ApproximateCountPaginator uses the
+planner's estimate (pg_class.reltuples on PostgreSQL) or, elsewhere, an exact
+count cached for APPROX_COUNT_CACHE_TTL seconds. Filtered or small result sets
+are still counted exactly.
+
+An approximate count is an ApproximateCount: an int that renders as "~N", so
+templates show it as approximate without changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+
+class ApproximateCount(int):
+    def __str__(self):
+        return f"~{int(self):,}"
+
+
+def _is_unrestricted(queryset):
+    query = queryset.query
+    return not (
+        query.where or query.distinct or query.combinator or query.group_by
+        or query.low_mark or query.high_mark is not None
+    )
+
+
+def table_estimate(model, using='default'):
+    """
+    Rough row count of the model's table.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+        # -1 until the table has been analysed
+        if row and row[0] >= 0:
+            return row[0]
+
+    key = f'approx_count_{using}_{table}'
+    count = cache.get(key)
+    if count is None:
+        count = model._base_manager.using(using).count()
+        cache.set(key, count, getattr(settings, 'APPROX_COUNT_CACHE_TTL', 600))
+    return count
+
+
+def estimated_count(queryset):
+    """
+    An estimate for unfiltered querysets over big tables, else None
+    (meaning: count exactly).
+    """
+    if not isinstance(queryset, QuerySet) or not _is_unrestricted(queryset):
+        return None
+    estimate = table_estimate(queryset.model, queryset.db)
+    if estimate < getattr(settings, 'APPROX_COUNT_THRESHOLD', 100000):
+        return None
+    return estimate
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None:
+            return Paginator.count.func(self)
+        return ApproximateCount(estimate)
+
+    @property
+    def is_approximate(self):
+        return isinstance(self.count, ApproximateCount)
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    """
+    PageNumberPagination with approximate counts; responses say which kind
+    of count they carry in `count_is_approximate`.
+    """
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_approximate'] = self.page.paginator.is_approximate
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
+
+
+class ApproximateCountAdminMixin:
+    """
+    ModelAdmin mixin for changelists over huge tables. Also skips the
+    "N total" COUNT(*) shown next to filtered results.
+    """
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
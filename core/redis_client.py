@@ -0,0 +1,24 @@
+import redis
+from django.conf import settings
+
+_clients = {}
+
+
+def get_redis_connection():
+    """
+    Returns a redis-py client for application state kept in Redis (buffers,
+    streams, presence, timelines...), for data structures the cache API
+    doesn't cover. It points at REDIS_DATA_URL, a database of its own, so
+    clearing or evicting the cache never drops that state.
+
+    Returns None when REDIS_DATA_URL is unset (USE_SQLITE / dev mode);
+    callers must then fall back to their database path.
+    """
+    url = getattr(settings, 'REDIS_DATA_URL', None)
+    if not url:
+        return None
+    client = _clients.get(url)
+    if client is None:
+        # One pooled, thread-safe client per URL
+        client = _clients[url] = redis.Redis.from_url(url)
+    return client
@@ -0,0 +1,102 @@
+"""
+Retention for the tables that grow with traffic: site chat, watch party
+messages and presence rows, and read notifications.
+
+Each policy selects the rows past its age limit (settings, in days; 0 turns
+a policy off). Read notifications are compacted by deleting them; unread
+ones are kept however old. The chat policies are off by default, as the
+chat badges count messages over all time. run_retention deletes them oldest id first, RETENTION_BATCH_SIZE
+rows per DELETE, each committed on its own, so no statement holds locks for
+long and the scans run on the created_at / is_online indexes. With
+RETENTION_ARCHIVE_DIR set, rows are appended to gzipped JSONL files first.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from apps.watchparty.models import Message, Participant, Room
+from users.models import Notification
+from .models import ChatMessage
+
+
+def archive_rows(rows, archive_dir, prefix):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{prefix}-{timezone.now():%Y%m%d}.jsonl.gz")
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, default=str) + '\n')
+
+
+def delete_in_batches(queryset, batch_size, archive_dir=None, archive_prefix=None, fields=None):
+    """
+    Deletes the queryset's rows batch_size at a time, lowest pk first,
+    archiving each batch when archive_dir is given. Returns rows deleted.
+    """
+    model = queryset.model
+    pk_name = model._meta.pk.attname
+    fields = fields or [f.attname for f in model._meta.concrete_fields]
+    queryset = queryset.order_by('pk')
+    deleted = 0
+    while True:
+        if archive_dir:
+            rows = list(queryset.values(*fields)[:batch_size])
+            ids = [row[pk_name] for row in rows]
+        else:
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        if archive_dir:
+            archive_rows(rows, archive_dir, archive_prefix or model._meta.model_name)
+        model._base_manager.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def _cutoff(setting, default):
+    days = getattr(settings, setting, default)
+    return timezone.now() - timedelta(days=days) if days else None
+
+
+def retention_policies():
+    """
+    (name, queryset of expired rows) for every enabled policy.
+    """
+    policies = []
+
+    cutoff = _cutoff('CHAT_MESSAGE_RETENTION_DAYS', 0)
+    if cutoff:
+        policies.append(('chat_messages', ChatMessage.objects.filter(created_at__lt=cutoff)))
+
+    cutoff = _cutoff('WATCHPARTY_MESSAGE_RETENTION_DAYS', 0)
+    if cutoff:
+        policies.append(('watchparty_messages', Message.objects.filter(created_at__lt=cutoff)))
+
+    cutoff = _cutoff('WATCHPARTY_IDLE_ROOM_DAYS', 1)
+    if cutoff:
+        # Closed rooms, or old rooms nobody is connected to
+        online = Participant.objects.filter(room=OuterRef('pk'), is_online=True)
+        inactive_rooms = Room.objects.annotate(has_online=Exists(online)).filter(Q(is_active=False) | Q(created_at__lt=cutoff, has_online=False))
+        policies.append(('watchparty_participants', Participant.objects.filter(is_online=False, room__in=inactive_rooms.values('pk'))))
+
+    cutoff = _cutoff('READ_NOTIFICATION_RETENTION_DAYS', 30)
+    if cutoff:
+        policies.append(('read_notifications', Notification.objects.filter(is_read=True, created_at__lt=cutoff)))
+
+    return policies
+
+
+def run_retention(batch_size=None, archive_dir=None, only=None):
+    """
+    Applies every enabled policy (or just those named in `only`).
+    Returns {policy name: rows deleted}.
+    """
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    archive_dir = archive_dir or getattr(settings, 'RETENTION_ARCHIVE_DIR', None)
+    report = {}
+    for name, expired in retention_policies():
+        if only and name not in only:
+            continue
+        report[name] = delete_in_batches(expired, batch_size, archive_dir=archive_dir, archive_prefix=name)
+    return report
@@ -0,0 +1,34 @@
+from celery import shared_task
+import logging
+from .retention import run_retention
+from .metrics import collect_snapshot, record_system_sample
+from .write_behind import recover_chat_writes
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, max_retries=3)
+def run_retention_task(self):
+    try:
+        report = run_retention()
+        logger.info(f"Retention removed {sum(report.values())} rows: {report}")
+        return report
+    except Exception as e:
+        logger.exception("Retention run failed.")
+        self.retry(exc=e, countdown=600)
+
+@shared_task
+def collect_dashboard_metrics_task():
+    # Runs every minute; a missed sample is simply a gap in the series
+    record_system_sample()
+    collect_snapshot()
+
+@shared_task(bind=True, max_retries=3)
+def recover_chat_writes_task(self):
+    try:
+        recovered = recover_chat_writes()
+        if recovered:
+            logger.warning(f"Recovered {recovered} chat messages left unflushed by a dead process.")
+        return recovered
+    except Exception as e:
+        logger.exception("Chat write recovery failed.")
+        self.retry(exc=e, countdown=60)
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.models import ChatMessage
+from core.pagination import ApproximateCountPaginator, ApproximateCountPagination
+
+User = get_user_model()
+
+
+@override_settings(APPROX_COUNT_THRESHOLD=5)
+class ApproximateCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room_name='lobby' if i % 2 else 'other', username='u', message=f'm{i}') for i in range(6)
+        ])
+
+    def test_unfiltered_big_table_uses_cached_estimate(self):
+        paginator = ApproximateCountPaginator(ChatMessage.objects.order_by('id'), 2)
+        self.assertTrue(paginator.is_approximate)
+        self.assertEqual(paginator.count, 6)
+        self.assertEqual(str(paginator.count), '~6')
+
+        ChatMessage.objects.create(room_name='lobby', username='u', message='late')
+        with self.assertNumQueries(0):
+            self.assertEqual(ApproximateCountPaginator(ChatMessage.objects.all(), 2).count, 6)
+
+    def test_filtered_or_small_sets_are_counted_exactly(self):
+        paginator = ApproximateCountPaginator(ChatMessage.objects.filter(room_name='lobby'), 2)
+        self.assertFalse(paginator.is_approximate)
+        self.assertEqual(paginator.count, 3)
+
+        with override_settings(APPROX_COUNT_THRESHOLD=100):
+            self.assertFalse(ApproximateCountPaginator(ChatMessage.objects.all(), 2).is_approximate)
+
+    def test_api_pagination_flags_approximate_counts(self):
+        pagination = ApproximateCountPagination()
+        pagination.page_size = 2
+        request = Request(APIRequestFactory().get('/'))
+        page = pagination.paginate_queryset(ChatMessage.objects.order_by('id'), request)
+        response = pagination.get_paginated_response([m.message for m in page])
+        self.assertEqual(response.data['count'], 6)
+        self.assertTrue(response.data['count_is_approximate'])
+
+    def test_admin_changelist_shows_approximate_count(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:core_chatmessage_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['cl'].paginator.is_approximate)
+        self.assertContains(response, '~6')
@@ -0,0 +1,86 @@
+"""
+Encode-once broadcasts, with a benchmark of the per-broadcast CPU cost of
+fanning one chat line out to a 500-viewer room.
+"""
+import json
+import time
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from apps.watchparty.consumers import WatchPartyConsumer
+from core import broadcast
+from core.consumers import ChatConsumer
+
+VIEWERS = 500
+ROUNDS = 20
+
+
+def chat_payload(consumer_class):
+    payload = {'message': 'Did you see that? ' * 20, 'username': 'viewer', 'is_system': False}
+    if consumer_class is WatchPartyConsumer:
+        payload['id'] = 2 ** 60
+    return payload
+
+
+def fan_out(consumer_class, event):
+    """
+    CPU seconds for VIEWERS consumers to handle one group event, per
+    broadcast (best of ROUNDS).
+    """
+    sent = []
+
+    async def send(self, text_data=None, bytes_data=None):
+        sent.append(text_data)
+
+    consumers = [consumer_class() for _ in range(VIEWERS)]
+    best = float('inf')
+    with patch.object(consumer_class, 'send', send):
+        for _ in range(ROUNDS):
+            started = time.process_time()
+            for consumer in consumers:
+                coroutine = consumer.chat_message(event)
+                try:
+                    coroutine.send(None)
+                except StopIteration:
+                    pass
+            best = min(best, time.process_time() - started)
+    return best, sent
+
+
+class FrameTests(SimpleTestCase):
+    def test_group_event_carries_the_client_frame(self):
+        event = broadcast.group_event('emote_rain', {'emote': 'wave'})
+        self.assertEqual(event['type'], 'emote_rain')
+        self.assertEqual(json.loads(broadcast.frame(event)), {'type': 'emote_rain', 'emote': 'wave'})
+
+    def test_keyed_events_are_encoded_once_per_process(self):
+        event = broadcast.keyed_event('video_sync', {'timestamp': 1.0})
+        with patch.object(broadcast.json, 'dumps', wraps=json.dumps) as dumps:
+            frames = {broadcast.frame(event) for _ in range(10)}
+        self.assertEqual(dumps.call_count, 1)
+        self.assertEqual(json.loads(frames.pop()), {'type': 'video_sync', 'timestamp': 1.0})
+
+    def test_frame_cache_is_bounded(self):
+        cache = broadcast.FrameCache(size=2)
+        for event_id in range(3):
+            cache.get_or_build(event_id, lambda: str(event_id))
+        self.assertEqual(list(cache.frames), [1, 2])
+
+    def test_plain_events_still_work(self):
+        frame = broadcast.frame({'type': 'chat_message', 'message': 'hi'}, lambda fields: {'text': fields['message']})
+        self.assertEqual(frame, '{"text": "hi"}')
+
+
+class FanOutBenchmark(SimpleTestCase):
+    def test_cpu_per_broadcast(self):
+        for consumer_class in (WatchPartyConsumer, ChatConsumer):
+            payload = chat_payload(consumer_class)
+            # Before: every recipient encodes the raw event
+            before, old_frames = fan_out(consumer_class, {'type': 'chat_message', **payload})
+            after, new_frames = fan_out(consumer_class, broadcast.group_event('chat_message', payload))
+            print(
+                f"\n{consumer_class.__name__}: {VIEWERS} recipients, "
+                f"{before * 1000:.2f} ms -> {after * 1000:.2f} ms CPU per broadcast"
+            )
+            # Same frames on the wire
+            self.assertEqual(json.loads(old_frames[0]), json.loads(new_frames[0]))
+            self.assertLess(after, before)
@@ -0,0 +1,142 @@
+import unittest
+from unittest.mock import Mock, patch
+import pytest
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from apps.watchparty.models import Message, Room
+from content.models import Anime, Season, Episode
+from core import chat_history, write_behind
+from core.consumers import ChatConsumer
+from core.models import ChatMessage
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+@override_settings(CHAT_HISTORY_SIZE=3)
+class RingBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch.object(chat_history, 'get_redis_connection', Mock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.load = Mock(return_value=[{'id': 1, 'message': 'old'}, {'id': 2, 'message': 'older row pushed too'}])
+
+    def test_cold_history_is_merged_with_the_database_once(self):
+        chat_history.push('room', {'id': 2, 'message': 'older row pushed too'})
+        chat_history.push('room', {'id': 10, 'message': 'new'})
+        expected = [{'id': 1, 'message': 'old'}, {'id': 2, 'message': 'older row pushed too'}, {'id': 10, 'message': 'new'}]
+        self.assertEqual(chat_history.recent('room', self.load), expected)
+        self.assertEqual(chat_history.recent('room', self.load), expected)
+        self.load.assert_called_once()
+
+    def test_history_is_capped(self):
+        chat_history.recent('room', Mock(return_value=[]))
+        for entry_id in range(5):
+            chat_history.push('room', {'id': entry_id})
+        self.assertEqual([entry['id'] for entry in chat_history.recent('room', self.load)], [2, 3, 4])
+        self.load.assert_not_called()
+
+    def test_remove(self):
+        chat_history.recent('room', Mock(return_value=[]))
+        chat_history.push('room', {'id': 1})
+        chat_history.push('room', {'id': 2})
+        chat_history.remove('room', 1)
+        self.assertEqual(chat_history.recent('room', self.load), [{'id': 2}])
+
+
+class NoRedisTests(TestCase):
+    def test_history_comes_from_the_database(self):
+        with patch.object(chat_history, 'get_redis_connection', return_value=None):
+            chat_history.push('room', {'id': 1})
+            self.assertEqual(chat_history.recent('room', lambda: ['from db']), ['from db'])
+
+
+async def drain(communicator):
+    frames = []
+    while not await communicator.receive_nothing(timeout=0.1):
+        frames.append(await communicator.receive_json_from())
+    return frames
+
+
+@pytest.mark.skipif(fakeredis is None, reason="fakeredis not installed")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_chat_history_is_one_frame_without_database_reads(settings):
+    settings.CHAT_FLUSH_INTERVAL_MS = 50
+    cache.clear()
+    redis = fakeredis.FakeRedis()
+    application = URLRouter([path("ws/chat/<str:room_name>/", ChatConsumer.as_asgi())])
+    with patch.object(chat_history, 'get_redis_connection', return_value=redis), \
+            patch.object(write_behind, 'get_redis_connection', return_value=redis):
+        await sync_to_async(ChatMessage.objects.create)(room_name='lobby', username='early', message='before redis')
+        sender = WebsocketCommunicator(application, "/ws/chat/lobby/")
+        await sender.connect()
+        history = [frame for frame in await drain(sender) if frame['type'] == 'history']
+        assert history[0]['messages'][0]['message'] == 'before redis'
+        for i in range(3):
+            await sender.send_json_to({'message': f'hi {i}', 'username': 'sender'})
+        await drain(sender)
+
+        with patch.object(ChatConsumer, 'load_last_messages') as load:
+            joiner = WebsocketCommunicator(application, "/ws/chat/lobby/")
+            await joiner.connect()
+            history = [frame for frame in await drain(joiner) if frame['type'] == 'history']
+        load.assert_not_called()
+        assert len(history) == 1
+        assert [m['message'] for m in history[0]['messages']] == ['before redis', 'hi 0', 'hi 1', 'hi 2']
+        await sender.disconnect()
+        await joiner.disconnect()
+
+
+@pytest.mark.skipif(fakeredis is None, reason="fakeredis not installed")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_watch_party_late_joiners_get_history():
+    cache.clear()
+    redis = fakeredis.FakeRedis()
+
+    @sync_to_async
+    def create_room():
+        host = User.objects.create_user(username='host', password='p')
+        viewer = User.objects.create_user(username='viewer', password='p')
+        season = Season.objects.create(anime=Anime.objects.create(title='History'), number=1)
+        room = Room.objects.create(host=host, episode=Episode.objects.create(season=season, number=1))
+        Message.objects.create(room=room, sender=host, content='stored earlier')
+        Message.objects.create(room=room, sender=host, content='joined', is_system=True)
+        return host, viewer, room
+
+    host, viewer, room = await create_room()
+    from aniscrap_core.asgi import application
+    with patch.object(chat_history, 'get_redis_connection', return_value=redis), \
+            patch.object(write_behind, 'get_redis_connection', return_value=redis):
+        host_comm = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+        host_comm.scope["user"] = host
+        await host_comm.connect()
+        await drain(host_comm)
+        await host_comm.send_json_to({'type': 'chat', 'message': 'live one'})
+        await host_comm.send_json_to({'type': 'chat', 'message': 'deleted one'})
+        frames = await drain(host_comm)
+        await host_comm.send_json_to({'type': 'delete_message', 'message_id': frames[-1]['id']})
+        await drain(host_comm)
+
+        viewer_comm = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+        viewer_comm.scope["user"] = viewer
+        await viewer_comm.connect()
+        history = [frame for frame in await drain(viewer_comm) if frame['type'] == 'history']
+        assert len(history) == 1
+        assert [(m['username'], m['message']) for m in history[0]['messages']] == [
+            ('host', 'stored earlier'), ('host', 'live one'),
+        ]
+        await host_comm.disconnect()
+        await viewer_comm.disconnect()
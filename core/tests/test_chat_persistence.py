@@ -49,14 +49,16 @@ class ChatPersistenceTests(TransactionTestCase):
         connected2, subprotocol2 = await communicator2.connect()
         self.assertTrue(connected2)
 
-        # Should receive the history message immediately, but might be interleaved with user_count
+        # Should receive the history in one frame, but might be interleaved with user_count
         found_history = False
         for _ in range(5):
             response = await communicator2.receive_json_from()
-            if response.get('type') == 'chat_message' and response.get('message') == 'Hello World':
+            if response.get('type') == 'history':
                 found_history = True
-                self.assertEqual(response['username'], 'User1')
-                self.assertIn('created_at', response)
+                self.assertEqual(len(response['messages']), 1)
+                self.assertEqual(response['messages'][0]['message'], 'Hello World')
+                self.assertEqual(response['messages'][0]['username'], 'User1')
+                self.assertIn('created_at', response['messages'][0])
                 break
 
         self.assertTrue(found_history, "Did not receive history message")
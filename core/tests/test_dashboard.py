@@ -1,6 +1,19 @@
-from django.test import TestCase, RequestFactory
+import json
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from django.utils import timezone
 from content.models import Anime, Season, Episode, VideoFile
 from core.dashboard import dashboard_callback
+from core.metrics import GB, SYSTEM_SAMPLES_KEY, collect_snapshot, record_system_sample, system_samples
+from core.tasks import collect_dashboard_metrics_task
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 class DashboardTests(TestCase):
     def setUp(self):
@@ -46,3 +59,48 @@ class DashboardTests(TestCase):
         self.assertEqual(len(data), 7)
         # Check that the last element (today) is 1.0 GB
         self.assertEqual(data[-1], 1.0)
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        season = Season.objects.create(anime=Anime.objects.create(title="Snapshot Anime"), number=1)
+        episode = Episode.objects.create(season=season, number=1)
+        old = VideoFile.objects.create(episode=episode, quality='720p', hls_path='a', encryption_key='k', file_size_bytes=2 * GB)
+        VideoFile.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=20))
+        VideoFile.objects.create(episode=episode, quality='1080p', hls_path='b', encryption_key='k', file_size_bytes=GB)
+
+    def test_snapshot_groups_days_in_one_query(self):
+        # anime, episodes, total size, per-day sizes, revenue
+        with self.assertNumQueries(5):
+            snapshot = collect_snapshot()
+        self.assertEqual(len(snapshot['daily_bytes']), 90)
+        self.assertEqual(snapshot['daily_bytes'][-1][1], GB)
+        self.assertEqual(snapshot['daily_bytes'][-21][1], 2 * GB)
+
+    def test_dashboard_reads_the_snapshot(self):
+        collect_dashboard_metrics_task()
+        with self.assertNumQueries(0):
+            stats = dashboard_callback(self.factory.get('/', {'range': 30}), {})['dashboard_stats']
+
+        data = json.loads(stats['bandwidth_chart'])['datasets'][0]['data']
+        self.assertEqual(len(data), 30)
+        self.assertEqual((data[-21], data[-1]), (2.0, 1.0))
+        self.assertEqual(stats['bandwidth_saved_gb'], 3.0)
+        self.assertEqual(len(json.loads(stats['system_chart'])['labels']), 1)
+
+        # Unknown ranges fall back to the default week
+        stats = dashboard_callback(self.factory.get('/', {'range': 'all'}), {})['dashboard_stats']
+        self.assertEqual(stats['bandwidth_range'], 7)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    @override_settings(DASHBOARD_SYSTEM_SAMPLES=3)
+    def test_system_samples_are_capped_in_redis(self):
+        redis = fakeredis.FakeRedis()
+        with patch('core.metrics.get_redis_connection', return_value=redis):
+            for _ in range(5):
+                record_system_sample()
+            samples = system_samples()
+        self.assertEqual(redis.llen(SYSTEM_SAMPLES_KEY), 3)
+        self.assertEqual(set(samples[0]), {'ts', 'cpu', 'ram'})
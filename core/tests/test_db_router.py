@@ -0,0 +1,115 @@
+import os
+import tempfile
+from unittest.mock import patch
+from django.db import connections
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from core import db_router
+from core.db_router import ReplicaRouter, ReplicaRoutingMiddleware, replica_reads, PIN_COOKIE
+from core.models import Blog
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG=5)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        self.router = ReplicaRouter()
+        patcher = patch('core.db_router.replica_lag', return_value=0.0)
+        self.lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_replica_only_inside_scope(self):
+        self.assertEqual(self.router.db_for_read(Blog), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Blog), 'replica')
+            # Read-your-writes: the rest of the scope stays on the primary
+            self.assertEqual(self.router.db_for_write(Blog), 'default')
+            self.assertEqual(self.router.db_for_read(Blog), 'default')
+
+    def test_lagging_or_broken_replica_falls_back_to_primary(self):
+        self.lag.return_value = 30.0
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Blog), 'default')
+
+        db_router._health.clear()
+        self.lag.side_effect = RuntimeError('replica down')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Blog), 'default')
+
+    def test_lag_is_checked_once_per_interval(self):
+        with replica_reads():
+            for _ in range(5):
+                self.router.db_for_read(Blog)
+        self.assertEqual(self.lag.call_count, 1)
+
+    def test_middleware_pins_clients_after_writes(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Blog))
+            if request.GET.get('write'):
+                self.router.db_for_write(Blog)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+
+        response = middleware(factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = middleware(factory.post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        middleware(pinned)
+
+        response = middleware(factory.get('/', {'write': '1'}))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.assertEqual(seen, ['replica', 'default', 'default', 'replica'])
+
+
+class TwoSQLiteFilesTests(SimpleTestCase):
+    """
+    Routes between the test database and a second SQLite file. Runs outside
+    a test transaction (which would pin reads to the primary) and cleans up.
+    """
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.tmp.name, 'replica.sqlite3'),
+        }
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Blog)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        self.addCleanup(Blog.objects.using('replica').all().delete)
+        self.addCleanup(Blog.objects.using('default').all().delete)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_scoped_reads_hit_the_replica_file(self):
+        Blog.objects.create(title='Primary', slug='post', content='x')
+        Blog.objects.using('replica').create(title='Replica', slug='post', content='x')
+
+        self.assertEqual(Blog.objects.get(slug='post').title, 'Primary')
+        with replica_reads():
+            self.assertEqual(Blog.objects.get(slug='post').title, 'Replica')
+            Blog.objects.create(title='Second', slug='second', content='x')
+            self.assertEqual(Blog.objects.get(slug='second').title, 'Second')
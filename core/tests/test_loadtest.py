@@ -0,0 +1,75 @@
+import json
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from apps.watchparty.models import Room
+from core.models import ChatMessage
+from core.loadtest import markers_in, percentile, run_load_test
+
+
+class HelperTests(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 99), 3)
+        self.assertIsNone(percentile([], 50))
+
+    def test_markers_in(self):
+        self.assertEqual(markers_in({'type': 'chat_message', 'message': 'lt 7'}), [7])
+        self.assertEqual(markers_in({'type': 'chat_message', 'message': 'hello'}), [])
+        self.assertEqual(markers_in({'type': 'video_sync', 'timestamp': 3.0}), [3])
+        self.assertEqual(markers_in({'type': 'emote_burst', 'emotes': {'4': 1, '9': 1}}), [4, 9])
+        self.assertEqual(markers_in({'type': 'notification', 'seq': 5}), [5])
+
+
+class LoadTestBenchmark(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_report(self):
+        # Real rows that merely share the prefix are left alone
+        fan = get_user_model().objects.create_user(username='loadtest_fan', password='p')
+        ChatMessage.objects.create(room_name='loadtest_0', username='loadtest_fan', message='hi', user=fan)
+
+        report = run_load_test(rooms=2, viewers=5, duration=1.5, rate=1.0, settle=0.3)
+
+        self.assertEqual([s['consumer'] for s in report['scenarios']], ['watchparty', 'chat', 'notifications'])
+        for scenario in report['scenarios']:
+            print(
+                f"\n{scenario['consumer']}: {scenario['connections']} connections, "
+                f"fan-out p50 {scenario['fanout_latency_ms']['p50']} ms / p99 {scenario['fanout_latency_ms']['p99']} ms, "
+                f"{scenario['messages_per_second']} msg/s, {scenario['memory_per_connection_kb']} KiB per connection"
+            )
+            self.assertEqual(scenario['connections'], 10)
+            self.assertGreater(sum(scenario['sent'].values()), 0)
+            self.assertIsNotNone(scenario['fanout_latency_ms']['p99'])
+            self.assertGreater(scenario['messages_per_second'], 0)
+            self.assertGreater(scenario['memory_per_connection_kb'], 0)
+
+        watchparty, chat, notifications = report['scenarios']
+        # Every chat line reaches the whole room; notifications go to one user
+        for scenario in (watchparty, chat):
+            self.assertEqual(scenario['delivered'].get('chat', 0), scenario['sent'].get('chat', 0) * 5)
+        self.assertEqual(notifications['delivered'], notifications['sent'])
+
+        # Synthetic users, rooms and chat messages are removed
+        self.assertEqual(list(get_user_model().objects.filter(username__startswith='loadtest_').values_list('username', flat=True)), ['loadtest_fan'])
+        self.assertEqual(list(ChatMessage.objects.values_list('message', flat=True)), ['hi'])
+        self.assertEqual(Room.objects.count(), 0)
+
+    def test_command_outputs_json(self):
+        out = StringIO()
+        call_command(
+            'loadtest_websockets', '--consumers', 'chat', '--rooms', '1', '--viewers', '3',
+            '--duration', '0.5', '--rate', '2', '--settle', '0.2', '--yes-i-mean-it', stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['layer'], 'memory')
+        self.assertEqual(report['scenarios'][0]['connections'], 3)
+
+    def test_command_refuses_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest_websockets', '--consumers', 'chat', '--rooms', '1', '--viewers', '1')
@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.watchparty.models import Room, Participant, Message
+from content.models import Anime, Season, Episode
+from core.models import ChatMessage
+from core.retention import run_retention
+from users.models import User, Notification
+
+
+@override_settings(
+    CHAT_MESSAGE_RETENTION_DAYS=90,
+    WATCHPARTY_MESSAGE_RETENTION_DAYS=30,
+    WATCHPARTY_IDLE_ROOM_DAYS=1,
+    READ_NOTIFICATION_RETENTION_DAYS=30,
+)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='keeper', password='password')
+        self.other = User.objects.create_user(username='leaver', password='password')
+        season = Season.objects.create(anime=Anime.objects.create(title='Retention'), number=1)
+        self.episode = Episode.objects.create(season=season, number=1)
+        self.long_ago = timezone.now() - timedelta(days=120)
+
+    def _age(self, queryset):
+        queryset.update(created_at=self.long_ago)
+
+    def test_expired_rows_are_removed_and_reported(self):
+        for i in range(5):
+            ChatMessage.objects.create(room_name='general', username='keeper', message=f'old {i}')
+        self._age(ChatMessage.objects.all())
+        ChatMessage.objects.create(room_name='general', username='keeper', message='fresh')
+
+        room = Room.objects.create(episode=self.episode, host=self.user)
+        Message.objects.create(room=room, sender=self.user, content='old')
+        self._age(Message.objects.all())
+        Message.objects.create(room=room, sender=self.user, content='fresh')
+
+        Notification.objects.create(user=self.user, title='read', message='m', is_read=True)
+        Notification.objects.create(user=self.user, title='unread', message='m')
+        self._age(Notification.objects.all())
+
+        report = run_retention(batch_size=2)
+
+        self.assertEqual(report['chat_messages'], 5)
+        self.assertEqual(list(ChatMessage.objects.values_list('message', flat=True)), ['fresh'])
+        self.assertEqual(report['watchparty_messages'], 1)
+        self.assertEqual(report['read_notifications'], 1)
+        # Unread notifications are kept however old
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['unread'])
+
+    def test_offline_participants_of_inactive_rooms_are_purged(self):
+        closed = Room.objects.create(episode=self.episode, host=self.user, is_active=False)
+        idle = Room.objects.create(episode=self.episode, host=self.user)
+        busy = Room.objects.create(episode=self.episode, host=self.user)
+        Room.objects.filter(pk__in=[idle.pk, busy.pk]).update(created_at=self.long_ago)
+
+        Participant.objects.create(room=closed, user=self.other, is_online=False)
+        Participant.objects.create(room=idle, user=self.other, is_online=False)
+        Participant.objects.create(room=busy, user=self.user, is_online=True)
+        Participant.objects.create(room=busy, user=self.other, is_online=False)
+
+        self.assertEqual(run_retention()['watchparty_participants'], 2)
+        self.assertEqual(Participant.objects.filter(room=busy).count(), 2)
+
+    @override_settings(READ_NOTIFICATION_RETENTION_DAYS=0)
+    def test_disabled_policy_and_archive(self):
+        Notification.objects.create(user=self.user, title='read', message='m', is_read=True)
+        self._age(Notification.objects.all())
+        ChatMessage.objects.create(room_name='general', username='keeper', message='archived')
+        self._age(ChatMessage.objects.all())
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            report = run_retention(archive_dir=archive_dir)
+            self.assertNotIn('read_notifications', report)
+            with gzip.open(os.path.join(archive_dir, os.listdir(archive_dir)[0]), 'rt') as fh:
+                self.assertEqual(json.loads(fh.readline())['message'], 'archived')
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_command_dry_run_counts_only(self):
+        ChatMessage.objects.create(room_name='general', username='keeper', message='old')
+        self._age(ChatMessage.objects.all())
+        out = StringIO()
+        call_command('apply_retention', '--dry-run', '--only', 'chat_messages', stdout=out)
+        self.assertIn('chat_messages: 1', out.getvalue())
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+
+class DefaultRetentionTests(TestCase):
+    def test_chat_is_kept_by_default(self):
+        # Chat badges count messages and rooms over all time
+        user = User.objects.create_user(username='chatty', password='password')
+        ChatMessage.objects.create(room_name='general', username='chatty', message='old', user=user)
+        ChatMessage.objects.update(created_at=timezone.now() - timedelta(days=3650))
+        report = run_retention()
+        self.assertNotIn('chat_messages', report)
+        self.assertNotIn('watchparty_messages', report)
+        self.assertEqual(ChatMessage.objects.count(), 1)
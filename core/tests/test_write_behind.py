@@ -0,0 +1,226 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import Mock, patch
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from apps.watchparty.models import Message, Room
+from content.models import Anime, Season, Episode
+from core import write_behind
+from core.models import ChatMessage
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+def create_room():
+    host = User.objects.create_user(username='host', password='p')
+    season = Season.objects.create(anime=Anime.objects.create(title='Buffered'), number=1)
+    return host, Room.objects.create(host=host, episode=Episode.objects.create(season=season, number=1))
+
+
+class SnowflakeTests(SimpleTestCase):
+    def test_ids_are_unique_and_ordered(self):
+        generator = write_behind.Snowflake(worker_id=3)
+        ids = [generator.next_id() for _ in range(10000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertLess(max(ids), 1 << 63)
+        self.assertAlmostEqual(write_behind.snowflake_time(ids[0]), time.time(), delta=5)
+
+    def test_workers_do_not_collide(self):
+        a, b = write_behind.Snowflake(1), write_behind.Snowflake(2)
+        self.assertFalse({a.next_id() for _ in range(100)} & {b.next_id() for _ in range(100)})
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+@override_settings(CHAT_FLUSH_INTERVAL_MS=50, CHAT_FLUSH_MAX_MESSAGES=100)
+class WriteBehindTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.host, self.room = create_room()
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch.object(write_behind, 'get_redis_connection', Mock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = write_behind.WriteBehindBuffer()
+
+    def fields(self, content):
+        return {
+            'id': write_behind.snowflake.next_id(), 'room_id': str(self.room.uuid),
+            'sender_id': self.host.id, 'content': content, 'is_system': False,
+        }
+
+    async def test_messages_are_inserted_in_one_batch(self):
+        with patch.object(Message.objects, 'bulk_create', wraps=Message.objects.bulk_create) as bulk_create:
+            for i in range(20):
+                await self.buffer.add(Message, self.fields(f'm{i}'))
+            self.assertEqual(await sync_to_async(Message.objects.count)(), 0)
+            self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 20)
+            # The timed flush, however long a loaded machine takes over it
+            await asyncio.wait_for(self.buffer.flush_task, timeout=10)
+        bulk_create.assert_called_once()
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 20)
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+
+    @override_settings(CHAT_FLUSH_MAX_MESSAGES=5)
+    async def test_full_buffer_flushes_at_once(self):
+        for i in range(5):
+            await self.buffer.add(Message, self.fields(f'm{i}'))
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 5)
+
+    async def test_delete_before_flush(self):
+        kept, dropped = self.fields('kept'), self.fields('dropped')
+        await self.buffer.add(Message, kept)
+        await self.buffer.add(Message, dropped)
+        with patch.object(write_behind, 'chat_writes', self.buffer):
+            self.assertTrue(await write_behind.delete_message(Message, dropped['id']))
+        await self.buffer.flush()
+        ids = await sync_to_async(lambda: list(Message.objects.values_list('id', flat=True)))()
+        self.assertEqual(ids, [kept['id']])
+
+    async def test_delete_of_message_buffered_elsewhere(self):
+        other_process = self.fields('elsewhere')
+        await self.buffer.add(Message, other_process)
+        # This process doesn't hold it: a tombstone stops the other one
+        self.assertTrue(await write_behind.delete_message(Message, other_process['id']))
+        await self.buffer.flush()
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 0)
+        self.assertFalse(await write_behind.delete_message(Message, 12345))
+
+    def test_stale_stream_entries_are_recovered(self):
+        rows = [self.fields('lost'), self.fields('fresh')]
+        stale_ms = int((time.time() - 120) * 1000)
+        self.redis.xadd(write_behind.STREAM_KEY, write_behind._serialize('watchparty.Message', rows[0]), id=f'{stale_ms}-0')
+        self.redis.xadd(write_behind.STREAM_KEY, write_behind._serialize('watchparty.Message', rows[1]))
+        self.assertEqual(write_behind.recover_chat_writes(), 1)
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['lost'])
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 1)
+        # Replaying an already stored message is harmless
+        write_behind.persist([(Message, rows[0])])
+        self.assertEqual(Message.objects.count(), 1)
+
+    async def test_delete_during_flush(self):
+        raced = self.fields('raced')
+        await self.buffer.add(Message, raced)
+        real_insert = write_behind._insert
+
+        def insert_while_deleted(model, objs):
+            # The host deletes the message after persist checked tombstones,
+            # before the insert commits
+            self.assertTrue(async_to_sync(write_behind.delete_message)(Message, raced['id']))
+            return real_insert(model, objs)
+
+        with patch.object(write_behind, '_insert', side_effect=insert_while_deleted):
+            await self.buffer.flush()
+        self.assertEqual(await sync_to_async(Message.objects.count)(), 0)
+
+    @override_settings(CHAT_WRITE_LOG_MAX_LEN=10)
+    async def test_write_log_is_capped(self):
+        # Nothing gets flushed, yet the log stays near its cap (trimming is approximate)
+        with patch.object(write_behind, 'persist', side_effect=RuntimeError('database down')):
+            for i in range(200):
+                await self.buffer.add(Message, self.fields(f'm{i}'))
+        self.assertLess(self.redis.xlen(write_behind.STREAM_KEY), 50)
+
+    async def test_room_deleted_before_flush(self):
+        orphan = self.fields('orphan')
+        await self.buffer.add(Message, orphan)
+        other_room = await sync_to_async(Room.objects.create)(host=self.host, episode=self.room.episode)
+        await self.buffer.add(Message, dict(self.fields('kept'), room_id=str(other_room.uuid)))
+        await sync_to_async(self.room.delete)()
+        await self.buffer.flush()
+        self.assertEqual(await sync_to_async(lambda: list(Message.objects.values_list('content', flat=True)))(), ['kept'])
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+
+    def test_orphans_do_not_block_recovery(self):
+        other_room = Room.objects.create(host=self.host, episode=self.room.episode)
+        rows = [self.fields('orphan'), dict(self.fields('kept'), room_id=str(other_room.uuid))]
+        stale_ms = int((time.time() - 120) * 1000)
+        for i, fields in enumerate(rows):
+            self.redis.xadd(write_behind.STREAM_KEY, write_behind._serialize('watchparty.Message', fields), id=f'{stale_ms}-{i}')
+        self.room.delete()
+        self.assertEqual(write_behind.recover_chat_writes(), 1)
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['kept'])
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+        # Nothing left to fail on the next run
+        self.assertEqual(write_behind.recover_chat_writes(), 0)
+
+    def test_bad_row_is_skipped_without_failing_the_batch(self):
+        rows = [self.fields('first'), self.fields('second')]
+        real_bulk_create = Message.objects.bulk_create
+
+        def bulk_create(objs, **kwargs):
+            if any(obj.content == 'first' for obj in objs):
+                raise IntegrityError('constraint failed')
+            return real_bulk_create(objs, **kwargs)
+
+        with patch.object(Message.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(write_behind.persist([(Message, fields) for fields in rows]), 1)
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['second'])
+
+    def test_sender_cleared_for_anonymous_chat(self):
+        user = User.objects.create_user(username='gone', password='p')
+        fields = {
+            'id': write_behind.snowflake.next_id(), 'room_name': 'lobby', 'username': 'gone', 'message': 'hi', 'user_id': user.id,
+        }
+        user.delete()
+        write_behind.persist([(ChatMessage, fields)])
+        self.assertIsNone(ChatMessage.objects.get(room_name='lobby').user_id)
+
+    def test_badge_checks_are_coalesced(self):
+        with patch('users.tasks.calculate_chat_badges_task.apply_async') as apply_async:
+            for i in range(3):
+                write_behind.persist([(Message, self.fields(f'm{i}'))])
+            write_behind.persist([(Message, dict(self.fields('joined'), is_system=True))])
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (self.host.id,))
+
+    async def test_core_chat_messages(self):
+        await self.buffer.add(ChatMessage, {
+            'id': write_behind.snowflake.next_id(), 'room_name': 'lobby', 'username': 'anon', 'message': 'hi', 'user_id': None,
+        })
+        await self.buffer.flush()
+        saved = await sync_to_async(ChatMessage.objects.get)(room_name='lobby')
+        self.assertEqual((saved.username, saved.message), ('anon', 'hi'))
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_chat_is_broadcast_with_id_before_it_is_stored(settings):
+    settings.CHAT_FLUSH_INTERVAL_MS = 50
+    cache.clear()
+    host, room = await sync_to_async(create_room)()
+    redis = fakeredis.FakeRedis()
+    from aniscrap_core.asgi import application
+    with patch.object(write_behind, 'get_redis_connection', return_value=redis):
+        communicator = WebsocketCommunicator(application, f"/ws/watch-party/{room.uuid}/")
+        communicator.scope["user"] = host
+        connected, _ = await communicator.connect()
+        assert connected
+        while not await communicator.receive_nothing(timeout=0.1):
+            await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'chat', 'message': 'hello'})
+        frame = await communicator.receive_json_from()
+        assert frame['type'] == 'chat_message' and frame['message'] == 'hello'
+        for _ in range(100):
+            if await sync_to_async(Message.objects.filter(id=frame['id']).exists)():
+                break
+            await asyncio.sleep(0.1)
+        message = await sync_to_async(Message.objects.get)(id=frame['id'])
+        assert message.content == 'hello'
+
+        await communicator.send_json_to({'type': 'delete_message', 'message_id': frame['id']})
+        assert (await communicator.receive_json_from())['type'] == 'message_deleted'
+        assert not await sync_to_async(Message.objects.filter(id=frame['id']).exists)()
+        await communicator.disconnect()
@@ -0,0 +1,296 @@
+"""
+Write-behind persistence for chat messages.
+
+Chat consumers hand messages to the process-wide `chat_writes` buffer
+instead of inserting them one by one: each message gets a Snowflake id up
+front (so it can be broadcast, and deleted, before it is stored), is
+appended to a Redis stream as a write-ahead log, and is inserted with
+bulk_create every CHAT_FLUSH_INTERVAL_MS or CHAT_FLUSH_MAX_MESSAGES
+messages, whichever comes first. Stream entries are removed once their
+batch is committed; entries left behind by a crashed process are replayed
+by recover_chat_writes_task (inserts ignore ids already stored, so replays
+are harmless). Messages whose room or sender was deleted while they waited
+are dropped rather than failing their batch, so they can't block the log,
+and the stream is capped at about CHAT_WRITE_LOG_MAX_LEN entries.
+
+bulk_create skips post_save, so the chat badge check is queued here, once
+per user per CHAT_BADGE_COALESCE_SECONDS. Without Redis (SQLite/dev mode)
+messages are written straight through.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from .redis_client import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'chat:write_log'
+TOMBSTONE_KEY = 'chat:deleted:{}'
+# Snowflake layout: 41 bits of ms since EPOCH_MS, 10 bits worker, 12 bits sequence
+EPOCH_MS = 1704067200000  # 2024-01-01
+WORKER_BITS, SEQUENCE_BITS = 10, 12
+
+
+class Snowflake:
+    """
+    Time-ordered 63-bit ids, unique per worker without a database round
+    trip. They sit far above anything the id sequences will reach.
+    """
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id % (1 << WORKER_BITS)
+        self.last_ms = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_id(self):
+        with self.lock:
+            now = int(time.time() * 1000)
+            if now <= self.last_ms:
+                # Same millisecond (or the clock stepped back): count on
+                now = self.last_ms
+                self.sequence = (self.sequence + 1) % (1 << SEQUENCE_BITS)
+                if self.sequence == 0:
+                    now += 1
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+
+def snowflake_time(snowflake_id):
+    """
+    Epoch seconds a Snowflake id was generated at.
+    """
+    return ((snowflake_id >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
+
+
+def _worker_id():
+    configured = os.getenv('CHAT_WORKER_ID')
+    if configured:
+        return int(configured)
+    return zlib.crc32(f'{socket.gethostname()}:{os.getpid()}'.encode())
+
+
+snowflake = Snowflake(_worker_id())
+
+
+def _serialize(label, fields):
+    return {'model': label, 'fields': json.dumps(fields)}
+
+
+def _deserialize(entry):
+    return apps.get_model(entry[b'model'].decode()), json.loads(entry[b'fields'])
+
+
+def mark_badges_dirty(user_ids):
+    """
+    Queues one chat badge check per user, however many messages they sent
+    within CHAT_BADGE_COALESCE_SECONDS.
+    """
+    # Avoid circular import
+    from users.tasks import calculate_chat_badges_task
+    window = settings.CHAT_BADGE_COALESCE_SECONDS
+    for user_id in set(user_ids):
+        if cache.add(f'chat_badges_dirty:{user_id}', 1, window):
+            calculate_chat_badges_task.apply_async((user_id,), countdown=window)
+
+
+def _drop_orphans(model, rows):
+    """
+    Rows of `model` whose foreign keys still point somewhere: the room or
+    sender may be deleted while a message waits. Nullable keys are cleared
+    instead.
+    """
+    for field in model._meta.concrete_fields:
+        if not isinstance(field, models.ForeignKey) or not any(field.attname in fields for fields in rows):
+            continue
+        wanted = {fields[field.attname] for fields in rows if fields.get(field.attname) is not None}
+        existing = {
+            str(pk) for pk in field.related_model._base_manager.filter(pk__in=wanted).values_list('pk', flat=True)
+        }
+        kept = []
+        for fields in rows:
+            value = fields.get(field.attname)
+            if value is None or str(value) in existing:
+                kept.append(fields)
+            elif field.null:
+                kept.append(dict(fields, **{field.attname: None}))
+            else:
+                logger.info(f"Dropped chat message {fields['id']}: its {field.name} no longer exists.")
+        rows = kept
+    return rows
+
+
+def _insert(model, objs):
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs, ignore_conflicts=True)
+        return objs
+    except IntegrityError:
+        if len(objs) == 1:
+            # Deleted meanwhile; one bad row mustn't block the log
+            logger.info(f"Skipped chat message {objs[0].pk}: integrity error.")
+            return []
+    # Retry row by row so the rest of the batch is stored
+    return [obj for single in objs for obj in _insert(model, [single])]
+
+
+def _drop_deleted_meanwhile(redis, by_model):
+    """
+    Deletes inserted rows that were tombstoned after the check in persist:
+    a delete racing with the flush finds neither a buffered message nor a
+    stored row. delete_message writes the tombstone before its own delete,
+    so one of the two always sees the message.
+    """
+    kept = {}
+    for model, objs in by_model.items():
+        if not objs:
+            continue
+        deleted = redis.mget([TOMBSTONE_KEY.format(obj.id) for obj in objs])
+        gone = [obj.id for obj, tombstone in zip(objs, deleted) if tombstone is not None]
+        if gone:
+            model.objects.filter(id__in=gone).delete()
+        kept[model] = [obj for obj, tombstone in zip(objs, deleted) if tombstone is None]
+    return kept
+
+
+def persist(rows):
+    """
+    Inserts [(model, fields)] with one bulk_create per model, skipping ids
+    already stored or deleted meanwhile and rows whose room or sender is
+    gone, then marks badge checks. Returns the number of rows inserted.
+    """
+    redis = get_redis_connection()
+    if redis is not None and rows:
+        deleted = redis.mget([TOMBSTONE_KEY.format(fields['id']) for _model, fields in rows])
+        rows = [row for row, gone in zip(rows, deleted) if gone is None]
+
+    by_fields = {}
+    for model, fields in rows:
+        by_fields.setdefault(model, []).append(fields)
+    by_model = {
+        model: _insert(model, [model(**fields) for fields in _drop_orphans(model, field_rows)])
+        for model, field_rows in by_fields.items()
+    }
+    if redis is not None:
+        by_model = _drop_deleted_meanwhile(redis, by_model)
+
+    # Avoid circular import
+    from apps.watchparty.models import Message
+    senders = [obj.sender_id for obj in by_model.get(Message, []) if obj.sender_id and not obj.is_system]
+    if senders:
+        transaction.on_commit(lambda: mark_badges_dirty(senders))
+    return sum(len(objs) for objs in by_model.values())
+
+
+class WriteBehindBuffer:
+    """
+    Per-process buffer of messages waiting for their batch insert.
+    """
+
+    def __init__(self):
+        self.pending = []  # [(stream id, model, fields)]
+        self.flush_task = None
+
+    async def add(self, model, fields):
+        """
+        Stores `fields` (which must include the id) for a later insert.
+        """
+        redis = get_redis_connection()
+        if redis is None:
+            await database_sync_to_async(persist)([(model, fields)])
+            return
+        # Capped, so a stuck flusher can't grow the log without bound
+        stream_id = await sync_to_async(redis.xadd)(
+            STREAM_KEY, _serialize(model._meta.label, fields),
+            maxlen=settings.CHAT_WRITE_LOG_MAX_LEN, approximate=True,
+        )
+        self.pending.append((stream_id, model, fields))
+        if len(self.pending) >= settings.CHAT_FLUSH_MAX_MESSAGES:
+            await self.flush()
+        elif self.flush_task is None or self.flush_task.done() or self.flush_task.get_loop() is not asyncio.get_running_loop():
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    def discard(self, model, message_id):
+        """
+        Drops a message still waiting here. Returns its stream id, or None
+        if it isn't buffered in this process.
+        """
+        for index, (stream_id, pending_model, fields) in enumerate(self.pending):
+            if pending_model is model and fields['id'] == message_id:
+                del self.pending[index]
+                return stream_id
+        return None
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.CHAT_FLUSH_INTERVAL_MS / 1000)
+        await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            await database_sync_to_async(persist)([(model, fields) for _stream_id, model, fields in batch])
+        except Exception:
+            # Left in the stream for recover_chat_writes_task
+            logger.exception(f"Failed to persist {len(batch)} chat messages.")
+            return
+        redis = get_redis_connection()
+        if redis is not None:
+            await sync_to_async(redis.xdel)(STREAM_KEY, *[stream_id for stream_id, _model, _fields in batch])
+
+
+chat_writes = WriteBehindBuffer()
+
+
+async def delete_message(model, message_id):
+    """
+    Deletes a message whether or not it has been stored yet; True if it
+    existed (or may still be waiting in another process's buffer).
+    """
+    redis = get_redis_connection()
+    stream_id = chat_writes.discard(model, message_id)
+    if stream_id is not None:
+        await sync_to_async(redis.xdel)(STREAM_KEY, stream_id)
+        return True
+    age = time.time() - snowflake_time(message_id)
+    buffered = redis is not None and 0 <= age < settings.CHAT_RECOVERY_AGE * 2
+    if buffered:
+        # Possibly still buffered elsewhere, or in a flush under way: make
+        # sure it is never inserted (or is removed right after). Written
+        # before the delete below, see _drop_deleted_meanwhile
+        await sync_to_async(redis.set)(TOMBSTONE_KEY.format(message_id), 1, ex=settings.CHAT_RECOVERY_AGE * 4)
+    deleted, _ = await database_sync_to_async(lambda: model.objects.filter(id=message_id).delete())()
+    return bool(deleted) or buffered
+
+
+def recover_chat_writes():
+    """
+    Inserts stream entries older than CHAT_RECOVERY_AGE, i.e. those whose
+    process died before flushing them. Returns how many were recovered.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return 0
+    # Stream ids start with their creation time in ms
+    cutoff = int((time.time() - settings.CHAT_RECOVERY_AGE) * 1000)
+    recovered = 0
+    while True:
+        entries = redis.xrange(STREAM_KEY, '-', cutoff, count=settings.CHAT_FLUSH_MAX_MESSAGES)
+        if not entries:
+            return recovered
+        recovered += persist([_deserialize(entry) for _stream_id, entry in entries])
+        redis.xdel(STREAM_KEY, *[stream_id for stream_id, _entry in entries])
@@ -26,6 +26,9 @@ import { WebGLRenderer } from "../player/Anime4K/WebGLRenderer";
 import { useSyncManager } from "../watchparty/useSyncManager";
 import { PartyPanel } from "../watchparty/PartyPanel";
 
+// Most floating emotes shown for one emote of a watch party burst
+const MAX_EMOTES_PER_BURST = 8;
+
 interface VideoPlayerProps {
   episode: EpisodeDetail;
   roomUuid?: string; // WatchParty Room ID
@@ -174,18 +177,21 @@ export default function VideoPlayer({
   const [emotes, setEmotes] = useState<
     { id: number; char: string; left: number }[]
   >([]);
+  const emoteIdRef = useRef(0);
   useEffect(() => {
     const handleEmote = (e: Event) => {
       const customEvent = e as CustomEvent;
       const char = customEvent.detail.emote;
+      // A burst can count hundreds of the same emote; don't flood the DOM
+      const count = Math.min(customEvent.detail.count ?? 1, MAX_EMOTES_PER_BURST);
 
-      const id = Date.now();
+      const ids = Array.from({ length: count }, () => ++emoteIdRef.current);
       setEmotes((prev) => [
         ...prev,
-        { id, char, left: Math.random() * 90 + 5 },
+        ...ids.map((id) => ({ id, char, left: Math.random() * 90 + 5 })),
       ]);
       setTimeout(() => {
-        setEmotes((prev) => prev.filter((item) => item.id !== id));
+        setEmotes((prev) => prev.filter((item) => !ids.includes(item.id)));
       }, 3000);
     };
     window.addEventListener("emote-rain", handleEmote);
@@ -17,10 +17,27 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
   
   // Drift Correction Threshold (seconds)
   const DRIFT_THRESHOLD = 1.5;
+  // How often we tell the server where our video is (ms)
+  const POSITION_REPORT_INTERVAL = 2000;
 
-  const triggerEmoteRain = useCallback((emote: string) => {
+  // Our clock minus the server's (seconds), from the ping/pong exchange
+  const clockOffsetRef = useRef<number | null>(null);
+
+  const nowSeconds = () => Date.now() / 1000;
+
+  // Turns a server-anchored position into where playback should be right now
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  const targetPosition = useCallback((data: any, playing: boolean) => {
+    if (!playing || clockOffsetRef.current === null || data.server_time === undefined) {
+      return data.position ?? data.timestamp;
+    }
+    const elapsed = nowSeconds() - clockOffsetRef.current - data.server_time;
+    return (data.position ?? data.timestamp) + Math.max(elapsed, 0) * (data.rate ?? 1);
+  }, []);
+
+  const triggerEmoteRain = useCallback((emote: string, count: number) => {
     // Dispatch custom event for UI to pick up
-    window.dispatchEvent(new CustomEvent('emote-rain', { detail: { emote } }));
+    window.dispatchEvent(new CustomEvent('emote-rain', { detail: { emote, count } }));
   }, []);
 
   // eslint-disable-next-line @typescript-eslint/no-explicit-any
@@ -31,8 +48,14 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
     // Ignore updates if I am the sender (optimistic UI)
     if (data.sender_id === user?.id) return;
 
-    const remoteTime = data.timestamp;
     const remoteState = data.state; // 'playing' | 'paused'
+    // The server anchors the position to the moment it sent the frame
+    const remoteTime = targetPosition(data, remoteState === 'playing');
+
+    // Sync Rate
+    if (data.rate && video.playbackRate !== data.rate) {
+      video.playbackRate = data.rate;
+    }
 
     // Sync State
     if (remoteState === 'paused' && !video.paused) {
@@ -47,7 +70,19 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
       console.log(`Correcting drift: ${drift}s`);
       video.currentTime = remoteTime;
     }
-  }, [user, videoRef]);
+  }, [user, videoRef, targetPosition]);
+
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  const handleDriftCorrection = useCallback((data: any) => {
+    if (!videoRef.current) return;
+    const video = videoRef.current;
+    if (data.action === 'rate') {
+      // Soft correction: catch up or fall back gradually
+      video.playbackRate = data.rate;
+    } else if (data.action === 'seek') {
+      video.currentTime = targetPosition(data, !video.paused);
+    }
+  }, [videoRef, targetPosition]);
 
   const handleMessage = useCallback((data: WebSocketMessage) => {
     switch (data.type) {
@@ -57,19 +92,43 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
       case 'chat_message':
         setChatMessages(prev => [...prev, data]);
         break;
+      case 'history':
+        // Recent messages, sent once on join
+        setChatMessages(prev => [...data.messages, ...prev]);
+        break;
       case 'message_deleted':
         setChatMessages(prev => prev.filter(msg => msg.id !== data.message_id));
         break;
       case 'participants_update':
         setParticipants(data.participants);
         break;
-      case 'emote_rain':
-        triggerEmoteRain(data.emote);
+      case 'participant_joined':
+        setParticipants(prev => prev.some(p => p.user__id === data.participant.user__id)
+          ? prev
+          : [...prev, data.participant]);
+        break;
+      case 'participant_left':
+        setParticipants(prev => prev.filter(p => p.user__id !== data.user_id));
+        break;
+      case 'emote_burst':
+        // Emotes sent in the last window, counted per emote
+        Object.entries(data.emotes as Record<string, number>).forEach(([emote, count]) => {
+          triggerEmoteRain(emote, count);
+        });
+        break;
+      case 'ping':
+        wsRef.current?.send(JSON.stringify({ type: 'pong', id: data.id, client_time: nowSeconds() }));
+        break;
+      case 'clock':
+        clockOffsetRef.current = data.offset;
+        break;
+      case 'drift_correction':
+        handleDriftCorrection(data);
         break;
       default:
         break;
     }
-  }, [handleVideoSync, triggerEmoteRain]);
+  }, [handleVideoSync, handleDriftCorrection, triggerEmoteRain]);
 
   useEffect(() => {
     if (!roomUuid) return;
@@ -83,8 +142,19 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
     ws.onopen = () => {
       console.log('Connected to WatchParty WS');
       setIsConnected(true);
+      // Opt in to clock sync and drift correction
+      ws.send(JSON.stringify({ type: 'clock_start' }));
     };
 
+    const positionTimer = window.setInterval(() => {
+      if (ws.readyState !== WebSocket.OPEN || !videoRef.current || clockOffsetRef.current === null) return;
+      ws.send(JSON.stringify({
+        type: 'position',
+        timestamp: videoRef.current.currentTime,
+        client_time: nowSeconds()
+      }));
+    }, POSITION_REPORT_INTERVAL);
+
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
       handleMessage(data);
@@ -96,16 +166,18 @@ export function useSyncManager(roomUuid: string, user: any, videoRef: React.RefO
     };
 
     return () => {
+      window.clearInterval(positionTimer);
       ws.close();
     };
-  }, [roomUuid, handleMessage]);
+  }, [roomUuid, handleMessage, videoRef]);
 
   const sendSync = (state: 'playing' | 'paused', timestamp: number) => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
       wsRef.current.send(JSON.stringify({
         type: 'sync',
         state,
-        timestamp
+        timestamp,
+        rate: videoRef.current?.playbackRate ?? 1
       }));
     }
   };
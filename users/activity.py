@@ -0,0 +1,137 @@
+"""
+Per-user activity-day bitmap.
+
+Every day a user watches something sets one bit in `UserActivity.days_bitmap`.
+Streak counters are maintained incrementally on insert so current and longest
+streak lookups are a single primary-key read, regardless of history length.
+"""
+from datetime import date, datetime
+from django.db import transaction
+from django.utils import timezone
+from .models import UserActivity, WatchLog
+
+EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(value=None):
+    """
+    Returns the number of days since the Unix epoch for a date or datetime
+    (in the current timezone). Defaults to today.
+    """
+    if value is None:
+        value = timezone.localdate()
+    elif isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return (value - EPOCH).days
+
+
+def iter_active_days(activity):
+    """
+    Yields the active epoch days recorded in the bitmap, in ascending order.
+    """
+    if activity.first_day is None:
+        return
+    for index, byte in enumerate(bytes(activity.days_bitmap)):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte & (0x80 >> bit):
+                yield activity.first_day + index * 8 + bit
+
+
+def _encode_days(days):
+    """
+    Builds (first_day, bitmap) from an iterable of epoch days.
+    """
+    days = sorted(set(days))
+    if not days:
+        return None, b''
+    first_day = days[0]
+    bitmap = bytearray((days[-1] - first_day) // 8 + 1)
+    for day in days:
+        offset = day - first_day
+        bitmap[offset // 8] |= 0x80 >> (offset % 8)
+    return first_day, bytes(bitmap)
+
+
+def _recount_streaks(activity):
+    """
+    Recomputes streak counters by scanning the bitmap. Only needed when days
+    arrive out of order (backfills); the normal path is incremental.
+    """
+    current = longest = 0
+    previous = None
+    for day in iter_active_days(activity):
+        current = current + 1 if previous is not None and day == previous + 1 else 1
+        longest = max(longest, current)
+        previous = day
+    activity.last_active_day = previous
+    activity.current_streak = current
+    activity.longest_streak = longest
+
+
+def mark_day(activity, day):
+    """
+    Sets the bit for `day` and updates the streak counters.
+    Returns False if the day was already recorded.
+    """
+    if activity.first_day is None or day < activity.first_day:
+        activity.first_day, activity.days_bitmap = _encode_days([*iter_active_days(activity), day])
+    else:
+        bitmap = bytearray(activity.days_bitmap)
+        offset = day - activity.first_day
+        index, mask = offset // 8, 0x80 >> (offset % 8)
+        if index < len(bitmap) and bitmap[index] & mask:
+            return False
+        if index >= len(bitmap):
+            bitmap.extend(bytes(index + 1 - len(bitmap)))
+        bitmap[index] |= mask
+        activity.days_bitmap = bytes(bitmap)
+
+    last = activity.last_active_day
+    if last is None or day > last + 1:
+        activity.current_streak = 1
+        activity.last_active_day = day
+    elif day == last + 1:
+        activity.current_streak += 1
+        activity.last_active_day = day
+    else:
+        _recount_streaks(activity)
+    activity.longest_streak = max(activity.longest_streak, activity.current_streak)
+    return True
+
+
+def record_activity(user_id, when=None):
+    """
+    Records that the user was active on the day of `when` (default: today).
+    """
+    day = epoch_day(when)
+    with transaction.atomic():
+        activity, _ = UserActivity.objects.select_for_update().get_or_create(user_id=user_id)
+        if mark_day(activity, day):
+            activity.save()
+    return activity
+
+
+def get_streaks(activity, today=None):
+    """
+    Returns the current and longest streak for a UserActivity (or None).
+    A streak is still current if the user was last active today or yesterday.
+    """
+    if activity is None or activity.last_active_day is None:
+        return {'current': 0, 'longest': 0}
+    today = epoch_day(today)
+    current = activity.current_streak if activity.last_active_day >= today - 1 else 0
+    return {'current': current, 'longest': activity.longest_streak}
+
+
+def rebuild_activity(user_id):
+    """
+    Rebuilds a user's bitmap and streak counters from their WatchLog history.
+    """
+    days = [epoch_day(d) for d in WatchLog.objects.filter(user_id=user_id).dates('watched_at', 'day')]
+    activity = UserActivity(user_id=user_id)
+    activity.first_day, activity.days_bitmap = _encode_days(days)
+    _recount_streaks(activity)
+    activity.save()
+    return activity
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.admin import ModelAdmin
-from .models import User, Wallet, WatchLog
+from core.pagination import ApproximateCountAdminMixin
+from .models import User, Wallet, WalletTransaction, WatchLog, AnimeWatchDay, Notification
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -16,10 +17,44 @@ class WalletAdmin(ModelAdmin):
     list_display = ('user', 'balance')
     search_fields = ('user__username',)
     list_select_related = ('user',)
+    # Balances change through the ledger (users.wallet)
+    readonly_fields = ('balance',)
+
+@admin.register(WalletTransaction)
+class WalletTransactionAdmin(ApproximateCountAdminMixin, ModelAdmin):
+    list_display = ('wallet', 'amount', 'kind', 'description', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('wallet__user__username', 'idempotency_key')
+    list_select_related = ('wallet__user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(WatchLog)
-class WatchLogAdmin(ModelAdmin):
+class WatchLogAdmin(ApproximateCountAdminMixin, ModelAdmin):
     list_display = ('user', 'episode', 'duration', 'watched_at')
     list_filter = ('watched_at',)
     search_fields = ('user__username',)
     list_select_related = ('user', 'episode__season__anime')
+
+@admin.register(Notification)
+class NotificationAdmin(ApproximateCountAdminMixin, ModelAdmin):
+    list_display = ('user', 'title', 'is_read', 'created_at')
+    list_filter = ('is_read',)
+    search_fields = ('user__username', 'title')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+@admin.register(AnimeWatchDay)
+class AnimeWatchDayAdmin(ModelAdmin):
+    list_display = ('anime', 'day', 'watch_count', 'total_duration')
+    list_filter = ('day',)
+    search_fields = ('anime__title',)
+    list_select_related = ('anime',)
+    date_hierarchy = 'day'
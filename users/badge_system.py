@@ -4,7 +4,8 @@ from django.db.models import Count, Q
 from core.models import ChatMessage
 from content.models import Subscription, Review, VideoFile, Anime, Genre, Episode
 from apps.watchparty.models import Room
-from .models import WatchLog, UserBadge, Badge
+from .models import WatchLog, UserBadge, Badge, UserActivity
+from .rollups import watched_episodes, latest_watch, watched_days_since
 
 class BadgeStrategy:
     """
@@ -101,12 +102,13 @@ class WatchTimeBadgeStrategy(BadgeStrategy):
         if any(b not in awarded_slugs for b in time_badges):
             if cache is not None:
                 if 'last_log' not in cache:
-                    cache['last_log'] = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                    cache['last_log'] = latest_watch(user)
                 last_log = cache['last_log']
             else:
-                last_log = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                last_log = latest_watch(user)
 
-            if last_log:
+            # A rollup row (history already pruned) carries no time of day
+            if isinstance(last_log, WatchLog):
                 # 4. Night Owl: Watched an episode between 2 AM and 5 AM.
                 if 'night-owl' not in awarded_slugs:
                     if 2 <= last_log.watched_at.hour < 5:
@@ -133,17 +135,45 @@ class WatchTimeBadgeStrategy(BadgeStrategy):
 
 class ConsistencyBadgeStrategy(BadgeStrategy):
     def check(self, user, awarded_slugs, all_badges, new_badges, cache=None):
+        streak_slugs = ['streak-master', 'daily-viewer', 'hundred-day-streak', 'year-long-streak']
+        if not any(slug not in awarded_slugs for slug in streak_slugs):
+            return
+
+        # Streak counters are maintained on WatchLog insert (users.activity),
+        # so this is a single primary-key read regardless of history length.
+        if cache is not None:
+            if 'activity' not in cache:
+                cache['activity'] = UserActivity.objects.filter(user=user).first()
+            activity = cache['activity']
+        else:
+            activity = UserActivity.objects.filter(user=user).first()
+        longest_streak = activity.longest_streak if activity else 0
+
+        # 34. Hundred Day Streak: Watched anime for 100 consecutive days.
+        if 'hundred-day-streak' not in awarded_slugs and longest_streak >= 100:
+            self._award(user, 'hundred-day-streak', awarded_slugs, all_badges, new_badges)
+
+        # 35. Year Long Streak: Watched anime for 365 consecutive days.
+        if 'year-long-streak' not in awarded_slugs and longest_streak >= 365:
+            self._award(user, 'year-long-streak', awarded_slugs, all_badges, new_badges)
+
+        if 'daily-viewer' not in awarded_slugs and longest_streak >= 30:
+            self._award(user, 'daily-viewer', awarded_slugs, all_badges, new_badges)
+
+        if 'streak-master' not in awarded_slugs and longest_streak >= 7:
+            self._award(user, 'streak-master', awarded_slugs, all_badges, new_badges)
+
+        # Fall back to the 30-day window for history recorded before the bitmap existed.
         if 'streak-master' not in awarded_slugs or 'daily-viewer' not in awarded_slugs:
             today = timezone.now().date()
             start_date_30 = today - timedelta(days=29)
-            start_datetime_30 = timezone.make_aware(datetime.combine(start_date_30, datetime.min.time()))
 
             if cache is not None:
                 if 'watched_dates_30' not in cache:
-                    cache['watched_dates_30'] = set(WatchLog.objects.filter(user=user, watched_at__gte=start_datetime_30).values_list('watched_at__date', flat=True))
+                    cache['watched_dates_30'] = watched_days_since(user, start_date_30)
                 dates_30 = cache['watched_dates_30']
             else:
-                dates_30 = set(WatchLog.objects.filter(user=user, watched_at__gte=start_datetime_30).values_list('watched_at__date', flat=True))
+                dates_30 = watched_days_since(user, start_date_30)
 
             # 13. Daily Viewer: Watched anime for 30 consecutive days.
             if 'daily-viewer' not in awarded_slugs:
@@ -185,10 +215,10 @@ class ConsumptionBadgeStrategy(BadgeStrategy):
         if 'marathoner' not in awarded_slugs or 'century-club' not in awarded_slugs or 'millennium-club' not in awarded_slugs:
             if cache is not None:
                 if 'episode_ids' not in cache:
-                    cache['episode_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode_id', flat=True).distinct())
+                    cache['episode_ids'] = list(watched_episodes(user).values_list('id', flat=True))
                 distinct_episodes = len(cache['episode_ids'])
             else:
-                distinct_episodes = WatchLog.objects.filter(user=user).values('episode').distinct().count()
+                distinct_episodes = watched_episodes(user).count()
 
             # 9. Marathoner: Watched 50 episodes in total.
             if 'marathoner' not in awarded_slugs and distinct_episodes >= 50:
@@ -206,22 +236,19 @@ class ConsumptionBadgeStrategy(BadgeStrategy):
         if 'loyal-fan' not in awarded_slugs:
             if cache is not None:
                 if 'last_log' not in cache:
-                    cache['last_log'] = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                    cache['last_log'] = latest_watch(user)
                 last_log = cache['last_log']
             else:
-                last_log = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                last_log = latest_watch(user)
             if last_log:
                 anime = last_log.episode.season.anime
-                # Replaced expensive WatchLog multitable join with simple Episode subquery check
-                episode_qs = WatchLog.objects.filter(user=user).values('episode_id')
-                count = Episode.objects.filter(id__in=episode_qs, season__anime=anime).count()
+                count = watched_episodes(user).filter(season__anime=anime).count()
                 if count >= 10:
                     self._award(user, 'loyal-fan', awarded_slugs, all_badges, new_badges)
 
         # 20. Pilot Connoisseur: Watched the first episode of 5 different anime series.
         if 'pilot-connoisseur' not in awarded_slugs:
-            episode_qs = WatchLog.objects.filter(user=user).values('episode_id')
-            count = Episode.objects.filter(id__in=episode_qs, number=1).values('season__anime_id').distinct().count()
+            count = watched_episodes(user).filter(number=1).values('season__anime_id').distinct().count()
 
             if count >= 5:
                 self._award(user, 'pilot-connoisseur', awarded_slugs, all_badges, new_badges)
@@ -229,7 +256,7 @@ class ConsumptionBadgeStrategy(BadgeStrategy):
         # Optimization: Fetch type counts once using DB subquery to avoid loading IDs into memory
         type_badges = ['movie-buff', 'tv-addict', 'ova-enthusiast']
         if any(b not in awarded_slugs for b in type_badges):
-            anime_qs = WatchLog.objects.filter(user=user).values('episode__season__anime_id')
+            anime_qs = watched_episodes(user).values('season__anime_id')
 
             if cache is not None:
                 if 'type_counts' not in cache:
@@ -261,56 +288,60 @@ class CompletionBadgeStrategy(BadgeStrategy):
         if 'season-completist' not in awarded_slugs or 'super-fan' not in awarded_slugs:
             if cache is not None:
                 if 'last_log' not in cache:
-                    cache['last_log'] = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                    cache['last_log'] = latest_watch(user)
                 last_log = cache['last_log']
             else:
-                last_log = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+                last_log = latest_watch(user)
             if last_log:
                 season = last_log.episode.season
                 anime = season.anime
 
                 if cache is not None:
                     if 'episode_ids' not in cache:
-                        cache['episode_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode_id', flat=True).distinct())
+                        cache['episode_ids'] = list(watched_episodes(user).values_list('id', flat=True))
                     user_ep_ids = cache['episode_ids']
                 else:
-                    user_ep_ids = list(WatchLog.objects.filter(user=user).values_list('episode_id', flat=True).distinct())
+                    user_ep_ids = list(watched_episodes(user).values_list('id', flat=True))
+
+                # Season.episode_count / Anime.episode_count are maintained by
+                # content.signals, so totals need no Episode aggregate.
+                episode_qs = watched_episodes(user)
 
                 # 8. Season Completist: Completed an entire season.
                 if 'season-completist' not in awarded_slugs:
-                    season_ep_ids = set(season.episodes.values_list('id', flat=True))
-                    total_season = len(season_ep_ids)
-                    if total_season > 0:
-                        watched_season = len(season_ep_ids.intersection(user_ep_ids))
+                    total_season = season.episode_count
+                    # Can't have completed more episodes than the user has watched in total
+                    if 0 < total_season <= len(user_ep_ids):
+                        watched_season = episode_qs.filter(season=season).count()
                         if watched_season >= total_season:
                             self._award(user, 'season-completist', awarded_slugs, all_badges, new_badges)
 
                 # 23. Super Fan: Completed all episodes of an anime series.
                 if 'super-fan' not in awarded_slugs:
-                    anime_ep_ids = set(Episode.objects.filter(season__anime=anime).values_list('id', flat=True))
-                    total_anime = len(anime_ep_ids)
-                    if total_anime > 0:
-                        watched_anime = len(anime_ep_ids.intersection(user_ep_ids))
+                    total_anime = anime.episode_count
+                    if 0 < total_anime <= len(user_ep_ids):
+                        watched_anime = episode_qs.filter(season__anime=anime).count()
                         if watched_anime >= total_anime:
                             self._award(user, 'super-fan', awarded_slugs, all_badges, new_badges)
 
         # 26. Otaku: Completed 5 different anime series.
         if 'otaku' not in awarded_slugs:
-            anime_qs = WatchLog.objects.filter(user=user).values('episode__season__anime_id')
+            anime_qs = watched_episodes(user).values('season__anime_id')
 
-            total_episodes_qs = Episode.objects.filter(season__anime_id__in=anime_qs).values('season__anime_id').annotate(total=Count('id'))
-            total_map = {i['season__anime_id']: i['total'] for i in total_episodes_qs}
+            total_map = dict(Anime.objects.filter(id__in=anime_qs, episode_count__gt=0).values_list('id', 'episode_count'))
 
-            user_watched_qs = WatchLog.objects.filter(user=user, episode__season__anime_id__in=anime_qs).values('episode__season__anime_id').annotate(watched=Count('episode', distinct=True))
-            watched_map = {i['episode__season__anime_id']: i['watched'] for i in user_watched_qs}
+            # Fewer than 5 candidate series means the badge can't be earned yet
+            if len(total_map) >= 5:
+                user_watched_qs = watched_episodes(user).filter(season__anime_id__in=total_map.keys()).values('season__anime_id').annotate(watched=Count('id'))
+                watched_map = {i['season__anime_id']: i['watched'] for i in user_watched_qs}
 
-            completed = 0
-            for aid, watched_count in watched_map.items():
-                if total_map.get(aid, 0) > 0 and watched_count >= total_map.get(aid, 0):
-                    completed += 1
+                completed = 0
+                for aid, watched_count in watched_map.items():
+                    if watched_count >= total_map[aid]:
+                        completed += 1
 
-            if completed >= 5:
-                self._award(user, 'otaku', awarded_slugs, all_badges, new_badges)
+                if completed >= 5:
+                    self._award(user, 'otaku', awarded_slugs, all_badges, new_badges)
 
 class GenreBadgeStrategy(BadgeStrategy):
     def check(self, user, awarded_slugs, all_badges, new_badges, cache=None):
@@ -322,11 +353,11 @@ class GenreBadgeStrategy(BadgeStrategy):
                 return anime_ids  # pragma: no cover
             if cache is not None:
                 if 'anime_ids' not in cache:
-                    cache['anime_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
+                    cache['anime_ids'] = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
                 anime_ids = cache['anime_ids']
                 return anime_ids
             else:
-                anime_ids = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
+                anime_ids = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
                 return anime_ids
 
         from collections import Counter
@@ -356,11 +387,10 @@ class GenreBadgeStrategy(BadgeStrategy):
         if 'genre-savant' not in awarded_slugs:
             # Optimize to avoid loading episode_ids into memory for DB lookup
             # Count distinct episodes per genre purely at the database level
-            genre_counts_qs = WatchLog.objects.filter(
-                user=user,
-                episode__season__anime__genres__isnull=False
-            ).values('episode__season__anime__genres__id').annotate(
-                count=Count('episode_id', distinct=True)
+            genre_counts_qs = watched_episodes(user).filter(
+                season__anime__genres__isnull=False
+            ).values('season__anime__genres__id').annotate(
+                count=Count('id', distinct=True)
             )
 
             if any(item['count'] >= 50 for item in genre_counts_qs):
@@ -372,10 +402,10 @@ class SpecificGenreBadgeStrategy(BadgeStrategy):
         if 'nightmare' not in awarded_slugs or 'comedy-gold' not in awarded_slugs:
             if cache is not None:
                 if 'anime_ids' not in cache:
-                    cache['anime_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
+                    cache['anime_ids'] = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
                 anime_ids = cache['anime_ids']
             else:
-                anime_ids = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
+                anime_ids = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
 
             genre_counts_qs = Anime.objects.filter(
                 id__in=anime_ids
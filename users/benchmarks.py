@@ -0,0 +1,195 @@
+"""
+Badge evaluation benchmark.
+
+Generates synthetic users with realistic watch histories (Zipf-distributed
+anime popularity, multi-genre catalog, history spread over a year) and
+measures wall time, query count and peak Python memory of check_badges,
+check_chat_badges and the nightly re-evaluation for each history size.
+"""
+import random
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from content.models import Anime, Season, Episode, Genre
+from content.services import reconcile_episode_stats
+from apps.watchparty.models import Room, Message
+from .models import User, WatchLog
+from .services import check_badges, check_chat_badges
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+GENRE_NAMES = [
+    'Action', 'Adventure', 'Comedy', 'Drama', 'Fantasy', 'Horror',
+    'Mystery', 'Romance', 'Sci-Fi', 'Slice of Life', 'Sports', 'Thriller',
+]
+TYPE_WEIGHTS = [('TV', 70), ('Movie', 12), ('OVA', 10), ('ONA', 5), ('Special', 3)]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def build_catalog(rng, anime_count=200, prefix='bench'):
+    """
+    Creates genres and an anime catalog with 1-3 seasons of 12-24 episodes.
+    Returns a list of (anime_id, [episode ids in watch order]) sorted by popularity.
+    """
+    genres = [Genre.objects.get_or_create(name=f'{prefix} {name}', slug=f'{prefix}-{name.lower().replace(" ", "-")}')[0] for name in GENRE_NAMES]
+    types, type_weights = zip(*TYPE_WEIGHTS)
+
+    animes = Anime.objects.bulk_create([
+        Anime(title=f'{prefix} anime {i}', type=rng.choices(types, type_weights)[0], popularity=i + 1)
+        for i in range(anime_count)
+    ])
+    through = Anime.genres.through
+    through.objects.bulk_create([
+        through(anime_id=anime.id, genre_id=genre.id)
+        for anime in animes
+        for genre in rng.sample(genres, rng.randint(1, 3))
+    ])
+
+    seasons = Season.objects.bulk_create([
+        Season(anime=anime, number=n)
+        for anime in animes
+        for n in range(1, (1 if anime.type == 'Movie' else rng.randint(1, 3)) + 1)
+    ])
+    Episode.objects.bulk_create([
+        Episode(season=season, number=n)
+        for season in seasons
+        for n in range(1, (1 if season.anime.type == 'Movie' else rng.randint(12, 24)) + 1)
+    ], batch_size=1000)
+
+    # bulk_create skips the signals that maintain Season/Anime episode counts
+    reconcile_episode_stats()
+
+    episodes = {}
+    for anime_id, episode_id in Episode.objects.filter(season__anime__in=animes).order_by('season__number', 'number').values_list('season__anime_id', 'id'):
+        episodes.setdefault(anime_id, []).append(episode_id)
+    return [(anime.id, episodes.get(anime.id, [])) for anime in animes]
+
+
+def generate_history(rng, user, catalog, size, days=365):
+    """
+    Bulk-inserts `size` WatchLogs: anime are picked with Zipf weights and
+    watched in order, so popular series get completed and long tails sampled.
+    bulk_create bypasses post_save, so no badge tasks fire during setup.
+    """
+    weights = [1.0 / (rank + 1) for rank in range(len(catalog))]
+    now = timezone.now()
+    logs, watched_at = [], []
+    while len(logs) < size:
+        anime_id, episode_ids = rng.choices(catalog, weights)[0]
+        start = rng.randrange(len(episode_ids))
+        for episode_id in episode_ids[start:start + rng.randint(1, 12)]:
+            logs.append(WatchLog(user=user, episode_id=episode_id, duration=rng.randint(300, 1440)))
+            watched_at.append(now - timedelta(days=rng.random() * days))
+            if len(logs) >= size:
+                break
+    WatchLog.objects.bulk_create(logs, batch_size=5000)
+    # Backdated after the insert, which stamps watched_at with its default
+    for log, when in zip(logs, watched_at):
+        log.watched_at = when
+    WatchLog.objects.bulk_update(logs, ['watched_at'], batch_size=1000)
+
+
+def generate_chat(rng, user, rooms, size):
+    Message.objects.bulk_create([
+        Message(room=rng.choice(rooms), sender=user, content='bench')
+        for _ in range(size)
+    ], batch_size=5000)
+
+
+def measure(func, *args):
+    """
+    Runs func and returns wall time (ms), query count and peak traced memory (KiB).
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        func(*args)
+    wall_ms = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_ms': round(wall_ms, 2),
+        'queries': len(ctx.captured_queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def _reset_badge_cache(user_ids):
+    cache.delete_many(
+        [f'user_{uid}_badges_checked' for uid in user_ids]
+        + [f'user_{uid}_chat_badges_checked' for uid in user_ids]
+    )
+
+
+def run_nightly(user_ids):
+    """
+    What reevaluate_all_badges_task fans out to, executed inline so the
+    whole pass can be measured in one process.
+    """
+    for user in User.objects.filter(id__in=user_ids):
+        check_badges(user)
+        check_chat_badges(user)
+
+
+def run_scenario(rng, catalog, rooms, size, cohort=10, user_ids=None):
+    user = User.objects.create(username=f'bench_{size}_{rng.randrange(10**9)}')
+    generate_history(rng, user, catalog, size)
+    generate_chat(rng, user, rooms, min(size // 10, 500))
+
+    cohort_ids = [user.id]
+    for i in range(cohort):
+        member = User.objects.create(username=f'bench_{size}_cohort_{i}_{rng.randrange(10**9)}')
+        generate_history(rng, member, catalog, 10)
+        cohort_ids.append(member.id)
+    if user_ids is not None:
+        user_ids.extend(cohort_ids)
+
+    _reset_badge_cache(cohort_ids)
+    result = {'watch_logs': size, 'check_badges': measure(check_badges, user)}
+    result['check_chat_badges'] = measure(check_chat_badges, user)
+    _reset_badge_cache(cohort_ids)
+    result['nightly'] = measure(run_nightly, cohort_ids)
+    result['nightly']['users'] = len(cohort_ids)
+    return result
+
+
+def _quiet_badge_awards():
+    """
+    Keeps awarded badges from notifying anyone: no Notification rows or
+    channel-layer pushes, and no timeline fan-out for the synthetic users.
+    """
+    stack = ExitStack()
+    stack.enter_context(patch('users.services._send_badge_notifications'))
+    stack.enter_context(patch('users.services.publish_badges'))
+    return stack
+
+
+def run_badge_benchmark(sizes=None, anime_count=200, cohort=10, seed=42, keep=False):
+    """
+    Runs every scenario inside a transaction that is rolled back afterwards
+    (unless keep=True), so the benchmark leaves no synthetic data behind.
+    """
+    rng = random.Random(seed)
+    report = {'seed': seed, 'anime_count': anime_count, 'scenarios': []}
+    user_ids = []
+    try:
+        with _quiet_badge_awards(), transaction.atomic():
+            catalog = build_catalog(rng, anime_count)
+            host = User.objects.create(username=f'bench_host_{rng.randrange(10**9)}')
+            rooms = Room.objects.bulk_create([Room(episode_id=catalog[i][1][0], host=host) for i in range(min(5, len(catalog)))])
+            for size in sizes or DEFAULT_SIZES:
+                report['scenarios'].append(run_scenario(rng, catalog, rooms, size, cohort, user_ids))
+            if not keep:
+                raise _Rollback
+    except _Rollback:
+        # Rolled-back ids can be reused, so don't leave "already checked" flags behind
+        _reset_badge_cache(user_ids)
+    return report
@@ -1,6 +1,9 @@
 import json
 import logging
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from .notifications import get_missed_notifications
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
 
             await self.accept()
+
+            # ?since=<last seq seen> replays what was missed while disconnected.
+            # Joined the group first, so nothing falls in between; clients
+            # drop live and replayed messages whose seq they already have.
+            query_params = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+            since = query_params.get('since', [''])[0]
+            if since.isdigit():
+                await self.send_replay(int(since))
         else:
             logger.warning("Unauthenticated user tried to connect to notifications.")
             await self.close()
@@ -33,11 +44,28 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
             logger.info(f"User {self.user.id} disconnected from notifications.")
 
+    async def send_replay(self, since):
+        notifications, complete = await database_sync_to_async(get_missed_notifications)(self.user.id, since)
+        await self.send(text_data=json.dumps({
+            'type': 'replay',
+            'notifications': notifications,
+            # False means more were missed than fit; fetch the rest over REST
+            'complete': complete,
+        }))
+
     async def notification_message(self, event):
         # Send notification to WebSocket
         await self.send(text_data=json.dumps({
             'type': 'notification',
+            'seq': event.get('id'),
             'title': event['title'],
             'message': event['message'],
             'link': event.get('link', ''),
+            'unread_count': event.get('unread_count'),
+        }))
+
+    async def unread_count(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'count': event['count'],
         }))
@@ -0,0 +1,122 @@
+"""
+Buffered WatchLog ingestion.
+
+Player heartbeats are appended to a Redis list and flushed in batches by
+flush_watch_events_task: consecutive heartbeats for the same (user, episode)
+collapse into one WatchLog row with the summed duration, and each user gets
+a single badge evaluation per flush instead of one per event.
+"""
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import LockError
+from content.models import Episode
+from core.redis_client import get_redis_connection
+from .models import User, WatchLog
+from .activity import epoch_day, record_activity
+from .timeline import publish_watches
+
+WATCH_EVENTS_KEY = 'watch_events'
+FLUSH_LOCK_KEY = 'watch_events_flush_lock'
+# Seconds a flusher may hold the lock; it is renewed just before the insert
+FLUSH_LOCK_TIMEOUT = 300
+
+
+def enqueue_watch_event(user_id, episode_id, duration):
+    """
+    Buffers one watch event. Without Redis (SQLite/dev mode) the event is
+    written straight through as a WatchLog, which fires the usual signals.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        WatchLog.objects.create(user_id=user_id, episode_id=episode_id, duration=duration)
+        return False
+    redis.rpush(WATCH_EVENTS_KEY, json.dumps({
+        'user': user_id,
+        'episode': episode_id,
+        'duration': duration,
+        'ts': time.time(),
+    }))
+    return True
+
+
+def merge_watch_events(events):
+    """
+    Collapses consecutive events of a user for the same episode into one,
+    summing durations and keeping the first timestamp. Events of different
+    users may interleave freely.
+    """
+    merged = []
+    last_by_user = {}
+    for event in events:
+        index = last_by_user.get(event['user'])
+        if index is not None and merged[index]['episode'] == event['episode']:
+            merged[index]['duration'] += event['duration']
+            continue
+        last_by_user[event['user']] = len(merged)
+        merged.append(dict(event))
+    return merged
+
+
+def flush_watch_events(batch_size=None):
+    """
+    Moves up to batch_size buffered events into WatchLog with one bulk_create.
+    Returns the ids of users whose history changed.
+
+    Events are only trimmed from Redis after the insert commits, so a crash
+    mid-flush re-delivers the batch (at-least-once) rather than losing it.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return []
+    batch_size = batch_size or getattr(settings, 'WATCH_EVENT_BATCH_SIZE', 5000)
+
+    # Only one flusher at a time, otherwise two workers could insert the same
+    # range. The lock holds a token, so only its holder can renew or release it
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return []
+    try:
+        raw = redis.lrange(WATCH_EVENTS_KEY, 0, batch_size - 1)
+        if not raw:
+            return []
+        events = merge_watch_events(json.loads(item) for item in raw)
+
+        # Drop events whose episode or user disappeared since they were queued
+        episode_ids = set(Episode.objects.filter(id__in={e['episode'] for e in events}).values_list('id', flat=True))
+        user_ids = set(User.objects.filter(id__in={e['user'] for e in events}).values_list('id', flat=True))
+        events = [e for e in events if e['episode'] in episode_ids and e['user'] in user_ids]
+
+        logs = [
+            WatchLog(
+                user_id=e['user'],
+                episode_id=e['episode'],
+                duration=e['duration'],
+                watched_at=datetime.fromtimestamp(e['ts'], tz=dt_timezone.utc),
+            )
+            for e in events
+        ]
+        with transaction.atomic():
+            # Raises (rolling back) if the lock expired and someone else took over
+            lock.reacquire()
+            WatchLog.objects.bulk_create(logs, batch_size=1000)
+        redis.ltrim(WATCH_EVENTS_KEY, len(raw), -1)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired meanwhile; the next holder's lock is left alone
+            pass
+
+    # bulk_create skips post_save, so do the signal work here: activity days
+    # once per user/day, timeline fan-out once per user
+    publish_watches(logs)
+    seen = set()
+    for log in logs:
+        key = (log.user_id, epoch_day(log.watched_at))
+        if key not in seen:
+            seen.add(key)
+            record_activity(log.user_id, log.watched_at)
+    return sorted({log.user_id for log in logs})
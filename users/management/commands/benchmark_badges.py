@@ -0,0 +1,30 @@
+import json
+from django.core.management.base import BaseCommand
+from users.benchmarks import DEFAULT_SIZES, run_badge_benchmark
+
+class Command(BaseCommand):
+    help = 'Benchmarks badge evaluation against synthetic watch histories and prints a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='WatchLog counts per scenario')
+        parser.add_argument('--anime', type=int, default=200, help='Size of the synthetic catalog')
+        parser.add_argument('--cohort', type=int, default=10, help='Extra light users per scenario for the nightly pass')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic data instead of rolling it back')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        report = run_badge_benchmark(
+            sizes=options['sizes'],
+            anime_count=options['anime'],
+            cohort=options['cohort'],
+            seed=options['seed'],
+            keep=options['keep'],
+        )
+        output = json.dumps(report, indent=2)
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
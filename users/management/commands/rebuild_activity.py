@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from users.models import WatchLog
+from users.activity import rebuild_activity
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-user activity-day bitmaps and streak counters from WatchLog history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the given user id')
+
+    def handle(self, *args, **options):
+        user_ids = WatchLog.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+        if options.get('user'):
+            user_ids = user_ids.filter(user_id=options['user'])
+
+        count = 0
+        for user_id in user_ids.iterator():
+            rebuild_activity(user_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt activity for {count} users."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from users.wallet import reconcile_wallets
+
+class Command(BaseCommand):
+    help = 'Compares wallet balances with the sum of their ledger transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reset mismatched balances to the ledger total')
+
+    def handle(self, *args, **options):
+        mismatched = reconcile_wallets(fix=options['fix'])
+        for wallet, ledger_balance in mismatched:
+            self.stdout.write(f"{wallet.user.username}: balance {wallet.balance} != ledger {ledger_balance}")
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("All wallets match their ledger."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Reset {len(mismatched)} wallets to their ledger balance."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} wallets differ from their ledger (run with --fix to reset)."))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0041_user_is_public_alter_user_username_follow_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('first_day', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_active_day', models.PositiveIntegerField(blank=True, null=True)),
+                ('days_bitmap', models.BinaryField(default=b'')),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Activity',
+                'verbose_name_plural': 'User Activities',
+            },
+        ),
+    ]
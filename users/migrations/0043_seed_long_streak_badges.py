@@ -0,0 +1,36 @@
+from django.db import migrations
+
+def seed_badges(apps, schema_editor):
+    Badge = apps.get_model('users', 'Badge')
+
+    # Hundred Day Streak
+    Badge.objects.get_or_create(
+        slug='hundred-day-streak',
+        defaults={
+            'name': 'Hundred Day Streak',
+            'description': 'Watched anime for 100 consecutive days.'
+        }
+    )
+
+    # Year Long Streak
+    Badge.objects.get_or_create(
+        slug='year-long-streak',
+        defaults={
+            'name': 'Year Long Streak',
+            'description': 'Watched anime for 365 consecutive days.'
+        }
+    )
+
+def remove_badges(apps, schema_editor):
+    Badge = apps.get_model('users', 'Badge')
+    Badge.objects.filter(slug__in=['hundred-day-streak', 'year-long-streak']).delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0042_useractivity"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_badges, remove_badges),
+    ]
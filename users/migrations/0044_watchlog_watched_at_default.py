@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:32
+
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0043_seed_long_streak_badges'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='watchlog',
+            name='watched_at',
+            field=models.DateTimeField(default=users.models.watched_at_default),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0018_episode_stats'),
+        ('users', '0044_watchlog_watched_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnimeWatchDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveBigIntegerField(default=0)),
+                ('anime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_days', to='content.anime')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='users_anime_day_4442e8_idx')],
+                'unique_together': {('anime', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EpisodeWatchDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveBigIntegerField(default=0)),
+                ('episode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_days', to='content.episode')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='users_episo_day_edbdfa_idx')],
+                'unique_together': {('episode', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserWatchDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveBigIntegerField(default=0)),
+                ('episode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_watch_days', to='content.episode')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='users_userw_user_id_9e7e70_idx')],
+                'unique_together': {('user', 'episode', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:45
+
+import django.db.models.deletion
+import users.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0018_episode_stats'),
+        ('users', '0045_watch_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaybackPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(help_text='Seconds into the episode')),
+                ('length', models.PositiveIntegerField(blank=True, help_text='Episode length in seconds, as reported by the player', null=True)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(default=users.models.watched_at_default)),
+                ('episode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback_positions', to='content.episode')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback_positions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'completed', '-updated_at'], name='users_playb_user_id_ad3a20_idx')],
+                'unique_together': {('user', 'episode')},
+            },
+        ),
+    ]
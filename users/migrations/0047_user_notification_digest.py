@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0046_playbackposition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_digest',
+            field=models.BooleanField(default=False, help_text='Email one daily summary instead of an email per new episode.', verbose_name='Daily Notification Digest'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    """
+    Balances from before the ledger become opening entries, so balance
+    always equals the sum of a wallet's transactions.
+    """
+    Wallet = apps.get_model('users', 'Wallet')
+    WalletTransaction = apps.get_model('users', 'WalletTransaction')
+    WalletTransaction.objects.bulk_create([
+        WalletTransaction(wallet_id=wallet_id, amount=balance, kind='opening', idempotency_key=f'opening:{wallet_id}')
+        for wallet_id, balance in Wallet.objects.exclude(balance=0).values_list('id', 'balance').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0048_notification_retention_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('kind', models.CharField(choices=[('opening', 'Opening Balance'), ('revenue', 'Revenue Share'), ('payout', 'Payout'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='users.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'created_at'], name='users_walle_wallet__0439ce_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from django.core.validators import RegexValidator
@@ -28,6 +29,11 @@ class User(AbstractUser):
     is_premium = models.BooleanField(default=False, verbose_name=_("Premium Status"))
     bio = models.TextField(_("bio"), blank=True, max_length=500)
     is_public = models.BooleanField(default=True, verbose_name=_("Public Profile"))
+    notification_digest = models.BooleanField(
+        default=False,
+        verbose_name=_("Daily Notification Digest"),
+        help_text=_("Email one daily summary instead of an email per new episode."),
+    )
 
     def __str__(self):
         return self.username
@@ -39,11 +45,52 @@ class Wallet(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Wallet: {self.balance:.2f}"
 
+
+class WalletTransaction(models.Model):
+    """
+    Append-only ledger of wallet balance changes (see users.wallet). The
+    idempotency key makes posting the same change twice a no-op.
+    """
+    KIND_CHOICES = (
+        ('opening', 'Opening Balance'),
+        ('revenue', 'Revenue Share'),
+        ('payout', 'Payout'),
+        ('adjustment', 'Adjustment'),
+    )
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='transactions')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Wallet transactions are append-only; post a correcting entry instead.")
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Wallet transactions are append-only; post a correcting entry instead.")
+
+    def __str__(self):
+        return f"{self.wallet_id}: {self.amount:+.2f} ({self.kind})"
+
+
+def watched_at_default():
+    # Looked up at call time (unlike default=timezone.now) so patched clocks apply
+    return timezone.now()
+
+
 class WatchLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watch_logs')
     episode = models.ForeignKey('content.Episode', on_delete=models.CASCADE, related_name='watch_logs')
     duration = models.PositiveIntegerField(help_text=_("Duration watched in seconds"))
-    watched_at = models.DateTimeField(auto_now_add=True)
+    watched_at = models.DateTimeField(default=watched_at_default)
 
     class Meta:
         indexes = [
@@ -53,6 +100,115 @@ class WatchLog(models.Model):
     def __str__(self):
         return f"{self.user.username} watched {self.episode} for {self.duration}s"
 
+class UserWatchDay(models.Model):
+    """
+    Daily WatchLog rollup per user and episode, built by users.rollups.
+    Survives WatchLog retention, so badge checks keep the full history.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watch_days')
+    episode = models.ForeignKey('content.Episode', on_delete=models.CASCADE, related_name='user_watch_days')
+    day = models.DateField()
+    watch_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'episode', 'day')
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.episode_id} on {self.day}"
+
+class EpisodeWatchDay(models.Model):
+    """
+    Daily WatchLog rollup per episode (revenue distribution, analytics).
+    """
+    episode = models.ForeignKey('content.Episode', on_delete=models.CASCADE, related_name='watch_days')
+    day = models.DateField()
+    watch_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('episode', 'day')
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.episode_id} on {self.day}"
+
+class AnimeWatchDay(models.Model):
+    """
+    Daily WatchLog rollup per anime (analytics, trending).
+    """
+    anime = models.ForeignKey('content.Anime', on_delete=models.CASCADE, related_name='watch_days')
+    day = models.DateField()
+    watch_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('anime', 'day')
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.anime_id} on {self.day}"
+
+class PlaybackPosition(models.Model):
+    """
+    Last known player position per user and episode. Written in batches
+    from the Redis position hashes by users.playback.flush_positions.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='playback_positions')
+    episode = models.ForeignKey('content.Episode', on_delete=models.CASCADE, related_name='playback_positions')
+    position = models.PositiveIntegerField(help_text=_("Seconds into the episode"))
+    length = models.PositiveIntegerField(null=True, blank=True, help_text=_("Episode length in seconds, as reported by the player"))
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(default=watched_at_default)
+
+    class Meta:
+        unique_together = ('user', 'episode')
+        indexes = [
+            models.Index(fields=['user', 'completed', '-updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} at {self.position}s of {self.episode_id}"
+
+class Watermark(models.Model):
+    """
+    Resume point of an incremental job, e.g. the last WatchLog id rolled up.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+class UserActivity(models.Model):
+    """
+    Compact record of the days a user watched something.
+    Bit N of `days_bitmap` (most significant bit first, the same layout as
+    Redis SETBIT) is set when the user was active on `first_day + N`, where
+    days are counted since the Unix epoch.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='activity')
+    first_day = models.PositiveIntegerField(null=True, blank=True)
+    last_active_day = models.PositiveIntegerField(null=True, blank=True)
+    days_bitmap = models.BinaryField(default=b'')
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("User Activity")
+        verbose_name_plural = _("User Activities")
+
+    def __str__(self):
+        return f"{self.user.username}: {self.current_streak} day streak"
+
 class Badge(models.Model):
     slug = models.SlugField(unique=True, help_text=_("Unique identifier for the badge logic"))
     name = models.CharField(max_length=100)
@@ -89,6 +245,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['is_read', 'created_at']),
         ]
 
     def __str__(self):
@@ -0,0 +1,222 @@
+"""
+Per-user unread notification counters and replay streams.
+
+The count lives in Redis ('notif:unread:<user id>') and is adjusted by the
+code paths that create or read notifications, so unread_count is a single
+GET. Adjustments only apply to counters that exist: a missing counter is
+rebuilt from the database on the next read, which is also how drift heals
+(counters expire after a day). Without Redis every read is a COUNT query.
+
+Each user also has a capped stream ('notif:stream:<user id>') of their most
+recent notifications, so a reconnecting NotificationConsumer can replay what
+it missed. Entries are appended once the notification's transaction commits.
+The Notification id is the sequence number clients deduplicate on; ids are
+taken at insert, so a lower one can commit after a higher one was seen, and
+replays also resend everything from the last WATERMARK_LAG_SECONDS.
+
+Users with notification_digest set get their unread notifications of the
+last day in one daily email instead of per-episode emails.
+"""
+import json
+from datetime import datetime, timedelta
+from itertools import groupby
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.redis_client import get_redis_connection
+from .models import Notification
+
+COUNTER_TTL = 60 * 60 * 24
+STREAM_MAXLEN = 100
+STREAM_TTL = 60 * 60 * 24 * 7
+REPLAY_LIMIT = 100
+DIGEST_MAX_ITEMS = 50
+
+# INCRBY only if the counter is already there, never below zero
+_ADJUST_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+    return 0
+end
+return value
+"""
+
+
+def _counter_key(user_id):
+    return f'notif:unread:{user_id}'
+
+
+def _stream_key(user_id):
+    return f'notif:stream:{user_id}'
+
+
+def serialize_notification(notification):
+    return {
+        'seq': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'link': notification.link or '',
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def track_new_notifications(notifications):
+    """
+    Bookkeeping for freshly saved notifications (single save or bulk_create):
+    bumps the unread counters and appends them to the replay streams.
+    """
+    deltas = {}
+    for notification in notifications:
+        if not notification.is_read:
+            deltas[notification.user_id] = deltas.get(notification.user_id, 0) + 1
+    adjust_unread_counts(deltas)
+
+    # Backends that don't return ids from bulk_create fall back to the DB replay
+    entries = [(n.user_id, serialize_notification(n)) for n in notifications if n.id is not None]
+    if entries:
+        # A rolled back notification must not be replayed
+        transaction.on_commit(lambda: _append_to_streams(entries))
+
+
+def _append_to_streams(entries):
+    redis = get_redis_connection()
+    if redis is None:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for user_id, data in entries:
+        key = _stream_key(user_id)
+        pipe.xadd(key, {'data': json.dumps(data)}, maxlen=STREAM_MAXLEN, approximate=False)
+        pipe.expire(key, STREAM_TTL)
+    pipe.execute()
+
+
+def get_missed_notifications(user_id, since, limit=REPLAY_LIMIT):
+    """
+    Notifications with a sequence number above `since`, plus those created in
+    the last WATERMARK_LAG_SECONDS (a lower id may have committed after
+    `since` was seen), oldest first, and whether that is everything (False
+    when more than `limit` were missed).
+
+    The stream only answers when it reaches back to `since`; otherwise older
+    entries may have been trimmed or never written, so the DB is used.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'WATERMARK_LAG_SECONDS', 300))
+    redis = get_redis_connection()
+    if redis is not None:
+        entries = [json.loads(fields[b'data']) for _, fields in redis.xrange(_stream_key(user_id))]
+        if entries and min(e['seq'] for e in entries) <= since:
+            missed = sorted(
+                (e for e in entries if e['seq'] > since or (e['created_at'] and datetime.fromisoformat(e['created_at']) >= cutoff)),
+                key=lambda e: e['seq'],
+            )
+            return missed[:limit], len(missed) <= limit
+
+    rows = list(
+        Notification.objects.filter(Q(id__gt=since) | Q(created_at__gte=cutoff), user_id=user_id)
+        .order_by('id')[:limit + 1]
+    )
+    return [serialize_notification(n) for n in rows[:limit]], len(rows) <= limit
+
+
+def get_unread_count(user_id):
+    redis = get_redis_connection()
+    if redis is not None:
+        value = redis.get(_counter_key(user_id))
+        if value is not None:
+            return int(value)
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    if redis is not None:
+        redis.set(_counter_key(user_id), count, ex=COUNTER_TTL, nx=True)
+    return count
+
+
+def get_cached_unread_counts(user_ids):
+    """
+    Returns {user_id: count} for the counters currently in Redis (one MGET).
+    Users without a counter are left out.
+    """
+    redis = get_redis_connection()
+    if redis is None or not user_ids:
+        return {}
+    values = redis.mget([_counter_key(uid) for uid in user_ids])
+    return {uid: int(value) for uid, value in zip(user_ids, values) if value is not None}
+
+
+def adjust_unread_counts(deltas):
+    """
+    Applies {user_id: delta} to existing counters in one pipeline.
+    """
+    redis = get_redis_connection()
+    if redis is None or not deltas:
+        return
+    script = redis.register_script(_ADJUST_SCRIPT)
+    pipe = redis.pipeline(transaction=False)
+    for user_id, delta in deltas.items():
+        if delta:
+            script(keys=[_counter_key(user_id)], args=[delta], client=pipe)
+    pipe.execute()
+
+
+def reset_unread_count(user_id, value=None):
+    """
+    Sets the counter (0 after mark-all-read) or drops it so the next read
+    recounts from the database.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return
+    if value is None:
+        redis.delete(_counter_key(user_id))
+    else:
+        redis.set(_counter_key(user_id), value, ex=COUNTER_TTL)
+
+
+def push_unread_count(user_id, count=None):
+    """
+    Sends the current count to the user's open NotificationConsumer sockets.
+    """
+    if count is None:
+        count = get_unread_count(user_id)
+    async_to_sync(get_channel_layer().group_send)(
+        f"user_{user_id}",
+        {'type': 'unread_count', 'count': count},
+    )
+
+
+def send_notification_digests(period=timedelta(days=1)):
+    """
+    Emails each digest user their unread notifications from the last
+    `period`, one message per user. Returns the number of emails sent.
+    """
+    pending = (
+        Notification.objects
+        .filter(user__notification_digest=True, is_read=False, created_at__gte=timezone.now() - period)
+        .exclude(user__email='')
+        .select_related('user')
+        .order_by('user_id', '-created_at')
+    )
+    messages = []
+    for _, rows in groupby(pending.iterator(), key=lambda n: n.user_id):
+        rows = list(rows)
+        user = rows[0].user
+        lines = [
+            f"- {n.title}: {n.message}" + (f" {settings.SITE_URL}{n.link}" if n.link else '')
+            for n in rows[:DIGEST_MAX_ITEMS]
+        ]
+        if len(rows) > DIGEST_MAX_ITEMS:
+            lines.append(f"...and {len(rows) - DIGEST_MAX_ITEMS} more on {settings.SITE_URL}")
+        body = f"Hello {user.username},\n\nHere is what you missed today:\n\n" + "\n".join(lines) + "\n\nEnjoy!\nThe AniScrap Team"
+        subject = f"Your AniScrap digest: {len(rows)} new notification{'s' if len(rows) != 1 else ''}"
+        messages.append((subject, body, settings.DEFAULT_FROM_EMAIL, [user.email]))
+
+    if messages:
+        send_mass_mail(messages, fail_silently=False)
+    return len(messages)
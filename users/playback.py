@@ -0,0 +1,158 @@
+"""
+Resume positions ("continue watching").
+
+The player reports its position every few seconds. Positions live in one
+Redis hash per user (episode id -> JSON {position, length, ts}) and changed
+entries are written to PlaybackPosition in batches by flush_positions_task.
+Both the hashes and the dirty set are on the durable Redis connection, not
+the cache, so nothing that clears the cache can lose an unflushed position.
+Without Redis (SQLite/dev mode) positions are written straight to the table.
+"""
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from content.models import Episode
+from core.redis_client import get_redis_connection
+from .models import PlaybackPosition, User
+
+DIRTY_KEY = 'playback:dirty'
+# Past this share of the episode the position counts as finished
+COMPLETION_RATIO = 0.9
+# Hashes are trimmed to the most recent entries on flush; older ones stay in the DB
+MAX_POSITIONS_PER_USER = 200
+POSITIONS_TTL = 60 * 60 * 24 * 30
+
+
+def _positions_key(user_id):
+    return f'playback:{user_id}'
+
+
+def is_completed(position, length):
+    return bool(length) and position >= length * COMPLETION_RATIO
+
+
+def save_position(user_id, episode_id, position, length=None):
+    redis = get_redis_connection()
+    if redis is None:
+        PlaybackPosition.objects.update_or_create(
+            user_id=user_id, episode_id=episode_id,
+            defaults={'position': position, 'length': length, 'completed': is_completed(position, length), 'updated_at': timezone.now()},
+        )
+        return
+    key = _positions_key(user_id)
+    pipe = redis.pipeline(transaction=False)
+    pipe.hset(key, episode_id, json.dumps({'position': position, 'length': length, 'ts': time.time()}))
+    pipe.expire(key, POSITIONS_TTL)
+    pipe.sadd(DIRTY_KEY, f'{user_id}:{episode_id}')
+    pipe.execute()
+
+
+def _from_entry(user_id, episode_id, entry):
+    return PlaybackPosition(
+        user_id=user_id,
+        episode_id=episode_id,
+        position=entry['position'],
+        length=entry['length'],
+        completed=is_completed(entry['position'], entry['length']),
+        updated_at=datetime.fromtimestamp(entry['ts'], tz=dt_timezone.utc),
+    )
+
+
+def get_position(user_id, episode_id):
+    """
+    Returns the PlaybackPosition (possibly unsaved) for an episode, or None.
+    """
+    redis = get_redis_connection()
+    if redis is not None:
+        raw = redis.hget(_positions_key(user_id), episode_id)
+        if raw is not None:
+            return _from_entry(user_id, episode_id, json.loads(raw))
+    return PlaybackPosition.objects.filter(user_id=user_id, episode_id=episode_id).first()
+
+
+def get_continue_watching(user_id, limit=20):
+    """
+    The user's most recently updated in-progress episodes, newest first, with
+    `episode.season.anime` loaded: one HGETALL, one PlaybackPosition query and
+    one Episode query. The hash only holds recent (and possibly unflushed)
+    positions, so it is merged with the table; for an episode in both, the
+    hash wins.
+    """
+    redis = get_redis_connection()
+    raw = redis.hgetall(_positions_key(user_id)) if redis is not None else None
+    stored = PlaybackPosition.objects.filter(user_id=user_id, completed=False).select_related('episode__season__anime')
+    if not raw:
+        return list(stored.order_by('-updated_at')[:limit])
+
+    cached = [_from_entry(user_id, int(episode_id), json.loads(entry)) for episode_id, entry in raw.items()]
+    stored = list(stored.exclude(episode_id__in=[p.episode_id for p in cached]).order_by('-updated_at')[:limit])
+    cached = sorted((p for p in cached if not p.completed), key=lambda p: p.updated_at, reverse=True)[:limit]
+    episodes = Episode.objects.select_related('season__anime').in_bulk([p.episode_id for p in cached])
+    result = list(stored)
+    for p in cached:
+        # Deleted episodes are skipped rather than failing the whole list
+        if p.episode_id in episodes:
+            p.episode = episodes[p.episode_id]
+            result.append(p)
+    return sorted(result, key=lambda p: p.updated_at, reverse=True)[:limit]
+
+
+def flush_positions(batch_size=None):
+    """
+    Upserts changed positions into PlaybackPosition. Returns rows written.
+    A position re-reported during the flush is marked dirty again and is
+    picked up by the next run; if the write fails, the popped marks are put
+    back.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return 0
+    batch_size = batch_size or getattr(settings, 'PLAYBACK_FLUSH_BATCH_SIZE', 5000)
+    members = redis.spop(DIRTY_KEY, batch_size)
+    if not members:
+        return 0
+
+    keys = []
+    for member in members:
+        user_id, episode_id = (int(part) for part in member.decode().split(':'))
+        keys.append((user_id, episode_id))
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for user_id, episode_id in keys:
+            pipe.hget(_positions_key(user_id), episode_id)
+        entries = pipe.execute()
+
+        rows = [
+            _from_entry(user_id, episode_id, json.loads(entry))
+            for (user_id, episode_id), entry in zip(keys, entries)
+            if entry is not None
+        ]
+        # Skip positions whose episode or user was deleted since they were reported
+        episode_ids = set(Episode.objects.filter(id__in={r.episode_id for r in rows}).values_list('id', flat=True))
+        user_ids = set(User.objects.filter(id__in={r.user_id for r in rows}).values_list('id', flat=True))
+        rows = [r for r in rows if r.episode_id in episode_ids and r.user_id in user_ids]
+        PlaybackPosition.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user', 'episode'],
+            update_fields=['position', 'length', 'completed', 'updated_at'],
+        )
+    except Exception:
+        # Marked dirty again for the next run
+        redis.sadd(DIRTY_KEY, *members)
+        raise
+
+    for user_id in {user_id for user_id, _ in keys}:
+        _trim(redis, user_id)
+    return len(rows)
+
+
+def _trim(redis, user_id):
+    key = _positions_key(user_id)
+    if redis.hlen(key) <= MAX_POSITIONS_PER_USER:
+        return
+    entries = sorted(redis.hgetall(key).items(), key=lambda item: json.loads(item[1])['ts'])
+    redis.hdel(key, *[episode_id for episode_id, _ in entries[:-MAX_POSITIONS_PER_USER]])
@@ -0,0 +1,172 @@
+"""
+WatchLog rollups and retention.
+
+Raw WatchLog rows are folded into daily rollups (per user+episode, per
+episode, per anime) past a watermark, so readers never need the full raw
+history. Once rolled up, rows older than WATCH_LOG_RETENTION_DAYS can be
+archived and deleted, keeping WatchLog bounded.
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from content.models import Episode
+from core.retention import delete_in_batches
+from .models import WatchLog, UserWatchDay, EpisodeWatchDay, AnimeWatchDay, Watermark
+
+ROLLUP_WATERMARK = 'watchlog_rollup'
+# Advanced by billing.distribution; rows it hasn't attributed yet are kept
+REVENUE_WATERMARK = 'revenue_distribution'
+# Time-window badges (24h, 30-day consistency) still read raw rows
+MIN_RETENTION_DAYS = 31
+
+
+def _merge_rollup(model, keys, rows):
+    """
+    Adds grouped (watch_count, total_duration) rows onto existing rollup rows,
+    creating the missing ones. Callers hold the watermark lock.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    lookup = {keys[0] + '__in': {row[keys[0]] for row in rows}, 'day__in': {row['day'] for row in rows}}
+    existing = {
+        tuple(getattr(obj, key) for key in keys): obj
+        for obj in model.objects.filter(**lookup)
+    }
+    to_update, to_create = [], []
+    for row in rows:
+        obj = existing.get(tuple(row[key] for key in keys))
+        if obj is None:
+            to_create.append(model(**{key: row[key] for key in keys}, watch_count=row['watch_count'], total_duration=row['total_duration']))
+        else:
+            obj.watch_count += row['watch_count']
+            obj.total_duration += row['total_duration']
+            to_update.append(obj)
+    model.objects.bulk_update(to_update, ['watch_count', 'total_duration'], batch_size=1000)
+    model.objects.bulk_create(to_create, batch_size=1000)
+
+
+def settled_position(name, model=WatchLog):
+    """
+    Highest `model` id the job holding watermark `name` may read up to.
+    Ids are taken at insert but rows only show up at commit, so a lower id
+    can appear after a higher one has been read past. Each call notes the
+    newest id; once that note is WATERMARK_LAG_SECONDS old, every row up to
+    it has committed and it becomes the settled position. Callers hold the
+    job's watermark lock.
+    """
+    last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+    lag = getattr(settings, 'WATERMARK_LAG_SECONDS', 300)
+    if not lag:
+        return last_id
+    seen, created = Watermark.objects.select_for_update().get_or_create(name=f'{name}:seen', defaults={'position': last_id})
+    settled, _ = Watermark.objects.select_for_update().get_or_create(name=f'{name}:settled')
+    if not created and seen.updated_at <= timezone.now() - timedelta(seconds=lag):
+        settled.position = seen.position
+        settled.save(update_fields=['position', 'updated_at'])
+        seen.position = last_id
+        seen.save(update_fields=['position', 'updated_at'])
+    return settled.position
+
+
+def rollup_watch_logs(batch_size=None):
+    """
+    Rolls up the next batch of WatchLog rows past the watermark.
+    Returns the number of raw rows processed (0 when caught up).
+
+    Keyed on WatchLog id rather than watched_at, so buffered events that
+    arrive late with an older timestamp are still picked up; ids newer than
+    settled_position() wait for a later run.
+    """
+    batch_size = batch_size or getattr(settings, 'WATCH_ROLLUP_BATCH_SIZE', 10000)
+    with transaction.atomic():
+        watermark, _ = Watermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+        settled = settled_position(ROLLUP_WATERMARK)
+        ids = list(
+            WatchLog.objects.filter(id__gt=watermark.position, id__lte=settled)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        window = WatchLog.objects.filter(id__gt=watermark.position, id__lte=ids[-1]).annotate(day=TruncDate('watched_at'))
+        totals = {'watch_count': Count('id'), 'total_duration': Sum('duration')}
+        _merge_rollup(UserWatchDay, ['user_id', 'episode_id', 'day'], window.values('user_id', 'episode_id', 'day').annotate(**totals).order_by())
+        _merge_rollup(EpisodeWatchDay, ['episode_id', 'day'], window.values('episode_id', 'day').annotate(**totals).order_by())
+        _merge_rollup(AnimeWatchDay, ['anime_id', 'day'], window.annotate(anime_id=F('episode__season__anime_id')).values('anime_id', 'day').annotate(**totals).order_by())
+
+        watermark.position = ids[-1]
+        watermark.save(update_fields=['position', 'updated_at'])
+    return len(ids)
+
+
+def rollup_position():
+    return Watermark.objects.filter(name=ROLLUP_WATERMARK).values_list('position', flat=True).first() or 0
+
+
+def prunable_position():
+    """
+    Highest WatchLog id every consumer is done with: the rollup and, once
+    revenue has been distributed at least once, the distribution.
+    """
+    positions = dict(Watermark.objects.filter(name__in=[ROLLUP_WATERMARK, REVENUE_WATERMARK]).values_list('name', 'position'))
+    if ROLLUP_WATERMARK not in positions:
+        return 0
+    return min(positions.values())
+
+
+def prune_watch_logs(retention_days=None, batch_size=None, archive_dir=None):
+    """
+    Deletes rolled-up WatchLog rows older than the retention window, in
+    batches, optionally appending them to a gzipped JSONL archive first.
+    Rows past the rollup (or revenue distribution) watermark are never
+    deleted. Returns rows deleted.
+    """
+    retention_days = retention_days or getattr(settings, 'WATCH_LOG_RETENTION_DAYS', None)
+    if not retention_days:
+        return 0
+    retention_days = max(retention_days, MIN_RETENTION_DAYS)
+    batch_size = batch_size or getattr(settings, 'WATCH_ROLLUP_BATCH_SIZE', 10000)
+    archive_dir = archive_dir or getattr(settings, 'WATCH_LOG_ARCHIVE_DIR', None)
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = WatchLog.objects.filter(watched_at__lt=cutoff, id__lte=prunable_position())
+    return delete_in_batches(
+        expired, batch_size, archive_dir=archive_dir, archive_prefix='watchlog',
+        fields=['id', 'user_id', 'episode_id', 'duration', 'watched_at'],
+    )
+
+
+def watched_episodes(user):
+    """
+    Episodes the user has watched, from the rollups plus raw rows not yet
+    rolled up (or not yet pruned; the overlap is harmless for a set).
+    """
+    return Episode.objects.filter(
+        Q(id__in=UserWatchDay.objects.filter(user=user).values('episode_id'))
+        | Q(id__in=WatchLog.objects.filter(user=user).values('episode_id'))
+    )
+
+
+def latest_watch(user):
+    """
+    The user's most recent WatchLog, or the most recent rollup row once the
+    raw history has been pruned. Either way `.episode.season.anime` is loaded.
+    """
+    last_log = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
+    if last_log is None:
+        last_log = UserWatchDay.objects.filter(user=user).select_related('episode__season__anime').order_by('-day', '-id').first()
+    return last_log
+
+
+def watched_days_since(user, start_date):
+    """
+    Dates (local) on which the user watched something since start_date.
+    """
+    start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    days = set(WatchLog.objects.filter(user=user, watched_at__gte=start).values_list('watched_at__date', flat=True))
+    days.update(UserWatchDay.objects.filter(user=user, day__gte=start_date).values_list('day', flat=True))
+    return days
@@ -1,6 +1,6 @@
 import bleach
 from rest_framework import serializers
-from .models import Notification, Badge, UserBadge, WatchLog, User
+from .models import Notification, Badge, UserBadge, WatchLog, User, PlaybackPosition
 
 class WatchLogSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,6 +8,30 @@ class WatchLogSerializer(serializers.ModelSerializer):
         fields = ['episode', 'duration', 'watched_at']
         read_only_fields = ['watched_at']
 
+class PlaybackPositionSerializer(serializers.ModelSerializer):
+    position = serializers.IntegerField(min_value=0)
+    length = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+    class Meta:
+        model = PlaybackPosition
+        fields = ['episode', 'position', 'length', 'completed', 'updated_at']
+        read_only_fields = ['completed', 'updated_at']
+
+class ContinueWatchingSerializer(serializers.ModelSerializer):
+    episode_number = serializers.IntegerField(source='episode.number', read_only=True)
+    episode_title = serializers.CharField(source='episode.title', read_only=True)
+    season_number = serializers.IntegerField(source='episode.season.number', read_only=True)
+    anime_id = serializers.IntegerField(source='episode.season.anime_id', read_only=True)
+    anime_title = serializers.CharField(source='episode.season.anime.title', read_only=True)
+    thumbnail = serializers.URLField(source='episode.thumbnail', read_only=True)
+
+    class Meta:
+        model = PlaybackPosition
+        fields = [
+            'episode', 'episode_number', 'episode_title', 'season_number',
+            'anime_id', 'anime_title', 'thumbnail', 'position', 'length', 'updated_at'
+        ]
+
 class BadgeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Badge
@@ -34,7 +58,7 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         from django.contrib.auth import get_user_model
         model = get_user_model()
-        fields = ['username', 'bio', 'is_public']
+        fields = ['username', 'bio', 'is_public', 'notification_digest']
 
     def validate_username(self, value):
         if not re.match(r'^[\w-]+$', value):
@@ -4,11 +4,15 @@ from datetime import timedelta, datetime
 from django.db.models import Count, Q
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from .models import Badge, UserBadge, WatchLog, Notification
+from .models import Badge, UserBadge, Notification, UserActivity
 from core.models import ChatMessage
 from content.models import Subscription, Review, VideoFile, Anime, Genre, Episode
+from content.page_cache import catalogue_generation
 from apps.watchparty.models import Room
 from .badge_system import GENERAL_BADGE_STRATEGIES, CHAT_BADGE_STRATEGIES
+from .rollups import watched_episodes, latest_watch, watched_days_since
+from .timeline import publish_badges
+from .notifications import track_new_notifications, get_cached_unread_counts
 
 def _send_badge_notifications(user, new_badges):
     """
@@ -26,6 +30,8 @@ def _send_badge_notifications(user, new_badges):
         ))
 
     Notification.objects.bulk_create(notifications)
+    track_new_notifications(notifications)
+    unread_count = get_cached_unread_counts([user.id]).get(user.id)
 
     channel_layer = get_channel_layer()
     group_name = f"user_{user.id}"
@@ -35,9 +41,11 @@ def _send_badge_notifications(user, new_badges):
             group_name,
             {
                 'type': 'notification_message',
+                'id': notif.id,
                 'title': notif.title,
                 'message': notif.message,
                 'link': notif.link or '',
+                'unread_count': unread_count,
             }
         )
 
@@ -48,7 +56,9 @@ def check_badges(user):
     Refactored to use Strategy Pattern.
     """
     cache_key = f'user_{user.id}_badges_checked'
-    if cache.get(cache_key):
+    # Checked recently, against the current catalogue (genres, types...)
+    generation = catalogue_generation()
+    if cache.get(cache_key) == generation:
         return
 
     # Bulk fetch badges and awarded status
@@ -63,15 +73,15 @@ def check_badges(user):
     last_24h = timezone.now() - timedelta(days=1)
     last_hour = timezone.now() - timedelta(hours=1)
     start_date_30 = today - timedelta(days=29)
-    start_datetime_30 = timezone.make_aware(datetime.combine(start_date_30, datetime.min.time()))
     strategy_cache['review_stats'] = Review.objects.filter(user=user).aggregate(total=Count('id'), perfect=Count('id', filter=Q(rating=10)))
     strategy_cache['subscription_count'] = Subscription.objects.filter(user=user).count()
     strategy_cache['video_count'] = VideoFile.objects.filter(uploader=user).count()
-    strategy_cache['episode_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode_id', flat=True).distinct())
-    strategy_cache['anime_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
-    strategy_cache['last_log'] = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
-    strategy_cache['watched_dates_30'] = set(WatchLog.objects.filter(user=user, watched_at__gte=start_datetime_30).values_list('watched_at__date', flat=True))
+    strategy_cache['episode_ids'] = list(watched_episodes(user).values_list('id', flat=True))
+    strategy_cache['anime_ids'] = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
+    strategy_cache['last_log'] = latest_watch(user)
+    strategy_cache['watched_dates_30'] = watched_days_since(user, start_date_30)
     strategy_cache['hosted_rooms'] = list(Room.objects.filter(host=user).values('max_participants'))
+    strategy_cache['activity'] = UserActivity.objects.filter(user=user).first()
     new_badges = []
 
     for strategy in GENERAL_BADGE_STRATEGIES:
@@ -81,8 +91,9 @@ def check_badges(user):
     if new_badges:
         UserBadge.objects.bulk_create(new_badges, ignore_conflicts=True)
         _send_badge_notifications(user, new_badges)
+        publish_badges(user.id, [b.badge_id for b in new_badges])
 
-    cache.set(cache_key, True, 30 * 60)
+    cache.set(cache_key, generation, 30 * 60)
 
 def check_chat_badges(user):
     """
@@ -91,7 +102,9 @@ def check_chat_badges(user):
     Refactored to use Strategy Pattern.
     """
     cache_key = f'user_{user.id}_chat_badges_checked'
-    if cache.get(cache_key):
+    # Checked recently, against the current catalogue (genres, types...)
+    generation = catalogue_generation()
+    if cache.get(cache_key) == generation:
         return
 
     all_badges = cache.get('all_badges_dict')
@@ -105,14 +118,13 @@ def check_chat_badges(user):
     last_24h = timezone.now() - timedelta(days=1)
     last_hour = timezone.now() - timedelta(hours=1)
     start_date_30 = today - timedelta(days=29)
-    start_datetime_30 = timezone.make_aware(datetime.combine(start_date_30, datetime.min.time()))
     strategy_cache['review_stats'] = Review.objects.filter(user=user).aggregate(total=Count('id'), perfect=Count('id', filter=Q(rating=10)))
     strategy_cache['subscription_count'] = Subscription.objects.filter(user=user).count()
     strategy_cache['video_count'] = VideoFile.objects.filter(uploader=user).count()
-    strategy_cache['episode_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode_id', flat=True).distinct())
-    strategy_cache['anime_ids'] = list(WatchLog.objects.filter(user=user).values_list('episode__season__anime_id', flat=True).distinct())
-    strategy_cache['last_log'] = WatchLog.objects.filter(user=user).select_related('episode__season__anime').order_by('-watched_at').first()
-    strategy_cache['watched_dates_30'] = set(WatchLog.objects.filter(user=user, watched_at__gte=start_datetime_30).values_list('watched_at__date', flat=True))
+    strategy_cache['episode_ids'] = list(watched_episodes(user).values_list('id', flat=True))
+    strategy_cache['anime_ids'] = list(watched_episodes(user).values_list('season__anime_id', flat=True).distinct())
+    strategy_cache['last_log'] = latest_watch(user)
+    strategy_cache['watched_dates_30'] = watched_days_since(user, start_date_30)
     strategy_cache['hosted_rooms'] = list(Room.objects.filter(host=user).values('max_participants'))
     new_badges = []
 
@@ -123,5 +135,6 @@ def check_chat_badges(user):
     if new_badges:
         UserBadge.objects.bulk_create(new_badges, ignore_conflicts=True)
         _send_badge_notifications(user, new_badges)
+        publish_badges(user.id, [b.badge_id for b in new_badges])
 
-    cache.set(cache_key, True, 30 * 60)
+    cache.set(cache_key, generation, 30 * 60)
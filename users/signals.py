@@ -1,9 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import WatchLog
+from .models import WatchLog, Follow, Notification
 from content.models import Subscription, Review, VideoFile
 from apps.watchparty.models import Room, Message
 from .tasks import calculate_badges_task, calculate_chat_badges_task
+from .activity import record_activity
+from .timeline import publish_watches, on_follow, on_unfollow
+from .notifications import adjust_unread_counts, track_new_notifications
 
 @receiver(post_save, sender=VideoFile)
 def check_badges_on_video_upload(sender, instance, created, **kwargs):
@@ -20,11 +23,31 @@ def check_badges_on_subscribe(sender, instance, created, **kwargs):
     if created:
         calculate_badges_task.delay(instance.user.id)
 
+@receiver(post_save, sender=WatchLog)
+def record_watch_activity(sender, instance, created, **kwargs):
+    # Registered before check_badges_on_watch so streak badges see today's bit
+    if created:
+        record_activity(instance.user_id, instance.watched_at)
+
 @receiver(post_save, sender=WatchLog)
 def check_badges_on_watch(sender, instance, created, **kwargs):
     if created:
         calculate_badges_task.delay(instance.user.id)
 
+@receiver(post_save, sender=WatchLog)
+def publish_watch_activity(sender, instance, created, **kwargs):
+    if created:
+        publish_watches([instance])
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline_on_follow(sender, instance, created, **kwargs):
+    if created:
+        on_follow(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline_on_unfollow(sender, instance, **kwargs):
+    on_unfollow(instance.follower_id, instance.following_id)
+
 @receiver(post_save, sender=Message)
 def check_badges_on_chat(sender, instance, created, **kwargs):
     if created and instance.sender:
@@ -34,3 +57,14 @@ def check_badges_on_chat(sender, instance, created, **kwargs):
 def check_badges_on_watch_party(sender, instance, created, **kwargs):
     if created:
         calculate_badges_task.delay(instance.host.id)
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    # bulk_create callers call track_new_notifications themselves
+    if created:
+        track_new_notifications([instance])
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_counts({instance.user_id: -1})
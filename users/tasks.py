@@ -2,6 +2,12 @@ from celery import shared_task
 from django.contrib.auth import get_user_model
 import logging
 from .services import check_badges, check_chat_badges
+from .ingest import flush_watch_events
+from .rollups import rollup_watch_logs, prune_watch_logs
+from .playback import flush_positions
+from .timeline import fanout_activity
+from .notifications import send_notification_digests
+from core.db_router import read_only
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -41,3 +47,69 @@ def reevaluate_all_badges_task(self):
     except Exception as e:
         logger.exception("Failed to reevaluate all badges.")
         self.retry(exc=e, countdown=60)
+
+@shared_task(bind=True, max_retries=3)
+def flush_watch_events_task(self):
+    try:
+        user_ids = flush_watch_events()
+        # One badge pass per user per flush, however many heartbeats they sent
+        for user_id in user_ids:
+            calculate_badges_task.delay(user_id)
+        return f"Flushed watch events for {len(user_ids)} users."
+    except Exception as e:
+        logger.exception("Failed to flush watch events.")
+        self.retry(exc=e, countdown=10)
+
+@shared_task(bind=True, max_retries=3)
+def rollup_watch_logs_task(self, max_batches=100):
+    try:
+        processed = 0
+        for _ in range(max_batches):
+            count = rollup_watch_logs()
+            processed += count
+            if not count:
+                break
+        return f"Rolled up {processed} watch logs."
+    except Exception as e:
+        logger.exception("Failed to roll up watch logs.")
+        self.retry(exc=e, countdown=60)
+
+@shared_task(bind=True, max_retries=3)
+def prune_watch_logs_task(self):
+    try:
+        # Roll up whatever is left first; only rolled-up rows are deleted
+        while rollup_watch_logs():
+            pass
+        deleted = prune_watch_logs()
+        return f"Pruned {deleted} watch logs."
+    except Exception as e:
+        logger.exception("Failed to prune watch logs.")
+        self.retry(exc=e, countdown=300)
+
+@shared_task(bind=True, max_retries=3)
+def flush_positions_task(self):
+    try:
+        written = flush_positions()
+        return f"Flushed {written} playback positions."
+    except Exception as e:
+        logger.exception("Failed to flush playback positions.")
+        self.retry(exc=e, countdown=30)
+
+@shared_task(bind=True, max_retries=3)
+def fanout_activity_task(self, actor_id, members):
+    try:
+        written = fanout_activity(actor_id, members)
+        return f"Fanned out {len(members)} activities to {written} timelines."
+    except Exception as e:
+        logger.exception(f"Timeline fan-out failed for user {actor_id}")
+        self.retry(exc=e, countdown=30)
+
+@shared_task(bind=True, max_retries=3)
+@read_only
+def send_notification_digest_task(self):
+    try:
+        sent = send_notification_digests()
+        return f"Sent {sent} notification digests."
+    except Exception as e:
+        logger.exception("Failed to send notification digests.")
+        self.retry(exc=e, countdown=600)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from users.models import User, UserBadge, UserActivity, WatchLog
+from users.activity import epoch_day, mark_day, iter_active_days, get_streaks, rebuild_activity
+from users.services import check_badges
+from content.models import Anime, Season, Episode
+
+class ActivityBitmapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='streaker', password='password')
+        self.anime = Anime.objects.create(title="Test Anime")
+        self.season = Season.objects.create(anime=self.anime, number=1)
+        self.episode = Episode.objects.create(season=self.season, number=1)
+
+    def test_consecutive_days_extend_streak(self):
+        activity = UserActivity(user=self.user)
+        for day in range(100, 110):
+            self.assertTrue(mark_day(activity, day))
+        self.assertFalse(mark_day(activity, 109))
+        self.assertEqual(activity.current_streak, 10)
+        self.assertEqual(activity.longest_streak, 10)
+        # 10 days fit in two bytes
+        self.assertEqual(len(activity.days_bitmap), 2)
+
+    def test_gap_resets_current_but_keeps_longest(self):
+        activity = UserActivity(user=self.user)
+        for day in [1, 2, 3, 4, 10, 11]:
+            mark_day(activity, day)
+        self.assertEqual(activity.current_streak, 2)
+        self.assertEqual(activity.longest_streak, 4)
+
+    def test_backfilled_day_merges_runs(self):
+        activity = UserActivity(user=self.user)
+        for day in [10, 11, 13, 14]:
+            mark_day(activity, day)
+        mark_day(activity, 12)
+        mark_day(activity, 5)
+        self.assertEqual(list(iter_active_days(activity)), [5, 10, 11, 12, 13, 14])
+        self.assertEqual(activity.first_day, 5)
+        self.assertEqual(activity.current_streak, 5)
+        self.assertEqual(activity.longest_streak, 5)
+
+    def test_watch_log_insert_records_today(self):
+        WatchLog.objects.create(user=self.user, episode=self.episode, duration=100)
+        activity = UserActivity.objects.get(user=self.user)
+        self.assertEqual(activity.last_active_day, epoch_day())
+        self.assertEqual(get_streaks(activity), {'current': 1, 'longest': 1})
+
+    def test_current_streak_expires_after_missed_day(self):
+        activity = UserActivity(user=self.user)
+        today = epoch_day()
+        for day in range(today - 5, today - 1):
+            mark_day(activity, day)
+        self.assertEqual(get_streaks(activity)['current'], 0)
+        self.assertEqual(get_streaks(activity)['longest'], 4)
+
+    def test_rebuild_from_history(self):
+        now = timezone.now()
+        for i in range(3):
+            log = WatchLog.objects.create(user=self.user, episode=self.episode, duration=100)
+            WatchLog.objects.filter(pk=log.pk).update(watched_at=now - timedelta(days=i))
+        activity = rebuild_activity(self.user.id)
+        self.assertEqual(get_streaks(activity), {'current': 3, 'longest': 3})
+
+    def test_hundred_day_streak_badge(self):
+        today = epoch_day()
+        activity, _ = UserActivity.objects.get_or_create(user=self.user)
+        for day in range(today - 99, today + 1):
+            mark_day(activity, day)
+        activity.save()
+
+        cache.delete(f'user_{self.user.id}_badges_checked')
+        check_badges(self.user)
+
+        awarded = set(UserBadge.objects.filter(user=self.user).values_list('badge__slug', flat=True))
+        self.assertIn('hundred-day-streak', awarded)
+        self.assertIn('daily-viewer', awarded)
+        self.assertIn('streak-master', awarded)
+        self.assertNotIn('year-long-streak', awarded)
+
+    def test_profile_includes_streak(self):
+        WatchLog.objects.create(user=self.user, episode=self.episode, duration=100)
+        self.client.force_login(self.user)
+        response = self.client.get('/api/v1/profile/', secure=True)
+        self.assertEqual(response.json()['streak'], {'current': 1, 'longest': 1})
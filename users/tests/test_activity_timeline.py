@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User, Follow, WatchLog, Badge, UserBadge
+from users.timeline import get_feed, publish_badges, _inbox_key, _outbox_key
+from content.models import Anime, Season, Episode
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class ActivityTimelineTests(TestCase):
+    def setUp(self):
+        # Keep automatic badge awards out of the timelines under test
+        Badge.objects.all().delete()
+        cache.clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('users.timeline.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.friend = User.objects.create_user(username='friend', password='password')
+        self.star = User.objects.create_user(username='star', password='password')
+        Follow.objects.create(follower=self.reader, following=self.friend)
+        Follow.objects.create(follower=self.reader, following=self.star)
+        anime = Anime.objects.create(title="Timeline Anime")
+        season = Season.objects.create(anime=anime, number=1)
+        self.episodes = [Episode.objects.create(season=season, number=i + 1) for i in range(5)]
+
+    def test_watches_are_fanned_out_and_paginated(self):
+        for episode in self.episodes:
+            WatchLog.objects.create(user=self.friend, episode=episode, duration=100)
+        self.assertEqual(self.redis.zcard(_inbox_key(self.reader.id)), 5)
+
+        first, cursor = get_feed(self.reader, limit=3)
+        self.assertEqual([a['details']['episode_number'] for a in first], [5, 4, 3])
+        second, cursor = get_feed(self.reader, cursor=cursor, limit=3)
+        self.assertEqual([a['details']['episode_number'] for a in second], [2, 1])
+        self.assertIsNone(cursor)
+
+    def test_badges_are_fanned_out(self):
+        badge = Badge.objects.create(slug='timeline-badge', name='Timeline Badge', description='Test')
+        UserBadge.objects.bulk_create([UserBadge(user=self.friend, badge=badge)], ignore_conflicts=True)
+        publish_badges(self.friend.id, [badge.id])
+
+        activities, _ = get_feed(self.reader)
+        self.assertEqual(activities[0]['activity_type'], 'badge_earned')
+        self.assertEqual(activities[0]['details']['badge_name'], 'Timeline Badge')
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=0)
+    def test_celebrities_are_merged_on_read(self):
+        WatchLog.objects.create(user=self.star, episode=self.episodes[0], duration=100)
+        self.assertFalse(self.redis.exists(_inbox_key(self.reader.id)))
+        self.assertEqual(self.redis.zcard(_outbox_key(self.star.id)), 1)
+
+        activities, _ = get_feed(self.reader)
+        self.assertEqual([a['user'] for a in activities], [self.star])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        other = User.objects.create_user(username='other', password='password')
+        WatchLog.objects.create(user=other, episode=self.episodes[0], duration=100)
+        Follow.objects.create(follower=self.reader, following=other)
+        self.assertEqual(self.redis.zcard(_inbox_key(self.reader.id)), 1)
+
+        Follow.objects.filter(follower=self.reader, following=other).delete()
+        self.assertEqual(self.redis.zcard(_inbox_key(self.reader.id)), 0)
+
+    def test_endpoint_returns_cursor_page(self):
+        WatchLog.objects.create(user=self.friend, episode=self.episodes[0], duration=100)
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        response = client.get(reverse('activity-feed-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['user'], 'friend')
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_items_with_equal_timestamps_are_not_skipped(self):
+        # Ids from one to two digits, which Redis would order as strings
+        season = self.episodes[0].season
+        episodes = self.episodes + [Episode.objects.create(season=season, number=i + 1) for i in range(5, 12)]
+        logs = [WatchLog.objects.create(user=self.friend, episode=episode, duration=100) for episode in episodes]
+        WatchLog.objects.filter(pk__in=[log.pk for log in logs]).update(watched_at=logs[0].watched_at)
+        self.redis.delete(_inbox_key(self.reader.id))
+        self.redis.zadd(_inbox_key(self.reader.id), {f'w:{log.id}': logs[0].watched_at.timestamp() for log in logs})
+
+        for redis in (self.redis, None):
+            with patch('users.timeline.get_redis_connection', return_value=redis):
+                seen, cursor = [], None
+                while True:
+                    page, cursor = get_feed(self.reader, cursor=cursor, limit=5)
+                    seen += [a['details']['episode_number'] for a in page]
+                    if cursor is None:
+                        break
+            self.assertEqual(seen, list(range(12, 0, -1)))
+
+    def test_endpoint_rejects_bad_cursors(self):
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        for cursor in ['nan', 'inf', '-inf', 'abc', 'nan:w:1', '1.5:x', '1.5:w:abc']:
+            response = client.get(reverse('activity-feed-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
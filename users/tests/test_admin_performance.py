@@ -31,11 +31,9 @@ class WatchLogAdminPerformanceTest(TestCase):
         # We expect efficient querying.
         # 1. Session check
         # 2. User auth
-        # 3. Count
-        # 4. Count (sometimes duplicate or distinct check)
-        # 5. The Main Query with Joins
-        # Total around 5-6 queries.
+        # 3. Count (the separate full-result count is skipped by ApproximateCountAdminMixin)
+        # 4. The Main Query with Joins
         # Without optimization (or with bad optimization), it would be 25+ queries.
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             response = self.client.get(url)
             self.assertEqual(response.status_code, 200)
@@ -0,0 +1,52 @@
+import json
+import random
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from users.models import User, WatchLog
+from users.benchmarks import build_catalog, generate_history, run_badge_benchmark
+
+class BadgeBenchmarkTests(TestCase):
+    def test_report_structure_and_rollback(self):
+        report = run_badge_benchmark(sizes=[10, 300], anime_count=20, cohort=2)
+
+        self.assertEqual([s['watch_logs'] for s in report['scenarios']], [10, 300])
+        for scenario in report['scenarios']:
+            for step in ['check_badges', 'check_chat_badges', 'nightly']:
+                self.assertGreater(scenario[step]['queries'], 0)
+                self.assertIn('wall_ms', scenario[step])
+                self.assertIn('peak_memory_kb', scenario[step])
+            self.assertEqual(scenario['nightly']['users'], 3)
+
+        # Synthetic data is rolled back
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+        self.assertEqual(WatchLog.objects.count(), 0)
+
+    def test_history_is_spread_over_the_period(self):
+        rng = random.Random(1)
+        user = User.objects.create(username='history')
+        generate_history(rng, user, build_catalog(rng, anime_count=5), 200, days=365)
+        oldest = WatchLog.objects.filter(user=user).order_by('watched_at').first().watched_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=180))
+
+    def test_awarded_badges_notify_nobody(self):
+        with patch('users.services.get_channel_layer') as get_channel_layer, \
+                patch('users.timeline.get_redis_connection'), \
+                patch('users.tasks.fanout_activity_task') as fanout:
+            run_badge_benchmark(sizes=[300], anime_count=20, cohort=0)
+        get_channel_layer.assert_not_called()
+        fanout.delay.assert_not_called()
+
+    def test_badge_query_count_does_not_grow_with_history(self):
+        small, large = run_badge_benchmark(sizes=[10, 500], anime_count=20, cohort=0)['scenarios']
+        self.assertLessEqual(large['check_badges']['queries'], small['check_badges']['queries'] + 3)
+        self.assertLessEqual(large['check_chat_badges']['queries'], small['check_chat_badges']['queries'] + 3)
+
+    def test_command_outputs_json(self):
+        out = StringIO()
+        call_command('benchmark_badges', '--sizes', '10', '--anime', '5', '--cohort', '0', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['scenarios'][0]['watch_logs'], 10)
@@ -0,0 +1,111 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from channels.testing import WebsocketCommunicator
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from users.models import User, Notification
+from users.notifications import get_missed_notifications, track_new_notifications, STREAM_MAXLEN
+from aniscrap_core.asgi import application
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@override_settings(WATERMARK_LAG_SECONDS=0)
+class MissedNotificationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='offline', password='password')
+        self.notifications = [Notification.objects.create(user=self.user, title=f'n{i}', message='m') for i in range(5)]
+
+    def test_db_replay_returns_newer_in_order(self):
+        since = self.notifications[1].id
+        missed, complete = get_missed_notifications(self.user.id, since)
+        self.assertEqual([n['seq'] for n in missed], [n.id for n in self.notifications[2:]])
+        self.assertTrue(complete)
+
+        missed, complete = get_missed_notifications(self.user.id, 0, limit=2)
+        self.assertEqual(len(missed), 2)
+        self.assertFalse(complete)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_stream_replay_avoids_db_when_it_covers_since(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.notifications.get_redis_connection', return_value=redis):
+            with self.captureOnCommitCallbacks(execute=True):
+                extra = Notification.objects.bulk_create([Notification(user=self.user, title=f'b{i}', message='m') for i in range(3)])
+                track_new_notifications(extra)
+            self.assertEqual(redis.xlen(f'notif:stream:{self.user.id}'), 3)
+
+            with self.assertNumQueries(0):
+                missed, complete = get_missed_notifications(self.user.id, extra[0].id)
+            self.assertEqual([n['seq'] for n in missed], [n.id for n in extra[1:]])
+            self.assertTrue(complete)
+
+            # Older than anything in the stream: answered from the DB
+            missed, _ = get_missed_notifications(self.user.id, self.notifications[0].id)
+            self.assertEqual(len(missed), 7)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                more = Notification.objects.bulk_create([Notification(user=self.user, title='c', message='m') for _ in range(STREAM_MAXLEN)])
+                track_new_notifications(more)
+            self.assertEqual(redis.xlen(f'notif:stream:{self.user.id}'), STREAM_MAXLEN)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_stream_only_gets_committed_notifications(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.notifications.get_redis_connection', return_value=redis), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Notification.objects.create(user=self.user, title='rolled back', message='m')
+                raise RuntimeError
+            self.assertEqual(redis.xlen(f'notif:stream:{self.user.id}'), 0)
+
+    @override_settings(WATERMARK_LAG_SECONDS=300)
+    def test_recent_notifications_are_replayed_again(self):
+        # notifications[2] took its id first but committed after [4] was pushed
+        Notification.objects.exclude(id=self.notifications[2].id).update(created_at=timezone.now() - timedelta(hours=1))
+        missed, complete = get_missed_notifications(self.user.id, self.notifications[4].id)
+        self.assertEqual([n['seq'] for n in missed], [self.notifications[2].id])
+        self.assertTrue(complete)
+
+        if fakeredis is None:
+            return
+        redis = fakeredis.FakeRedis()
+        with patch('users.notifications.get_redis_connection', return_value=redis):
+            with self.captureOnCommitCallbacks(execute=True):
+                track_new_notifications(list(Notification.objects.filter(user=self.user).order_by('id')))
+            with self.assertNumQueries(0):
+                missed, _ = get_missed_notifications(self.user.id, self.notifications[4].id)
+        self.assertEqual([n['seq'] for n in missed], [self.notifications[2].id])
+
+
+@override_settings(WATERMARK_LAG_SECONDS=0)
+class ReplayOnConnectTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reconnecting', password='password')
+        self.seen = Notification.objects.create(user=self.user, title='seen', message='m')
+        self.missed = Notification.objects.create(user=self.user, title='missed', message='m')
+
+    async def test_since_cursor_replays_missed_notifications(self):
+        communicator = WebsocketCommunicator(application, f"ws/notifications/?since={self.seen.id}")
+        communicator.scope["user"] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'replay')
+        self.assertEqual([n['seq'] for n in response['notifications']], [self.missed.id])
+        self.assertTrue(response['complete'])
+        await communicator.disconnect()
+
+    async def test_no_cursor_no_replay(self):
+        communicator = WebsocketCommunicator(application, "ws/notifications/")
+        communicator.scope["user"] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
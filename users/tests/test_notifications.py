@@ -15,8 +15,9 @@ class NotificationSignalTests(TestCase):
         self.subscription = Subscription.objects.create(user=self.user, anime=self.anime)
 
     def test_notification_created_on_new_episode(self):
-        # Create a new episode
-        episode = Episode.objects.create(season=self.season, number=1, title='Pilot')
+        # Create a new episode; it is announced once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            episode = Episode.objects.create(season=self.season, number=1, title='Pilot')
 
         # Check if notification is created
         self.assertTrue(Notification.objects.filter(user=self.user).exists())
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User, PlaybackPosition
+from users.playback import save_position, get_continue_watching, flush_positions, DIRTY_KEY
+from content.models import Anime, Season, Episode
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class PlaybackPositionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='resumer', password='password')
+        self.anime = Anime.objects.create(title="Resume Anime")
+        season = Season.objects.create(anime=self.anime, number=1)
+        self.episodes = [Episode.objects.create(season=season, number=i + 1) for i in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_without_redis_positions_are_written_through(self):
+        url = reverse('watch-history-position')
+        response = self.client.post(url, {'episode': self.episodes[0].id, 'position': 300, 'length': 1440})
+        self.assertEqual(response.status_code, 202)
+        self.client.post(url, {'episode': self.episodes[0].id, 'position': 600, 'length': 1440})
+
+        response = self.client.get(url, {'episode': self.episodes[0].id})
+        self.assertEqual(response.data['position'], 600)
+        self.assertEqual(PlaybackPosition.objects.count(), 1)
+
+        # Finished episodes drop out of continue watching
+        self.client.post(url, {'episode': self.episodes[1].id, 'position': 1400, 'length': 1440})
+        response = self.client.get(reverse('continue-watching-list'))
+        self.assertEqual([item['episode'] for item in response.data], [self.episodes[0].id])
+        self.assertEqual(response.data[0]['anime_title'], "Resume Anime")
+
+    def test_unknown_position_returns_no_content(self):
+        response = self.client.get(reverse('watch-history-position'), {'episode': self.episodes[0].id})
+        self.assertEqual(response.status_code, 204)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_redis_positions_flush_in_batches(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.playback.get_redis_connection', return_value=redis):
+            for i, episode in enumerate(self.episodes[:3]):
+                save_position(self.user.id, episode.id, 100 + i, 1440)
+            save_position(self.user.id, self.episodes[3].id, 1430, 1440)
+            self.assertEqual(PlaybackPosition.objects.count(), 0)
+
+            # One HGETALL, one table query and one Episode query, newest first, completed excluded
+            with CaptureQueriesContext(connection) as ctx:
+                items = get_continue_watching(self.user.id, limit=2)
+            self.assertEqual(len(ctx.captured_queries), 2)
+            self.assertEqual([p.episode_id for p in items], [self.episodes[2].id, self.episodes[1].id])
+            self.assertEqual(items[0].episode.season.anime.title, "Resume Anime")
+
+            self.assertEqual(flush_positions(), 4)
+            self.assertEqual(redis.scard(DIRTY_KEY), 0)
+            save_position(self.user.id, self.episodes[0].id, 500, 1440)
+            self.assertEqual(flush_positions(), 1)
+
+        self.assertEqual(PlaybackPosition.objects.count(), 4)
+        self.assertEqual(PlaybackPosition.objects.get(episode=self.episodes[0]).position, 500)
+        self.assertTrue(PlaybackPosition.objects.get(episode=self.episodes[3]).completed)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_hash_is_merged_with_stored_positions(self):
+        for i, episode in enumerate(self.episodes[:3]):
+            PlaybackPosition.objects.create(user=self.user, episode=episode, position=100 + i, length=1440)
+        redis = fakeredis.FakeRedis()
+        with patch('users.playback.get_redis_connection', return_value=redis):
+            # The hash expired; one new report recreates it with a single entry
+            save_position(self.user.id, self.episodes[3].id, 50, 1440)
+            save_position(self.user.id, self.episodes[0].id, 1430, 1440)
+            items = get_continue_watching(self.user.id)
+        # The hash wins for episode 1 (finished since); the stored ones still show
+        self.assertEqual([p.episode_id for p in items], [self.episodes[3].id, self.episodes[2].id, self.episodes[1].id])
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_failed_flush_keeps_positions_dirty(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.playback.get_redis_connection', return_value=redis):
+            save_position(self.user.id, self.episodes[0].id, 300, 1440)
+            with patch.object(PlaybackPosition.objects, 'bulk_create', side_effect=RuntimeError('database down')):
+                with self.assertRaises(RuntimeError):
+                    flush_positions()
+            self.assertEqual(redis.scard(DIRTY_KEY), 1)
+            self.assertEqual(flush_positions(), 1)
+        self.assertEqual(PlaybackPosition.objects.get().position, 300)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_catalogue_edits_keep_unflushed_positions(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.playback.get_redis_connection', return_value=redis), \
+                patch.object(cache, 'clear', side_effect=AssertionError("cache.clear() would drop shared Redis state")):
+            save_position(self.user.id, self.episodes[0].id, 300, 1440)
+            self.episodes[0].save()
+            self.anime.save()
+            self.assertEqual(redis.scard(DIRTY_KEY), 1)
+            self.assertEqual(flush_positions(), 1)
+        self.assertEqual(PlaybackPosition.objects.get().position, 300)
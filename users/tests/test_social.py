@@ -90,7 +90,7 @@ def test_activity_feed(client, user1, user2, anime1):
     response = client.get(reverse('activity-feed-list'))
 
     assert response.status_code == 200
-    assert len(response.data) == 2
-    types = [x['activity_type'] for x in response.data]
+    assert len(response.data['results']) == 2
+    types = [x['activity_type'] for x in response.data['results']]
     assert 'badge_earned' in types
     assert 'episode_watched' in types
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User, Notification
+from users.notifications import get_unread_count, adjust_unread_counts
+from content.models import Anime, Season, Episode, Subscription
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('users.notifications.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        push = patch('users.views.push_unread_count')
+        self.push = push.start()
+        self.addCleanup(push.stop)
+
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _count(self):
+        return self.client.get('/api/v1/notifications/unread_count/', secure=True).data['count']
+
+    def test_counter_heals_from_db_then_serves_from_redis(self):
+        Notification.objects.bulk_create([Notification(user=self.user, title='t', message='m') for _ in range(3)])
+        self.assertEqual(self._count(), 3)
+        self.assertEqual(int(self.redis.get(f'notif:unread:{self.user.id}')), 3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.id), 3)
+
+    def test_missing_counter_is_not_incremented(self):
+        adjust_unread_counts({self.user.id: 5})
+        self.assertIsNone(self.redis.get(f'notif:unread:{self.user.id}'))
+
+    def test_fanout_and_reads_adjust_counter(self):
+        self.assertEqual(self._count(), 0)
+        anime = Anime.objects.create(title='Counted')
+        Subscription.objects.create(user=self.user, anime=anime)
+        season = Season.objects.create(anime=anime, number=1)
+        for number in (1, 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                Episode.objects.create(season=season, number=number)
+        single = Notification.objects.create(user=self.user, title='t', message='m')
+        self.assertEqual(self._count(), 3)
+
+        self.client.post(f'/api/v1/notifications/{single.id}/mark_read/', secure=True)
+        self.client.post(f'/api/v1/notifications/{single.id}/mark_read/', secure=True)
+        self.assertEqual(self._count(), 2)
+        self.push.assert_called_with(self.user.id)
+
+        self.client.post('/api/v1/notifications/mark_all_read/', secure=True)
+        self.assertEqual(self._count(), 0)
+
+        ids = list(Notification.objects.filter(user=self.user).values_list('id', flat=True)[:2])
+        self.client.post('/api/v1/notifications/bulk-update/', {'notification_ids': ids, 'is_read': False}, format='json', secure=True)
+        self.assertEqual(self._count(), 2)
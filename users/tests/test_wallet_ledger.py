@@ -0,0 +1,81 @@
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from users.models import User, Wallet, WalletTransaction
+from users.wallet import Entry, post_transactions, reconcile_wallets
+
+
+class WalletLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='earner', password='password')
+
+    def test_posting_is_idempotent(self):
+        entry = Entry(self.user.id, Decimal('12.50'), 'revenue', 'revenue:1:earner')
+        self.assertEqual(len(post_transactions([entry])), 1)
+        self.assertEqual(post_transactions([entry]), [])
+
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('12.50'))
+
+    def test_ledger_is_append_only(self):
+        [tx] = post_transactions([Entry(self.user.id, Decimal('1.00'), 'adjustment', 'adj:1')])
+        tx.amount = Decimal('100.00')
+        with self.assertRaises(ValueError):
+            tx.save()
+        with self.assertRaises(ValueError):
+            tx.delete()
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        post_transactions([
+            Entry(self.user.id, Decimal('10.00'), 'revenue', 'revenue:1'),
+            Entry(self.user.id, Decimal('-4.00'), 'payout', 'payout:1'),
+        ])
+        self.assertEqual(reconcile_wallets(), [])
+
+        Wallet.objects.filter(user=self.user).update(balance=Decimal('99.00'))
+        out = StringIO()
+        call_command('reconcile_wallets', stdout=out)
+        self.assertIn('balance 99.00 != ledger 6.00', out.getvalue())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('99.00'))
+
+        call_command('reconcile_wallets', '--fix', stdout=StringIO())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('6.00'))
+
+
+class ConcurrentPostingTests(TransactionTestCase):
+    def test_parallel_runs_lose_no_updates(self):
+        user = User.objects.create_user(username='contended', password='password')
+        Wallet.objects.create(user=user)
+        runs, per_run = 6, 5
+        errors = []
+
+        def run(n):
+            entries = [Entry(user.id, Decimal('1.25'), 'revenue', f'revenue:{n}:{i}') for i in range(per_run)]
+            # Every run also retries the same shared entry
+            entries.append(Entry(user.id, Decimal('100.00'), 'adjustment', 'shared'))
+            try:
+                for _ in range(50):
+                    try:
+                        post_transactions(entries)
+                        return
+                    except OperationalError:
+                        # SQLite allows one writer at a time; wait our turn
+                        time.sleep(0.01)
+                errors.append(f'run {n} never got the write lock')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(runs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(WalletTransaction.objects.count(), runs * per_run + 1)
+        self.assertEqual(Wallet.objects.get(user=user).balance, Decimal('1.25') * runs * per_run + Decimal('100.00'))
+        self.assertEqual(reconcile_wallets(), [])
@@ -0,0 +1,113 @@
+import json
+import unittest
+from unittest.mock import patch
+from django.core.cache import cache
+from redis.exceptions import LockError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User, UserActivity, WatchLog
+from users.ingest import FLUSH_LOCK_KEY, WATCH_EVENTS_KEY, enqueue_watch_event, merge_watch_events, flush_watch_events
+from content.models import Anime, Season, Episode
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class WatchEventMergeTests(TestCase):
+    def test_consecutive_heartbeats_collapse(self):
+        events = [
+            {'user': 1, 'episode': 10, 'duration': 30, 'ts': 1.0},
+            {'user': 2, 'episode': 10, 'duration': 30, 'ts': 2.0},
+            {'user': 1, 'episode': 10, 'duration': 30, 'ts': 3.0},
+            {'user': 1, 'episode': 11, 'duration': 30, 'ts': 4.0},
+            {'user': 1, 'episode': 11, 'duration': 15, 'ts': 5.0},
+        ]
+        merged = merge_watch_events(events)
+        self.assertEqual(
+            [(e['user'], e['episode'], e['duration'], e['ts']) for e in merged],
+            [(1, 10, 60, 1.0), (2, 10, 30, 2.0), (1, 11, 45, 4.0)],
+        )
+
+
+class WatchEventIngestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='pinger', password='password')
+        anime = Anime.objects.create(title="Ingest Anime")
+        season = Season.objects.create(anime=anime, number=1)
+        self.episode = Episode.objects.create(season=season, number=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_without_redis_writes_through(self):
+        response = self.client.post(reverse('watch-history-heartbeat'), {'episode': self.episode.id, 'duration': 30})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(WatchLog.objects.filter(user=self.user).count(), 1)
+        # post_save signals still ran
+        self.assertTrue(UserActivity.objects.filter(user=self.user).exists())
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_flush_batches_buffered_events(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.ingest.get_redis_connection', return_value=redis):
+            for _ in range(5):
+                enqueue_watch_event(self.user.id, self.episode.id, 30)
+            # Events for a deleted episode are dropped instead of failing the batch
+            redis.rpush(WATCH_EVENTS_KEY, json.dumps({'user': self.user.id, 'episode': 999999, 'duration': 30, 'ts': 0}))
+            self.assertEqual(WatchLog.objects.count(), 0)
+
+            self.assertEqual(flush_watch_events(), [self.user.id])
+
+        log = WatchLog.objects.get(user=self.user)
+        self.assertEqual(log.duration, 150)
+        self.assertEqual(redis.llen(WATCH_EVENTS_KEY), 0)
+        self.assertTrue(UserActivity.objects.filter(user=self.user).exists())
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_flush_task_checks_badges_once_per_user(self):
+        from users.tasks import flush_watch_events_task
+        redis = fakeredis.FakeRedis()
+        with patch('users.ingest.get_redis_connection', return_value=redis), \
+                patch('users.tasks.calculate_badges_task.delay') as delay:
+            for _ in range(3):
+                enqueue_watch_event(self.user.id, self.episode.id, 30)
+            flush_watch_events_task()
+        delay.assert_called_once_with(self.user.id)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_catalogue_edits_keep_buffered_events(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.ingest.get_redis_connection', return_value=redis), \
+                patch.object(cache, 'clear', side_effect=AssertionError("cache.clear() would drop shared Redis state")):
+            enqueue_watch_event(self.user.id, self.episode.id, 30)
+            self.episode.save()
+            self.episode.season.anime.save()
+            Episode.objects.create(season=self.episode.season, number=2)
+            self.assertEqual(flush_watch_events(), [self.user.id])
+        self.assertEqual(WatchLog.objects.get(user=self.user).duration, 30)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_flush_lock_belongs_to_its_holder(self):
+        redis = fakeredis.FakeRedis()
+        with patch('users.ingest.get_redis_connection', return_value=redis):
+            enqueue_watch_event(self.user.id, self.episode.id, 30)
+            other = redis.lock(FLUSH_LOCK_KEY, timeout=60)
+            self.assertTrue(other.acquire(blocking=False))
+            self.assertEqual(flush_watch_events(), [])
+            other.release()
+
+            # A flusher whose lock expired mid-run neither inserts nor releases the new holder's lock
+            def take_over(events):
+                redis.delete(FLUSH_LOCK_KEY)
+                self.assertTrue(redis.lock(FLUSH_LOCK_KEY, timeout=60).acquire(blocking=False))
+                return merge_watch_events(events)
+
+            with patch('users.ingest.merge_watch_events', side_effect=take_over):
+                with self.assertRaises(LockError):
+                    flush_watch_events()
+            self.assertFalse(WatchLog.objects.exists())
+            self.assertTrue(redis.exists(FLUSH_LOCK_KEY))
+            self.assertEqual(redis.llen(WATCH_EVENTS_KEY), 1)
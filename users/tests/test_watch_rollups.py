@@ -0,0 +1,124 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from users.models import User, Badge, UserBadge, WatchLog, UserWatchDay, EpisodeWatchDay, AnimeWatchDay, Wallet, Watermark
+from users.rollups import rollup_watch_logs, prune_watch_logs, rollup_position
+from users.services import check_badges
+from content.models import Anime, Season, Episode, VideoFile, FansubGroup
+from billing.models import ShopierPayment
+from billing.tasks import calculate_revenue
+
+@override_settings(WATERMARK_LAG_SECONDS=0)
+class WatchRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='roller', password='password')
+        self.anime = Anime.objects.create(title="Rollup Anime")
+        self.season = Season.objects.create(anime=self.anime, number=1)
+        self.episodes = [Episode.objects.create(season=self.season, number=i + 1) for i in range(3)]
+
+    def _log(self, episode, duration, days_ago=0):
+        return WatchLog.objects.create(
+            user=self.user, episode=episode, duration=duration,
+            watched_at=timezone.now() - timedelta(days=days_ago),
+        )
+
+    def test_rollup_is_incremental(self):
+        self._log(self.episodes[0], 100)
+        self._log(self.episodes[0], 50)
+        self._log(self.episodes[1], 30, days_ago=2)
+
+        self.assertEqual(rollup_watch_logs(), 3)
+        self.assertEqual(rollup_watch_logs(), 0)
+        row = UserWatchDay.objects.get(user=self.user, episode=self.episodes[0])
+        self.assertEqual((row.watch_count, row.total_duration), (2, 150))
+        self.assertEqual(EpisodeWatchDay.objects.count(), 2)
+
+        # Later rows for an existing day are added onto the same rollup row
+        last = self._log(self.episodes[0], 25)
+        self.assertEqual(rollup_watch_logs(), 1)
+        row.refresh_from_db()
+        self.assertEqual((row.watch_count, row.total_duration), (3, 175))
+        self.assertEqual(rollup_position(), last.id)
+        self.assertEqual(sum(AnimeWatchDay.objects.values_list('total_duration', flat=True)), 205)
+
+    @override_settings(WATERMARK_LAG_SECONDS=300)
+    def test_newest_ids_wait_until_settled(self):
+        early = self._log(self.episodes[0], 100)
+        # Too recent: a lower id may still be committing
+        self.assertEqual(rollup_watch_logs(), 0)
+        late = self._log(self.episodes[1], 50)
+
+        Watermark.objects.filter(name='watchlog_rollup:seen').update(updated_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(rollup_watch_logs(), 1)
+        self.assertEqual(rollup_position(), early.id)
+
+        Watermark.objects.filter(name='watchlog_rollup:seen').update(updated_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(rollup_watch_logs(), 1)
+        self.assertEqual(rollup_position(), late.id)
+
+    def test_batches_resume_from_watermark(self):
+        for episode in self.episodes:
+            self._log(episode, 10)
+        self.assertEqual(rollup_watch_logs(batch_size=2), 2)
+        self.assertEqual(rollup_watch_logs(batch_size=2), 1)
+        self.assertEqual(EpisodeWatchDay.objects.count(), 3)
+
+    def test_prune_only_deletes_rolled_up_rows_past_retention(self):
+        old = self._log(self.episodes[0], 100, days_ago=90)
+        rollup_watch_logs()
+        unrolled_old = self._log(self.episodes[1], 100, days_ago=90)
+        recent = self._log(self.episodes[2], 100)
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.assertEqual(prune_watch_logs(retention_days=60, archive_dir=archive_dir), 1)
+            [name] = os.listdir(archive_dir)
+            with gzip.open(os.path.join(archive_dir, name), 'rt') as fh:
+                self.assertEqual([json.loads(line)['id'] for line in fh], [old.id])
+
+        self.assertEqual(set(WatchLog.objects.values_list('id', flat=True)), {unrolled_old.id, recent.id})
+        # Retention is clamped so raw-window badges keep their data
+        self.assertEqual(prune_watch_logs(retention_days=1), 0)
+
+    def test_badges_survive_pruning(self):
+        Badge.objects.get_or_create(slug='pilot-connoisseur', defaults={'name': 'Pilot', 'description': 'Test'})
+        for i in range(5):
+            anime = Anime.objects.create(title=f"Pilot {i}")
+            season = Season.objects.create(anime=anime, number=1)
+            self._log(Episode.objects.create(season=season, number=1), 100, days_ago=90)
+        rollup_watch_logs()
+        prune_watch_logs(retention_days=60)
+        self.assertFalse(WatchLog.objects.filter(user=self.user).exists())
+
+        cache.delete(f'user_{self.user.id}_badges_checked')
+        check_badges(self.user)
+        self.assertTrue(UserBadge.objects.filter(user=self.user, badge__slug='pilot-connoisseur').exists())
+
+    def test_rolled_up_rows_are_pruned_only_after_revenue_distribution(self):
+        uploader = User.objects.create_user(username='encoder', password='password')
+        owner = User.objects.create_user(username='owner', password='password')
+        group = FansubGroup.objects.create(name='Rollup Subs', owner=owner)
+        VideoFile.objects.create(episode=self.episodes[0], uploader=uploader, quality='1080p', hls_path='/a', encryption_key='k', file_size_bytes=1)
+        VideoFile.objects.create(episode=self.episodes[1], fansub_group=group, quality='1080p', hls_path='/b', encryption_key='k', file_size_bytes=1)
+        self._log(self.episodes[0], 100, days_ago=90)
+        rollup_watch_logs()
+        # Revenue has been distributed before, but not over this row yet
+        calculate_revenue()
+        self.assertEqual(prune_watch_logs(retention_days=60), 0)
+
+        ShopierPayment.objects.create(user=self.user, amount=Decimal('100.00'), transaction_id='ORD-ROLL', status='success')
+        calculate_revenue()
+        self.assertEqual(Wallet.objects.get(user=uploader).balance, Decimal('35.00'))
+        self.assertEqual(prune_watch_logs(retention_days=60), 1)
+
+        self._log(self.episodes[1], 100)
+        ShopierPayment.objects.create(user=self.user, amount=Decimal('100.00'), transaction_id='ORD-ROLL-2', status='success')
+        calculate_revenue()
+        self.assertEqual(Wallet.objects.get(user=uploader).balance, Decimal('35.00'))
+        self.assertEqual(Wallet.objects.get(user=owner).balance, Decimal('20.00'))
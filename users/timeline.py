@@ -0,0 +1,276 @@
+"""
+Activity timelines (fan-out on write).
+
+Every badge award and watch is published as a member of a capped Redis
+sorted set (score = timestamp): the actor's outbox and, through
+fanout_activity_task, the inbox of each follower. Actors with more than
+TIMELINE_CELEBRITY_THRESHOLD followers only write their outbox; followers
+merge those outboxes in at read time (fan-out on read).
+
+Members are 'b:<UserBadge id>' or 'w:<WatchLog id>'. Without Redis, or for a
+user with no inbox yet, the feed is read from the database as before.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from core.redis_client import get_redis_connection
+from .models import Follow, UserBadge, WatchLog
+
+TIMELINE_MAX_LEN = 500
+CELEBRITIES_KEY = 'timeline:celebrities'
+
+
+def _inbox_key(user_id):
+    return f'timeline:in:{user_id}'
+
+
+def _outbox_key(user_id):
+    return f'timeline:out:{user_id}'
+
+
+def celebrity_threshold():
+    return getattr(settings, 'TIMELINE_CELEBRITY_THRESHOLD', 1000)
+
+
+def badge_member(user_badge):
+    return f'b:{user_badge.id}', user_badge.awarded_at.timestamp()
+
+
+def watch_member(watch_log):
+    return f'w:{watch_log.id}', watch_log.watched_at.timestamp()
+
+
+def publish_badges(user_id, badge_ids):
+    """
+    Queues fan-out for freshly awarded badges. bulk_create(ignore_conflicts=True)
+    leaves primary keys unset, so the rows are looked up by badge id.
+    """
+    if get_redis_connection() is None or not badge_ids:
+        return
+    from .tasks import fanout_activity_task  # Avoid circular import
+    members = [badge_member(b) for b in UserBadge.objects.filter(user_id=user_id, badge_id__in=badge_ids).only('id', 'awarded_at')]
+    fanout_activity_task.delay(user_id, members)
+
+
+def publish_watches(logs):
+    """
+    Queues fan-out for saved WatchLogs, one task per watcher.
+    """
+    if get_redis_connection() is None:
+        return
+    from .tasks import fanout_activity_task  # Avoid circular import
+    by_user = {}
+    for log in logs:
+        by_user.setdefault(log.user_id, []).append(watch_member(log))
+    for user_id, members in by_user.items():
+        fanout_activity_task.delay(user_id, members)
+
+
+def _add_capped(pipe, key, mapping):
+    pipe.zadd(key, mapping)
+    pipe.zremrangebyrank(key, 0, -TIMELINE_MAX_LEN - 1)
+
+
+def fanout_activity(actor_id, members):
+    """
+    Writes (member, score) pairs to the actor's outbox and their followers'
+    inboxes. Returns the number of inboxes written (0 for celebrities).
+    """
+    redis = get_redis_connection()
+    if redis is None or not members:
+        return 0
+    mapping = dict(members)
+    pipe = redis.pipeline(transaction=False)
+    _add_capped(pipe, _outbox_key(actor_id), mapping)
+
+    followers = Follow.objects.filter(following_id=actor_id)
+    if followers.count() > celebrity_threshold():
+        pipe.sadd(CELEBRITIES_KEY, actor_id)
+        pipe.execute()
+        return 0
+
+    pipe.srem(CELEBRITIES_KEY, actor_id)
+    written = 0
+    for follower_id in followers.values_list('follower_id', flat=True).iterator():
+        _add_capped(pipe, _inbox_key(follower_id), mapping)
+        written += 1
+        if written % 500 == 0:
+            pipe.execute()
+    pipe.execute()
+    return written
+
+
+def on_follow(follower_id, following_id):
+    """
+    Copies the followee's recent outbox into the new follower's inbox.
+    """
+    redis = get_redis_connection()
+    if redis is None or redis.sismember(CELEBRITIES_KEY, following_id):
+        return
+    recent = redis.zrevrange(_outbox_key(following_id), 0, TIMELINE_MAX_LEN - 1, withscores=True)
+    if recent:
+        pipe = redis.pipeline(transaction=False)
+        _add_capped(pipe, _inbox_key(follower_id), dict(recent))
+        pipe.execute()
+
+
+def on_unfollow(follower_id, following_id):
+    redis = get_redis_connection()
+    if redis is None:
+        return
+    members = redis.zrange(_outbox_key(following_id), 0, -1)
+    if members:
+        redis.zrem(_inbox_key(follower_id), *members)
+
+
+def _hydrate(members):
+    """
+    Turns timeline members into activity dicts, with one query per kind.
+    Members whose rows were deleted are skipped.
+    """
+    badge_ids = [int(m[2:]) for m in members if m.startswith('b:')]
+    watch_ids = [int(m[2:]) for m in members if m.startswith('w:')]
+    badges = UserBadge.objects.select_related('user', 'badge').in_bulk(badge_ids) if badge_ids else {}
+    watches = WatchLog.objects.select_related('user', 'episode__season__anime').in_bulk(watch_ids) if watch_ids else {}
+
+    activities = []
+    for member in members:
+        kind, pk = member[0], int(member[2:])
+        if kind == 'b' and pk in badges:
+            activities.append(_badge_activity(badges[pk]))
+        elif kind == 'w' and pk in watches:
+            activities.append(_watch_activity(watches[pk]))
+    return activities
+
+
+def _badge_activity(b):
+    return {
+        'activity_type': 'badge_earned',
+        'user': b.user,
+        'created_at': b.awarded_at,
+        'details': {
+            'badge_name': b.badge.name,
+            'badge_icon': b.badge.icon_url
+        }
+    }
+
+
+def _watch_activity(w):
+    return {
+        'activity_type': 'episode_watched',
+        'user': w.user,
+        'created_at': w.watched_at,
+        'details': {
+            'anime_title': w.episode.season.anime.title,
+            'episode_number': w.episode.number,
+        }
+    }
+
+
+def parse_cursor(cursor):
+    """
+    Splits a feed cursor ('<score>:<member>', see get_feed) into a finite
+    score and the member to continue after (None for a bare score).
+    Raises ValueError for anything else.
+    """
+    score, _, member = cursor.partition(':')
+    score = float(score)
+    if not math.isfinite(score) or (member and not (member[:2] in ('b:', 'w:') and member[2:].isdigit())):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return score, member or None
+
+
+def _order(item):
+    # Feeds run newest first; equal scores by kind, then id, descending
+    member, score = item
+    return score, member[0], int(member[2:])
+
+
+def _after(before, after_member, items):
+    """
+    The (member, score) items that come after the cursor.
+    """
+    if before is None:
+        return items
+    if after_member is None:
+        return [(member, score) for member, score in items if score < before]
+    cursor = _order((after_member, before))
+    return [item for item in items if _order(item) < cursor]
+
+
+def _feed_from_db(user, before, after_member, limit):
+    """
+    Fan-out on read straight from the tables, for Redis-less setups.
+    """
+    following_users = Follow.objects.filter(follower=user).values_list('following', flat=True)
+    badges = UserBadge.objects.filter(user__in=following_users).select_related('user', 'badge').order_by('-awarded_at', '-id')
+    watches = WatchLog.objects.filter(user__in=following_users).select_related('user', 'episode__season__anime').order_by('-watched_at', '-id')
+    rows = {}
+    if before is None:
+        pages = [badges[:limit], watches[:limit]]
+    else:
+        # Rows at the cursor's timestamp (give or take float rounding) are
+        # few; the page is cut among them in Python
+        low = datetime.fromtimestamp(before, tz=dt_timezone.utc) - timedelta(microseconds=1)
+        high = low + timedelta(microseconds=2)
+        pages = [
+            badges.filter(awarded_at__lt=low)[:limit], badges.filter(awarded_at__range=(low, high)),
+            watches.filter(watched_at__lt=low)[:limit], watches.filter(watched_at__range=(low, high)),
+        ]
+    for page in pages:
+        for row in page:
+            member, score = badge_member(row) if isinstance(row, UserBadge) else watch_member(row)
+            rows[member] = (score, row)
+
+    items = _after(before, after_member, [(member, score) for member, (score, _row) in rows.items()])
+    page = sorted(items, key=_order, reverse=True)[:limit]
+    activities = [
+        _badge_activity(rows[member][1]) if member.startswith('b:') else _watch_activity(rows[member][1])
+        for member, _score in page
+    ]
+    return activities, page
+
+
+def get_feed(user, cursor=None, limit=20):
+    """
+    Returns (activities, next_cursor). The cursor is '<score>:<member>' of
+    the last item returned, score being its timestamp; pass it back to get
+    the following page. Items sharing that timestamp are told apart by
+    member, so none are skipped at a page boundary.
+    """
+    before, after_member = parse_cursor(cursor) if cursor is not None else (None, None)
+
+    redis = get_redis_connection()
+    if redis is not None:
+        pipe = redis.pipeline(transaction=False)
+        pipe.exists(_inbox_key(user.id))
+        pipe.smembers(CELEBRITIES_KEY)
+        has_inbox, celebrity_ids = pipe.execute()
+        if celebrity_ids:
+            celebrity_ids = list(Follow.objects.filter(follower=user, following_id__in=[int(i) for i in celebrity_ids]).values_list('following_id', flat=True))
+
+    if redis is None or not (has_inbox or celebrity_ids):
+        activities, page = _feed_from_db(user, before, after_member, limit)
+    else:
+        keys = [_inbox_key(user.id)] + [_outbox_key(cid) for cid in celebrity_ids]
+        high = f'({before!r}' if before is not None else '+inf'
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrevrangebyscore(key, high, '-inf', start=0, num=limit, withscores=True)
+        pages = pipe.execute()
+        # Redis breaks ties by member, not as _order does: fetch every item
+        # sharing the cursor's score or a score a page was cut at
+        tied = {before} if before is not None else set()
+        tied.update(rows[-1][1] for rows in pages if len(rows) == limit)
+        for key in keys:
+            for score in tied:
+                pipe.zrevrangebyscore(key, repr(score), repr(score), withscores=True)
+        entries = {}
+        for rows in pages + pipe.execute():
+            entries.update((member.decode(), score) for member, score in rows)
+
+        page = sorted(_after(before, after_member, list(entries.items())), key=_order, reverse=True)[:limit]
+        activities = _hydrate([member for member, _ in page])
+
+    next_cursor = f'{page[-1][1]!r}:{page[-1][0]}' if len(page) == limit else None
+    return activities, next_cursor
@@ -1,13 +1,18 @@
 from rest_framework import generics, permissions, status, viewsets, mixins
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.throttling import ScopedRateThrottle, UserRateThrottle, AnonRateThrottle
 from rest_framework.decorators import action
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.shortcuts import get_object_or_404
-from .models import Notification, UserBadge, WatchLog, Badge, Follow, UserAnimeList, User
-from .serializers import NotificationSerializer, UserBadgeSerializer, WatchLogSerializer, UserProfileUpdateSerializer, FollowSerializer, UserAnimeListSerializer, ActivitySerializer
+from core.pagination import ApproximateCountPagination
+from .models import Notification, UserBadge, WatchLog, Badge, Follow, UserAnimeList, User, UserActivity
+from .activity import get_streaks
+from .ingest import enqueue_watch_event
+from .playback import save_position, get_position, get_continue_watching
+from .timeline import get_feed, parse_cursor
+from .notifications import get_unread_count, adjust_unread_counts, reset_unread_count, push_unread_count
+from .serializers import NotificationSerializer, UserBadgeSerializer, WatchLogSerializer, UserProfileUpdateSerializer, FollowSerializer, UserAnimeListSerializer, ActivitySerializer, PlaybackPositionSerializer, ContinueWatchingSerializer
 from django.db.models import Q
 
 class LoginThrottle(AnonRateThrottle):
@@ -23,7 +28,10 @@ class WatchLogCreateThrottle(UserRateThrottle):
             return True
         return super().allow_request(request, view)
 
-class StandardResultsSetPagination(PageNumberPagination):
+class WatchEventThrottle(UserRateThrottle):
+    scope = 'watchevent'
+
+class StandardResultsSetPagination(ApproximateCountPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -48,19 +56,23 @@ class NotificationViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, view
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({'count': count})
+        return Response({'count': get_unread_count(request.user.id)})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        reset_unread_count(request.user.id, 0)
+        push_unread_count(request.user.id, 0)
         return Response({'status': 'all marked as read'})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            notification.is_read = True
+            notification.save()
+            adjust_unread_counts({request.user.id: -1})
+            push_unread_count(request.user.id)
         return Response({'status': 'marked as read'})
 
     @action(detail=False, methods=['post'], url_path='bulk-update')
@@ -90,6 +102,9 @@ class NotificationViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, view
             user=request.user,
             id__in=notification_ids
         ).update(is_read=is_read)
+        # Mixed read/unread input: recount rather than guess the delta
+        reset_unread_count(request.user.id)
+        push_unread_count(request.user.id)
 
         return Response({
             "status": "success",
@@ -115,6 +130,48 @@ class WatchLogViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Ret
         serializer.save(user=self.request.user)
         # Note: Badge checks are handled automatically via post_save signal in users.signals
 
+    @action(detail=False, methods=['post'], throttle_classes=[WatchEventThrottle])
+    def heartbeat(self, request):
+        """
+        Player progress ping. Queued and written in batches by
+        flush_watch_events_task instead of one WatchLog insert per request.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        enqueue_watch_event(request.user.id, serializer.validated_data['episode'].id, serializer.validated_data['duration'])
+        return Response({'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get', 'post'], throttle_classes=[WatchEventThrottle])
+    def position(self, request):
+        """
+        GET ?episode=<id> returns the resume position; POST stores a new one.
+        """
+        if request.method == 'GET':
+            episode_id = request.query_params.get('episode')
+            if not episode_id or not episode_id.isdigit():
+                return Response({"error": "episode parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+            position = get_position(request.user.id, int(episode_id))
+            if position is None:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(PlaybackPositionSerializer(position).data)
+
+        serializer = PlaybackPositionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        save_position(request.user.id, data['episode'].id, data['position'], data.get('length'))
+        return Response({'status': 'saved'}, status=status.HTTP_202_ACCEPTED)
+
+class ContinueWatchingViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 50)
+        except ValueError:
+            limit = 20
+        positions = get_continue_watching(request.user.id, limit=max(limit, 1))
+        return Response(ContinueWatchingSerializer(positions, many=True).data)
+
 class UserProfileAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -124,6 +181,7 @@ class UserProfileAPIView(APIView):
         # Optimization: WatchLogSerializer only serializes the 'episode' field (ID representation),
         # so select_related('episode__season__anime') causes an unnecessary DB join
         history = WatchLog.objects.filter(user=user).order_by('-watched_at')[:10]
+        activity = UserActivity.objects.filter(user=user).first()
         
         # Note: In a real app, create a ProfileSerializer.
         # Here constructing ad-hoc response for speed as per migration plan.
@@ -135,7 +193,8 @@ class UserProfileAPIView(APIView):
             'is_premium': getattr(user, 'is_premium', False),
             'date_joined': user.date_joined,
             'badges': UserBadgeSerializer(badges, many=True).data,
-            'recent_history': WatchLogSerializer(history, many=True).data
+            'recent_history': WatchLogSerializer(history, many=True).data,
+            'streak': get_streaks(activity),
         })
 
     def patch(self, request):
@@ -235,44 +294,13 @@ class ActivityFeedViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
-        user = request.user
-
-        following_users = Follow.objects.filter(follower=user).values_list('following', flat=True)
-
-        # Badges awarded to followed users
-        badges = UserBadge.objects.filter(user__in=following_users).select_related('user', 'badge').order_by('-awarded_at')[:20]
-
-        # WatchLogs for followed users (only if public or following, well we are following them)
-        watches = WatchLog.objects.filter(user__in=following_users).select_related('user', 'episode__season__anime').order_by('-watched_at')[:20]
-
-        activities = []
-        for b in badges:
-            activities.append({
-                'activity_type': 'badge_earned',
-                'user': b.user,
-                'created_at': b.awarded_at,
-                'details': {
-                    'badge_name': b.badge.name,
-                    'badge_icon': b.badge.icon_url
-                }
-            })
-
-        for w in watches:
-            activities.append({
-                'activity_type': 'episode_watched',
-                'user': w.user,
-                'created_at': w.watched_at,
-                'details': {
-                    'anime_title': w.episode.season.anime.title,
-                    'episode_number': w.episode.number,
-                }
-            })
-
-        # Sort combined activities by created_at descending
-        activities.sort(key=lambda x: x['created_at'], reverse=True)
-
-        # Take the top 20
-        activities = activities[:20]
-
+        cursor = request.query_params.get('cursor') or None
+        try:
+            if cursor is not None:
+                parse_cursor(cursor)
+        except ValueError:
+            return Response({"error": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        activities, next_cursor = get_feed(request.user, cursor=cursor, limit=20)
         serializer = ActivitySerializer(activities, many=True)
-        return Response(serializer.data)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
@@ -0,0 +1,107 @@
+"""
+Wallet ledger.
+
+Every balance change is a WalletTransaction row; Wallet.balance is the
+running total, kept in step by post_transactions in the same database
+transaction with UPDATE balance = balance + delta. The affected wallets are
+locked first, so concurrent posts to the same wallet queue up instead of
+losing updates, and a repeated idempotency key is skipped, which makes
+retried distribution runs safe. reconcile_wallets checks the two agree.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from .models import Wallet, WalletTransaction
+
+# Wallets updated per UPDATE statement
+BATCH_SIZE = 500
+CENT = Decimal('0.01')
+
+Entry = namedtuple('Entry', ['user_id', 'amount', 'kind', 'idempotency_key', 'description'], defaults=[''])
+
+
+def _apply_deltas(deltas):
+    """
+    {wallet_id: amount} -> one UPDATE ... SET balance = balance + CASE ... per batch.
+    """
+    items = [(wallet_id, amount) for wallet_id, amount in deltas.items() if amount]
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = items[start:start + BATCH_SIZE]
+        delta = Case(
+            *[When(id=wallet_id, then=Value(amount)) for wallet_id, amount in batch],
+            default=Value(Decimal(0)),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        Wallet.objects.filter(id__in=[wallet_id for wallet_id, _ in batch]).update(balance=F('balance') + delta)
+
+
+def post_transactions(entries):
+    """
+    Appends ledger entries and updates the balances, creating missing
+    wallets. Entries whose idempotency key was already posted are skipped.
+    Returns the WalletTransactions created.
+    """
+    entries = [e for e in entries if e.amount]
+    if not entries:
+        return []
+    user_ids = {e.user_id for e in entries}
+
+    with transaction.atomic():
+        Wallet.objects.bulk_create([Wallet(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        # Lock in id order so concurrent posts can't deadlock
+        wallet_ids = dict(
+            Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by('id').values_list('user_id', 'id')
+        )
+        posted = set(
+            WalletTransaction.objects.filter(idempotency_key__in=[e.idempotency_key for e in entries])
+            .values_list('idempotency_key', flat=True)
+        )
+        created = WalletTransaction.objects.bulk_create([
+            WalletTransaction(
+                wallet_id=wallet_ids[e.user_id], amount=e.amount, kind=e.kind,
+                idempotency_key=e.idempotency_key, description=e.description,
+            )
+            for e in entries if e.idempotency_key not in posted
+        ])
+
+        deltas = {}
+        for tx in created:
+            deltas[tx.wallet_id] = deltas.get(tx.wallet_id, 0) + tx.amount
+        _apply_deltas(deltas)
+    return created
+
+
+def ledger_balances():
+    """
+    Wallets annotated with ledger_balance, the sum of their transactions.
+    """
+    totals = (
+        WalletTransaction.objects.filter(wallet=OuterRef('pk'))
+        .values('wallet').annotate(total=Sum('amount')).values('total')
+    )
+    return Wallet.objects.annotate(
+        ledger_balance=Coalesce(Subquery(totals), Value(Decimal(0)), output_field=DecimalField(max_digits=10, decimal_places=2))
+    )
+
+
+def reconcile_wallets(fix=False):
+    """
+    Returns [(wallet, ledger balance)] for wallets whose balance disagrees
+    with their ledger; with fix=True, resets those balances to the ledger.
+    """
+    mismatched = []
+    for wallet in ledger_balances().select_related('user'):
+        # SQLite hands back the sum without its decimal places
+        ledger_balance = Decimal(wallet.ledger_balance).quantize(CENT)
+        if wallet.balance != ledger_balance:
+            mismatched.append((wallet, ledger_balance))
+    if fix:
+        for wallet, _ in mismatched:
+            with transaction.atomic():
+                # Lock before summing so a concurrent post can't slip in between
+                list(Wallet.objects.select_for_update().filter(pk=wallet.pk).values_list('pk', flat=True))
+                total = WalletTransaction.objects.filter(wallet_id=wallet.pk).aggregate(total=Sum('amount'))['total'] or Decimal(0)
+                Wallet.objects.filter(pk=wallet.pk).update(balance=total)
+    return mismatched